@@ -7,23 +7,60 @@
 This is the client library for QC Ware's Forge product,
 a SaaS product for solving problems with quantum computing.
 Please see the documentation at http://qcware.readthedocs.io
-"""
-import pkg_resources
-
-try:
-    __version__ = pkg_resources.get_distribution("qcware").version
-except Exception:
-    __version__ = "7.4.3"
 
+The subpackages (qio, qml, optimization and so on) are imported when
+first used (PEP 562), so that importing qcware.forge is cheap for
+processes which only need a few of them.
+"""
+import importlib
 import logging
 
 logger = logging.getLogger("qcware.forge")
 
+_Fallback_version = "7.4.3"
+
+_Subpackages = frozenset(
+    ["qio", "montecarlo", "qutils", "circuits", "qml", "test", "optimization"]
+)
+
+
+def _distribution_version() -> str:
+    try:
+        from importlib.metadata import version
+    except ImportError:  # Python 3.7
+        try:
+            from importlib_metadata import version  # type:ignore
+        except ImportError:
+            return _Fallback_version
+    try:
+        return version("qcware")
+    except Exception:
+        return _Fallback_version
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        global __version__
+        __version__ = _distribution_version()
+        return __version__
+    if name in _Subpackages:
+        # importing the subpackage also sets it as an attribute of this module
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _Subpackages | {"__version__"})
+
+
+def install_rich_traceback():
+    """
+    Installs rich's traceback handler, with the frames of the client's API
+    call machinery suppressed, so that errors raised by API calls are
+    shown more readably.  This used to be done on import; it is now opt-in.
+    """
+    import rich.traceback
+
+    from qcware.forge import api_calls, request
 
-from qcware.forge import qio
-from qcware.forge import montecarlo
-from qcware.forge import qutils
-from qcware.forge import circuits
-from qcware.forge import qml
-from qcware.forge import test
-from qcware.forge import optimization
+    rich.traceback.install(suppress=[api_calls, request])
@@ -6,9 +6,12 @@ from qcware.forge.api_calls.api_call import (
     handle_result,
     retrieve_result,
     async_retrieve_result,
+    gather_results,
     retrieve_parameters,
     async_retrieve_parameters,
     status,
     cancel,
 )
 from qcware.forge.api_calls.api_call_decorator import declare_api_call
+from qcware.forge.api_calls.batch import SubmissionResult
+from qcware.forge.api_calls.local_backends import register_local_backend
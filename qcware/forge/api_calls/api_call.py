@@ -1,26 +1,55 @@
 import asyncio
-import json
-from typing import Dict
+import itertools
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urljoin
 
-import backoff
+from qcware.forge import logger
+from qcware.forge.api_calls.polling import PollSchedule, record_submission
 from qcware.forge.async_request import post as async_post
+from qcware.forge.async_request import post_frames as async_post_frames
+from qcware.forge.async_request import post_json as async_post_json
 from qcware.forge.config import (
     ApiCallContext,
+    WireFormat,
     async_interval_between_tries,
-    client_timeout,
     current_context,
     do_client_api_compatibility_check_once,
+    host_wire_features,
+    result_spool_dir,
 )
 from qcware.forge.exceptions import ApiCallExecutionError, ApiTimeoutError
-from qcware.forge.request import get, post
+from qcware.forge.request import encode_json, get_payload, post, post_frames, post_json
+from qcware.forge.timings import (
+    record_poll,
+    record_request_bytes,
+    record_submitted,
+    timed,
+)
+from qcware.serialization.frames import ArrayBuffer, Frames_wire_feature
 from qcware.serialization.transforms import (
     client_result_from_wire,
     server_args_from_wire,
 )
 
 
-def post_call(endpoint: str, data: dict):
+def use_binary_transport(api_call_context: ApiCallContext) -> bool:
+    """
+    Whether payloads should be sent as frames: only if the context asks for
+    the binary wire format and the host supports it.
+    """
+    return (
+        api_call_context.wire_format is WireFormat.binary
+        and Frames_wire_feature in host_wire_features(api_call_context.qcware_host)
+    )
+
+
+def post_call(endpoint: str, data: dict, buffers: Optional[List[ArrayBuffer]] = None):
+    """
+    Posts an API call.  If `buffers` is given, the arrays in `data` have
+    been collected there (see collect_ndarray_buffers) and the call is
+    sent as a frames body.
+    """
     api_call_context = data.get("api_call_context", None)
     if api_call_context is None:
         api_call_context = current_context()
@@ -28,15 +57,31 @@ def post_call(endpoint: str, data: dict):
     # replace the ApiCallContext class with a jsonable dict
     data["api_call_context"] = api_call_context.dict()
     url = urljoin(host, endpoint)
-    return post(url, data)
-
-
-async def async_post_call(endpoint: str, data: dict):
+    if buffers is not None:
+        # frames bodies are encoded while being sent
+        with timed("post"):
+            result = post_frames(url, data, buffers)
+    else:
+        with timed("encode"):
+            body = encode_json(data)
+        record_request_bytes(len(body))
+        with timed("post"):
+            result = post_json(url, body)
+    record_submitted(result.get("uid"))
+    record_submission(result.get("uid"))
+    return result
+
+
+async def async_post_call(
+    endpoint: str, data: dict, buffers: Optional[List[ArrayBuffer]] = None
+):
     """
     Centralizes the post for the API call.  Assumes the data dict
     contains an entry with key 'api_key'; if this is missing or set to
     the default of None, uses the configured API key and augments
     the data dictionary with whatever key is configured.
+
+    As with post_call, the call is sent as a frames body if `buffers` is given.
     """
     api_call_context = data.get("api_call_context", None)
     if api_call_context is None:
@@ -45,7 +90,19 @@ async def async_post_call(endpoint: str, data: dict):
     # replace the ApiCallContext class with a jsonable dict
     data["api_call_context"] = api_call_context.dict()
     url = urljoin(host, endpoint)
-    return await async_post(url, data)
+    if buffers is not None:
+        # frames bodies are encoded while being sent
+        with timed("post"):
+            result = await async_post_frames(url, data, buffers)
+    else:
+        with timed("encode"):
+            body = encode_json(data)
+        record_request_bytes(len(body))
+        with timed("post"):
+            result = await async_post_json(url, body)
+    record_submitted(result.get("uid"))
+    record_submission(result.get("uid"))
+    return result
 
 
 def api_call(api_call_context: ApiCallContext, call_token: str):
@@ -88,46 +145,78 @@ def cancel(call_token: str):
     )
 
 
-def _print_waiting_handler(details: Dict):
-    pass
+def _poll_wait(schedule: PollSchedule, api_call: dict, max_time: float):
+    """
+    Returns how long to sleep before polling again, or None if the call is
+    finished or the client timeout has been reached.
+    """
+    schedule.record_poll(api_call)
+    remaining = max_time - schedule.elapsed
+    if api_call.get("state") != "open" or remaining <= 0:
+        return None
+    return min(schedule.next_delay(api_call), remaining)
+
+
+def _finish_wait(schedule: PollSchedule, api_call: dict, call_token: str):
+    logger.debug(
+        f"Polled call {call_token} {schedule.num_polls} times over "
+        f"{schedule.elapsed:.2f}s; state is {api_call.get('state')}"
+    )
+    api_call["num_polls"] = schedule.num_polls
+    return api_call
 
 
-# we pass the function max_poll_period for max_time rather than
-# evaluating it; see backoff docs
-@backoff.on_predicate(
-    backoff.constant,
-    interval=1,
-    predicate=lambda a: a.get("state") == "open",
-    max_time=client_timeout,
-    on_backoff=_print_waiting_handler,
-)
 def wait_for_call(call_token: str, api_call_context=None):
+    """
+    Polls the call until it is no longer open or the client timeout is reached,
+    spacing polls according to the context's polling policy.  The last poll
+    response is returned, with the number of polls made under "num_polls".
+    """
     api_call_context = (
         current_context() if api_call_context is None else api_call_context
     )
-    # backoff.on_predicate is mildly problematic.
-    return api_call(api_call_context, call_token)
+    schedule = PollSchedule(api_call_context.polling_policy, call_token)
+    while True:
+        poll_started = time.perf_counter()
+        result = api_call(api_call_context, call_token)
+        record_poll(time.perf_counter() - poll_started, result.get("state"))
+        delay = _poll_wait(schedule, result, api_call_context.client_timeout)
+        if delay is None:
+            return _finish_wait(schedule, result, call_token)
+        time.sleep(delay)
 
 
-@backoff.on_predicate(
-    backoff.constant,
-    interval=1,
-    predicate=lambda a: a.get("state") == "open",
-    max_time=client_timeout,
-    on_backoff=_print_waiting_handler,
-)
 async def async_wait_for_call(call_token: str, api_call_context=None):
+    """Asynchronous form of wait_for_call"""
     api_call_context = (
         current_context() if api_call_context is None else api_call_context
     )
-    # backoff.on_predicate is mildly problematic.
-    return await async_api_call(api_call_context, call_token)
+    schedule = PollSchedule(api_call_context.polling_policy, call_token)
+    while True:
+        poll_started = time.perf_counter()
+        result = await async_api_call(api_call_context, call_token)
+        record_poll(time.perf_counter() - poll_started, result.get("state"))
+        delay = _poll_wait(schedule, result, api_call_context.client_timeout)
+        if delay is None:
+            return _finish_wait(schedule, result, call_token)
+        await asyncio.sleep(delay)
 
 
 def handle_result(api_call):
+    result = wire_result(api_call)
+    with timed("from_wire"):
+        return client_result_from_wire(api_call["method"], result)
+
+
+def wire_result(api_call):
+    """
+    The result of a finished call in its wire form, that is, before
+    client_result_from_wire.  Raises an ApiCallExecutionError if the call
+    failed or was rescheduled, or an ApiTimeoutError if it is not done.
+    """
     if api_call["state"] == "error":
         if "result_url" in api_call:
-            result = json.loads(get(api_call["result_url"]))
+            result = get_payload(api_call["result_url"], spool_dir=result_spool_dir())
         else:
             result = api_call["result"]
         raise ApiCallExecutionError(
@@ -156,15 +245,15 @@ def handle_result(api_call):
         raise ApiTimeoutError(api_call_info)
     else:
         if "result_url" in api_call:
-            result = json.loads(get(api_call["result_url"]))
+            with timed("download"):
+                return get_payload(api_call["result_url"], spool_dir=result_spool_dir())
         else:
-            result = api_call["result"]
-        return client_result_from_wire(api_call["method"], result)
+            return api_call["result"]
 
 
 def handle_params(params_data):
     method = params_data["method"]
-    raw_params = json.loads(get(params_data["params_url"]))
+    raw_params = get_payload(params_data["params_url"])
     params = server_args_from_wire(method, **raw_params)
     del params["api_call_context"]
     return params
@@ -207,13 +296,86 @@ async def async_retrieve_result(
     :return Either the processed result in the type expected, or an error object
     showing the state of the call
     """
+    method, result = await async_retrieve_wire_result(call_token)
+    with timed("from_wire"):
+        return client_result_from_wire(method, result)
+
+
+async def async_retrieve_wire_result(call_token: str) -> Tuple[str, Any]:
+    """
+    As async_retrieve_result, but returns the method of the call and its
+    result in wire form (see wire_result).
+    """
     while True:
         try:
-            return handle_result(await async_wait_for_call(call_token))
+            api_call = await async_wait_for_call(call_token)
+            return api_call["method"], wire_result(api_call)
         except ApiTimeoutError as e:
             await asyncio.sleep(async_interval_between_tries())
 
 
+async def gather_results(
+    call_tokens: Iterable[str],
+    max_in_flight: int = 32,
+    return_exceptions: bool = False,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Retrieves the results of many calls concurrently, yielding each result as
+    soon as it is available (in completion order, not input order).
+
+    At most `max_in_flight` calls are polled at once and `call_tokens` is
+    consumed lazily, so memory use does not grow with the number of tokens.
+    Use as::
+
+        async for call_token, result in gather_results(tokens, max_in_flight=64):
+            ...
+
+    :param call_tokens: The tokens of the API calls to retrieve
+    :type call_tokens: Iterable[str]
+
+    :param max_in_flight: The maximum number of calls polled concurrently, defaults to 32
+    :type max_in_flight: int
+
+    :param return_exceptions: If True, an exception raised while retrieving a call
+      (such as an ApiCallExecutionError) is yielded in place of its result rather
+      than raised, defaults to False
+    :type return_exceptions: bool
+
+    :return: An async iterator of (call_token, result) pairs
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    remaining_tokens = iter(call_tokens)
+    in_flight: Dict[asyncio.Future, str] = {}
+
+    def top_up():
+        num_free = max_in_flight - len(in_flight)
+        for call_token in itertools.islice(remaining_tokens, num_free):
+            in_flight[
+                asyncio.ensure_future(async_retrieve_result(call_token))
+            ] = call_token
+
+    top_up()
+    try:
+        while in_flight:
+            done, _ = await asyncio.wait(
+                in_flight.keys(), return_when=asyncio.FIRST_COMPLETED
+            )
+            finished = [(in_flight.pop(task), task) for task in done]
+            top_up()
+            for call_token, task in finished:
+                try:
+                    result = task.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    result = e
+                yield call_token, result
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
 def retrieve_parameters(call_token: str, api_call_context: ApiCallContext = None):
     """
     Retrieves the parameters of an API call.
@@ -1,20 +1,50 @@
+import asyncio
+import contextvars
+import functools
 import inspect
-import rich.traceback
-from qcware.forge.config import client_timeout
+from typing import Any, FrozenSet, Iterable, List, Mapping
+
+from decouple import config
+from qcware.forge.config import (
+    WireFormat,
+    async_host_wire_features,
+    client_timeout,
+    coalesce_calls,
+    current_context,
+    host_wire_features,
+)
 from qcware.forge.exceptions import ApiTimeoutError
-from qcware.serialization.transforms import client_args_to_wire
+from qcware.serialization.transforms import (
+    client_args_to_wire,
+    client_result_from_wire,
+)
+from qcware.serialization.transforms.helpers import collect_ndarray_buffers
+from qcware.serialization.transforms.to_wire import uses_wire_features
+from qcware.serialization.wire_features import enable_wire_features
 
-from qcware.forge import logger
-from qcware.forge import api_calls, request
+from qcware.forge import install_rich_traceback, logger
 from qcware.forge.api_calls.api_call import (
     async_post_call,
     async_retrieve_result,
+    async_retrieve_wire_result,
     handle_result,
     post_call,
+    use_binary_transport,
     wait_for_call,
+    wire_result,
+)
+from qcware.forge.api_calls.batch import SubmissionResult, submit_all
+from qcware.forge.api_calls.coalescing import (
+    async_single_flight,
+    call_key,
+    single_flight,
 )
+from qcware.forge.api_calls.local_backends import local_backend
+from qcware.forge.api_calls.result_cache import result_cache
+from qcware.forge.timings import timed, timed_call
 
-rich.traceback.install(suppress=[api_calls, request])
+if config("QCWARE_RICH_TRACEBACK", default=False, cast=bool):
+    install_rich_traceback()
 
 
 class ApiCall:
@@ -25,36 +55,245 @@ class ApiCall:
         except Exception as e:
             raise e
 
+    def _local_call(self, *args, **kwargs):
+        """
+        The call with its arguments bound, as a function of no arguments,
+        if it is to be run by a local backend (otherwise None)
+        """
+        if "backend" not in self.__signature__.parameters:
+            return None
+        bound = self.__signature__.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        f = local_backend(self.name, arguments.pop("backend"))
+        if f is None:
+            return None
+        return functools.partial(f, **arguments)
+
     def data(self, *args, **kwargs):
-        new_bound_kwargs = self.__signature__.bind(*args, **kwargs)
-        new_bound_kwargs.apply_defaults()
-        new_kwargs = new_bound_kwargs.arguments
-        return client_args_to_wire(self.name, **new_kwargs)
+        with timed("bind"):
+            new_bound_kwargs = self.__signature__.bind(*args, **kwargs)
+            new_bound_kwargs.apply_defaults()
+            new_kwargs = new_bound_kwargs.arguments
+        # arguments may use the optional encodings the host understands
+        features = self._wire_features(new_kwargs)
+        with timed("to_wire"), enable_wire_features(features):
+            return client_args_to_wire(self.name, **new_kwargs)
+
+    def _wire_features(self, arguments) -> FrozenSet[str]:
+        """
+        The optional encodings the host understands, which are only asked
+        of it if the call is sent to it and some argument has an encoding
+        depending on them
+        """
+        if local_backend(self.name, arguments.get("backend")) is not None:
+            return frozenset()
+        if not any(uses_wire_features(v) for v in arguments.values()):
+            return frozenset()
+        return host_wire_features(current_context().qcware_host)
+
+    async def _async_resolve_wire_features(self, *args, **kwargs):
+        """
+        Asks the host for its wire features, if serializing the call needs
+        them, without blocking the event loop; _serialize then finds them
+        cached
+        """
+        context = current_context()
+        if context.wire_format is not WireFormat.binary:
+            bound = self.__signature__.bind(*args, **kwargs)
+            if not any(uses_wire_features(v) for v in bound.arguments.values()):
+                return
+        await async_host_wire_features(context.qcware_host)
+
+    def _serialize(self, *args, **kwargs):
+        """
+        The wire data of a call and, if the binary transport is used, the
+        arrays collected from it (otherwise None)
+        """
+        if use_binary_transport(current_context()):
+            with collect_ndarray_buffers() as buffers:
+                data = self.data(*args, **kwargs)
+            return data, buffers
+        return self.data(*args, **kwargs), None
+
+    def _post(self, data, buffers):
+        if buffers is not None:
+            return post_call(self.endpoint, data, buffers=buffers)
+        return post_call(self.endpoint, data)
+
+    async def _async_post(self, data, buffers):
+        if buffers is not None:
+            return await async_post_call(self.endpoint, data, buffers=buffers)
+        return await async_post_call(self.endpoint, data)
+
+    def _call_key(self, data, buffers) -> str:
+        return call_key(self.name, data, current_context().dict(), buffers)
+
+    def _result_cache_lookup(self, data, buffers):
+        """
+        Returns the (method, wire result) cached for the call, if any, and a
+        function storing the wire result of the call if it is to be cached
+        (otherwise None)
+        """
+        cache = result_cache(self.name)
+        if cache is None:
+            return None, None
+        key = cache.key(self.name, data, current_context().qcware_host, buffers)
+        return cache.get(key), functools.partial(cache.put, key)
+
+    async def _async_result_cache_lookup(self, data, buffers):
+        """
+        Like _result_cache_lookup, but the cache is read, and the function
+        returned (a coroutine function) writes it, in a thread, so that
+        other tasks run meanwhile
+        """
+        if result_cache(self.name) is None:
+            return None, None
+        loop = asyncio.get_running_loop()
+        cached, store_result = await loop.run_in_executor(
+            None,
+            contextvars.copy_context().run,
+            self._result_cache_lookup,
+            data,
+            buffers,
+        )
+        if store_result is None:
+            return None, None
+
+        async def async_store_result(method, result):
+            await loop.run_in_executor(None, store_result, method, result)
+
+        return cached, async_store_result
 
     def do(self, *args, **kwargs):
-        api_call = post_call(self.endpoint, self.data(*args, **kwargs))
+        local_call = self._local_call(*args, **kwargs)
+        if local_call is not None:
+            with timed_call(self.name):
+                return local_call()
+        with timed_call(self.name) as timings:
+            data, buffers = self._serialize(*args, **kwargs)
+            cached, store_result = self._result_cache_lookup(data, buffers)
+            if cached is not None:
+                logger.info(f"Using cached result of call to {self.name}")
+                timings.cached = True
+                with timed("from_wire"):
+                    return client_result_from_wire(*cached)
+            if coalesce_calls():
+                return single_flight.do(
+                    self._call_key(data, buffers),
+                    lambda: self._do(data, buffers, store_result=store_result),
+                )
+            return self._do(data, buffers, store_result=store_result)
+
+    def _do(self, data, buffers, store_result=None):
+        api_call = self._post(data, buffers)
         api_call_id = api_call["uid"]
         logger.info(
             f"API call to {self.name} successful; api call token is {api_call_id}"
         )
         if client_timeout() == 0:
             raise ApiTimeoutError(api_call)
-        else:
-            return handle_result(wait_for_call(call_token=api_call_id))
+        finished_call = wait_for_call(call_token=api_call_id)
+        if store_result is None:
+            return handle_result(finished_call)
+        result = wire_result(finished_call)
+        store_result(finished_call["method"], result)
+        with timed("from_wire"):
+            return client_result_from_wire(finished_call["method"], result)
 
     def submit(self, *args, **kwargs):
-        api_call = post_call(self.endpoint, self.data(*args, **kwargs))
+        if self._local_call(*args, **kwargs) is not None:
+            raise ValueError(
+                f"Calls to {self.name} with a local backend are run when made "
+                "and cannot be submitted."
+            )
+        with timed_call(self.name):
+            api_call = self._post(*self._serialize(*args, **kwargs))
         logger.info(
             f'Call submitted to {self.name} successful; api call token is {api_call["uid"]}'
         )
         return api_call["uid"]
 
+    def submit_many(
+        self, argument_sets: Iterable[Mapping[str, Any]], max_workers: int = 8
+    ) -> List[SubmissionResult]:
+        """
+        Submits one call per set of keyword arguments, serializing and posting
+        the calls concurrently with up to `max_workers` threads.
+
+        :param argument_sets: An iterable of dicts, each holding the keyword
+          arguments for one call
+        :type argument_sets: Iterable[Mapping[str, Any]]
+
+        :param max_workers: The number of calls serialized and posted at once,
+          defaults to 8
+        :type max_workers: int
+
+        :return: One SubmissionResult per argument set, in input order, holding
+          either the call token or the error raised while submitting
+        :rtype: List[SubmissionResult]
+        """
+        return self._submit_batch(
+            (((), kwargs) for kwargs in argument_sets), max_workers
+        )
+
+    def map(self, *iterables, max_workers: int = 8, **kwargs) -> List[SubmissionResult]:
+        """
+        Like the builtin `map`, submits one call per tuple of positional arguments
+        taken from `iterables`; any further keyword arguments are passed to
+        every call.  Calls are serialized and posted concurrently as in
+        `submit_many`.
+
+        :return: One SubmissionResult per tuple of arguments, in input order
+        :rtype: List[SubmissionResult]
+        """
+        return self._submit_batch(
+            ((args, kwargs) for args in zip(*iterables)), max_workers
+        )
+
+    def _submit_batch(self, argument_sets, max_workers: int):
+        results = submit_all(self.submit, argument_sets, max_workers=max_workers)
+        num_failed = sum(1 for r in results if not r.ok)
+        logger.info(
+            f"Batch of {len(results)} calls submitted to {self.name}; {num_failed} failed"
+        )
+        return results
+
     async def call_async(self, *args, **kwargs):
-        api_call = await async_post_call(self.endpoint, self.data(*args, **kwargs))
+        local_call = self._local_call(*args, **kwargs)
+        if local_call is not None:
+            with timed_call(self.name):
+                # in a thread, so that other tasks may run meanwhile
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, local_call
+                )
+        with timed_call(self.name) as timings:
+            await self._async_resolve_wire_features(*args, **kwargs)
+            data, buffers = self._serialize(*args, **kwargs)
+            cached, store_result = await self._async_result_cache_lookup(data, buffers)
+            if cached is not None:
+                logger.info(f"Using cached result of call to {self.name}")
+                timings.cached = True
+                with timed("from_wire"):
+                    return client_result_from_wire(*cached)
+            if coalesce_calls():
+                return await async_single_flight.do(
+                    self._call_key(data, buffers),
+                    lambda: self._call_async(data, buffers, store_result=store_result),
+                )
+            return await self._call_async(data, buffers, store_result=store_result)
+
+    async def _call_async(self, data, buffers, store_result=None):
+        api_call = await self._async_post(data, buffers)
         logger.info(
             f'Async call to {self.name} successful; api call token is {api_call["uid"]}'
         )
-        return await async_retrieve_result(api_call["uid"])
+        if store_result is None:
+            return await async_retrieve_result(api_call["uid"])
+        method, result = await async_retrieve_wire_result(api_call["uid"])
+        await store_result(method, result)
+        with timed("from_wire"):
+            return client_result_from_wire(method, result)
 
 
 # much of this is inspired by the celery task decorator;
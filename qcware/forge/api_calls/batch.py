@@ -0,0 +1,62 @@
+"""
+Concurrent submission of many invocations of a single API call.
+
+Parameter sweeps tend to issue thousands of calls that differ only in
+their arguments; submitting them one after the other pays a full
+serialize-then-POST round trip per call.  The helpers here spread that
+work over a thread pool so that serialization (much of which happens in
+numpy and lz4 and releases the GIL) and HTTP round trips overlap.
+"""
+import contextvars
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+ArgumentSet = Tuple[Sequence[Any], Mapping[str, Any]]
+
+
+@dataclasses.dataclass
+class SubmissionResult:
+    """The outcome of submitting one item of a batch.
+
+    Exactly one of `call_token` and `error` is set: `call_token` is the
+    token of the submitted call (usable with `retrieve_result` or
+    `gather_results`), and `error` is the exception raised while
+    serializing or posting the arguments.
+    """
+
+    index: int
+    call_token: Optional[str] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def submit_all(
+    submit_one: Callable[..., str],
+    argument_sets: Iterable[ArgumentSet],
+    max_workers: int,
+) -> List[SubmissionResult]:
+    """Calls `submit_one(*args, **kwargs)` for every argument set concurrently.
+
+    Each submission runs in a copy of the caller's context so that
+    configuration pushed with `additional_config` applies in the worker
+    threads as well.  Results are returned in input order.
+    """
+
+    def attempt(index: int, args: Sequence[Any], kwargs: Mapping[str, Any]):
+        try:
+            return SubmissionResult(index=index, call_token=submit_one(*args, **kwargs))
+        except Exception as e:
+            return SubmissionResult(index=index, error=e)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, attempt, index, args, kwargs
+            )
+            for index, (args, kwargs) in enumerate(argument_sets)
+        ]
+        return [f.result() for f in futures]
@@ -0,0 +1,93 @@
+"""
+Coalescing of identical API calls made concurrently.
+
+Dashboards and sweeps often issue the very same call from several threads
+or coroutines at once.  With coalescing enabled (see `coalesce_calls` in
+qcware.forge.config), the first of these becomes the "leader" and submits
+the call; the others wait for the leader's result (or exception) instead
+of submitting jobs of their own.  Calls are identical if they have the
+same method, wire arguments and context; once a call has finished, the
+next identical call is submitted afresh.
+
+All callers of a coalesced call receive the same result object.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from qcware.serialization.frames import ArrayBuffer
+
+
+def call_key(
+    method: str,
+    data: dict,
+    context: dict,
+    buffers: Optional[List[ArrayBuffer]] = None,
+) -> str:
+    """A canonical hash of a call's method, wire arguments and context"""
+    h = hashlib.sha256(method.encode("utf-8"))
+    for document in (data, context):
+        h.update(
+            json.dumps(
+                document, sort_keys=True, separators=(",", ":"), default=str
+            ).encode("utf-8")
+        )
+    for buffer in buffers or []:
+        h.update(buffer.array.dtype.str.encode("utf-8"))
+        h.update(buffer.array.reshape(-1).view("u1").data)
+    return h.hexdigest()
+
+
+class SingleFlight:
+    """Shares the outcome of concurrent calls with the same key between threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def do(self, key: str, f: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._in_flight[key] = Future()
+        if not is_leader:
+            return future.result()
+        try:
+            result = f()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+
+class AsyncSingleFlight:
+    """
+    Shares the outcome of concurrent calls with the same key between
+    coroutines.  The call runs in a task of its own, so cancelling one of
+    the waiting coroutines does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Tuple[int, str], asyncio.Future] = {}
+
+    async def do(self, key: str, f: Callable[[], Awaitable[Any]]) -> Any:
+        # futures belong to an event loop, so calls are only shared within one
+        loop_key = (id(asyncio.get_event_loop()), key)
+        task = self._in_flight.get(loop_key)
+        if task is None:
+            task = asyncio.ensure_future(f())
+            self._in_flight[loop_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(loop_key, None))
+        return await asyncio.shield(task)
+
+
+single_flight = SingleFlight()
+async_single_flight = AsyncSingleFlight()
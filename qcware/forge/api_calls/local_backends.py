@@ -0,0 +1,44 @@
+"""
+Backends which run API calls on the client rather than on the server.
+
+A function registered with `register_local_backend` for an API call and
+a backend (by convention named "local/...") is called, with the same
+arguments other than `backend`, whenever that call is made with that
+backend; nothing is sent to the server.
+"""
+from typing import Callable, Dict, Optional, Tuple
+
+Local_backend_prefix = "local/"
+
+# The backend of the numpy engines run on the client
+Local_numpy_backend = Local_backend_prefix + "numpy"
+
+_local_backends: Dict[Tuple[str, str], Callable] = {}
+
+
+def register_local_backend(name: str, backend: str, f: Callable):
+    """Runs the API call `name` with `backend` by calling f locally"""
+    if not backend.startswith(Local_backend_prefix):
+        raise ValueError(
+            f"Local backend names must start with {Local_backend_prefix}; "
+            f"found {backend}."
+        )
+    _local_backends[(name, backend)] = f
+
+
+def local_backend(name: str, backend) -> Optional[Callable]:
+    """
+    The function running the API call `name` with `backend` locally, or
+    None if the backend is run by the server.  Raises ValueError for
+    local backends which are not registered for the call.
+    """
+    if not isinstance(backend, str) or not backend.startswith(Local_backend_prefix):
+        return None
+    try:
+        return _local_backends[(name, backend)]
+    except KeyError:
+        available = sorted(b for n, b in _local_backends if n == name)
+        raise ValueError(
+            f"Unknown local backend {backend} for {name}; "
+            f"available local backends are {available}."
+        ) from None
@@ -0,0 +1,128 @@
+"""
+Schedules for polling the status of an API call.
+
+A `PollSchedule` is created for every call being waited on; after each
+poll it is asked how long to wait before the next one, following the
+`PollingPolicy` of the current `ApiCallContext`.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from qcware.forge.config import PollingPolicy, PollingStrategy
+
+# exponentially-weighted moving average of how long calls to each method
+# took to complete, in seconds; used by the adaptive strategy
+_latency_estimates: Dict[str, float] = {}
+_Latency_smoothing = 0.3
+
+# When (by time.monotonic) the calls most recently submitted by this
+# process were submitted, so that their latency can be measured
+_submission_times: "OrderedDict[str, float]" = OrderedDict()
+_submission_times_lock = threading.Lock()
+_Max_tracked_submissions = 4096
+
+
+def record_submission(call_token: Optional[str]):
+    """Notes that the call was just submitted"""
+    if call_token is None:
+        return
+    with _submission_times_lock:
+        _submission_times[call_token] = time.monotonic()
+        while len(_submission_times) > _Max_tracked_submissions:
+            _submission_times.popitem(last=False)
+
+
+def submission_time(call_token: Optional[str]) -> Optional[float]:
+    """When the call was submitted by this process, if it is known"""
+    with _submission_times_lock:
+        return _submission_times.get(call_token)
+
+
+def record_latency(method: str, seconds: float):
+    """Folds the observed completion time of a call into the method's estimate."""
+    previous = _latency_estimates.get(method)
+    if previous is None:
+        _latency_estimates[method] = seconds
+    else:
+        _latency_estimates[method] = (
+            _Latency_smoothing * seconds + (1 - _Latency_smoothing) * previous
+        )
+
+
+def estimated_latency(method: Optional[str]) -> Optional[float]:
+    """The expected completion time of a call to `method`, if one has been observed."""
+    return _latency_estimates.get(method) if method is not None else None
+
+
+class PollSchedule:
+    """
+    Tracks the polls made for one call and decides the wait before the
+    next.  Every wait is at most the policy's max_interval.
+
+    The latencies of calls are only measured (for the adaptive strategy)
+    if they were submitted by this process, from when they were submitted.
+    """
+
+    def __init__(self, policy: PollingPolicy, call_token: Optional[str] = None):
+        self.policy = policy
+        self.num_polls = 0
+        self.started = time.monotonic()
+        self.call_token = call_token
+        self.submitted = submission_time(call_token)
+        self._next_backoff = policy.initial_interval
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the wait for the call started"""
+        return time.monotonic() - self.started
+
+    @property
+    def since_submission(self) -> Optional[float]:
+        """Seconds since the call was submitted, if that is known"""
+        return None if self.submitted is None else time.monotonic() - self.submitted
+
+    def record_poll(self, api_call: dict):
+        """Notes a poll response; records the latency once the call is finished."""
+        self.num_polls += 1
+        method = api_call.get("method")
+        latency = self.since_submission
+        if (
+            method is not None
+            and latency is not None
+            and api_call.get("state") in ("success", "error")
+        ):
+            record_latency(method, latency)
+            # only once per call
+            with _submission_times_lock:
+                _submission_times.pop(self.call_token, None)
+            self.submitted = None
+
+    def next_delay(self, api_call: dict) -> float:
+        """Seconds to wait before polling again, given the latest poll response."""
+        return min(self._next_delay(api_call), self.policy.max_interval)
+
+    def _next_delay(self, api_call: dict) -> float:
+        retry_after = api_call.get("retry_after")
+        if self.policy.honor_retry_after and isinstance(retry_after, (int, float)):
+            return max(float(retry_after), 0.0)
+
+        if self.policy.strategy is PollingStrategy.constant:
+            return self.policy.initial_interval
+
+        if self.policy.strategy is PollingStrategy.adaptive:
+            expected = estimated_latency(api_call.get("method"))
+            waited = self.since_submission
+            if waited is None:
+                waited = self.elapsed
+            if expected is not None and waited < expected:
+                return max(expected - waited, self.policy.initial_interval)
+
+        delay = self._next_backoff
+        self._next_backoff = min(
+            self._next_backoff * self.policy.multiplier, self.policy.max_interval
+        )
+        jitter = self.policy.jitter
+        return delay * random.uniform(1 - jitter, 1 + jitter)
@@ -0,0 +1,153 @@
+"""
+An on-disk cache of the results of deterministic API calls.
+
+Results are stored in their wire form, before client_result_from_wire,
+so a cached result is decoded exactly as a fresh one would be.  Each
+result is a frames file (see qcware.serialization.frames) named by a
+hash of the method, backend, host, client version and wire arguments.
+
+Reading a result marks it as recently used by setting its access time,
+while its modification time records when it was stored.  Results older
+than the TTL are ignored, and when the cache outgrows its size bound the
+least recently used results are evicted.
+"""
+import os
+import tempfile
+import time
+from typing import Any, List, Optional, Tuple
+
+from qcware.forge import __version__ as Qcware_client_version
+from qcware.forge import logger
+from qcware.forge.api_calls.coalescing import call_key
+from qcware.forge.config import ResultCacheConfig, current_context
+from qcware.serialization.frames import (
+    ArrayBuffer,
+    Buffer_key,
+    RawBuffer,
+    decode_frames,
+    iter_frames,
+)
+from qcware.serialization.transforms.transform_results import result_represents_error
+
+_Suffix = ".qcwresult"
+
+
+def _extract_buffers(x: Any, buffers: List[RawBuffer]) -> Any:
+    """
+    Replaces the buffers of arrays decoded from a frames body by references,
+    so that the document can be written as a frames body again.
+    """
+    if isinstance(x, dict):
+        if isinstance(x.get("ndarray"), (bytes, bytearray, memoryview)):
+            buffers.append(RawBuffer(x["ndarray"]))
+            result = {k: v for k, v in x.items() if k != "ndarray"}
+            result[Buffer_key] = len(buffers) - 1
+            return result
+        return {k: _extract_buffers(v, buffers) for k, v in x.items()}
+    elif isinstance(x, (list, tuple)):
+        return [_extract_buffers(v, buffers) for v in x]
+    else:
+        return x
+
+
+class ResultCache:
+    def __init__(self, directory: str, max_size: int, ttl: float):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+
+    @staticmethod
+    def key(
+        method: str,
+        data: dict,
+        qcware_host: str,
+        buffers: Optional[List[ArrayBuffer]] = None,
+    ) -> str:
+        """The key of a call; credentials and other context are not included"""
+        return call_key(
+            method,
+            data,
+            dict(
+                backend=data.get("backend"),
+                qcware_host=qcware_host,
+                client_version=Qcware_client_version,
+            ),
+            buffers,
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _Suffix)
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        """The method name and wire result stored under key, if any"""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                document = decode_frames(f.read())
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached result {path}: {e}")
+            return None
+        return document["method"], document["result"]
+
+    def put(self, key: str, method: str, result: Any):
+        """Stores a wire result under key, unless it represents an error"""
+        if result_represents_error(result):
+            return
+        buffers: List[RawBuffer] = []
+        document = dict(method=method, result=_extract_buffers(result, buffers))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temporary_path = tempfile.mkstemp(dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for piece in iter_frames(document, buffers):
+                        f.write(piece)
+                os.replace(temporary_path, self._path(key))
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Unable to cache result of {method}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used results until the cache fits max_size"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(_Suffix):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+def result_cache(
+    method: str, config: Optional[ResultCacheConfig] = None
+) -> Optional[ResultCache]:
+    """
+    The result cache to use for calls to `method` in the current context, or
+    None if results of the method are not to be cached.
+    """
+    config = current_context().result_cache if config is None else config
+    if not config.enabled or method not in config.methods:
+        return None
+    return ResultCache(config.directory, config.max_size, config.ttl)
@@ -1,24 +1,48 @@
 import backoff
 import requests
 import asyncio
-import aiohttp
+import weakref
+from typing import TYPE_CHECKING, AsyncIterator
 
 from qcware.forge.exceptions import ApiCallFailedError, ApiCallResultUnavailableError
+from qcware.forge.request import encode_json
+from qcware.forge.timings import record_request_bytes
+from qcware.serialization.frames import (
+    Frames_content_type,
+    decode_frames,
+    is_frames,
+    iter_frames,
+)
+from qcware.serialization.wire_features import (
+    Client_wire_features,
+    Wire_features_header,
+)
+
+if TYPE_CHECKING:
+    import aiohttp
 
-_client_session = None
+# The client session of each event loop, as sessions are bound to the
+# loop they were made in
+_client_sessions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
 
 
-def client_session() -> aiohttp.ClientSession:
+def client_session() -> "aiohttp.ClientSession":
     """
-    Singleton guardian for client session.  This may need to be moved
-    to being a contextvar, and it could be that the whole python Client
-    needs to be made instantiable (for sessions).  But since aiohttp is
-    single-threaded this should be OK for now.
+    Singleton guardian for the client session of the running event loop.
+    This may need to be moved to being a contextvar, and it could be that
+    the whole python Client needs to be made instantiable (for sessions).
+    But since aiohttp is single-threaded this should be OK for now.
+
+    aiohttp is only imported here, as it is slow to import and not needed
+    by synchronous calls.
     """
-    global _client_session
-    if _client_session is None:
-        _client_session = aiohttp.ClientSession()
-    return _client_session
+    loop = asyncio.get_running_loop()
+    session = _client_sessions.get(loop)
+    if session is None:
+        import aiohttp
+
+        session = _client_sessions[loop] = aiohttp.ClientSession()
+    return session
 
 
 def _fatal_code(e):
@@ -34,8 +58,32 @@ def _fatal_code(e):
 @backoff.on_exception(
     backoff.expo, requests.exceptions.RequestException, max_tries=3, giveup=_fatal_code
 )
-def post_request(url, data):
-    return client_session().post(url, json=data, raise_for_status=True)
+def post_request(url, body: bytes):
+    return client_session().post(
+        url,
+        data=body,
+        headers={
+            "Content-Type": "application/json",
+            Wire_features_header: ",".join(Client_wire_features),
+        },
+        raise_for_status=True,
+    )
+
+
+@backoff.on_exception(
+    backoff.expo, requests.exceptions.RequestException, max_tries=3, giveup=_fatal_code
+)
+def post_frames_request(url, body: AsyncIterator[bytes]):
+    return client_session().post(
+        url,
+        data=body,
+        headers={
+            "Content-Type": Frames_content_type,
+            "Accept": f"{Frames_content_type}, application/json",
+            Wire_features_header: ",".join(Client_wire_features),
+        },
+        raise_for_status=True,
+    )
 
 
 @backoff.on_exception(
@@ -46,12 +94,38 @@ def get_request(url):
 
 
 async def post(url, data):
-    async with post_request(url, data) as response:
+    return await post_json(url, encode_json(data))
+
+
+async def post_json(url, body: bytes):
+    """Like post, but with the data already encoded by encode_json"""
+    async with post_request(url, body) as response:
         if response.status >= 400:
             raise ApiCallFailedError(response.json()["message"])
         return await response.json()
 
 
+async def _aiter_frames(data, buffers) -> AsyncIterator[bytes]:
+    for piece in iter_frames(data, buffers):
+        record_request_bytes(len(piece))
+        yield piece
+        # chunks are compressed between yields; let other tasks run meanwhile
+        await asyncio.sleep(0)
+
+
+async def post_frames(url, data, buffers):
+    """
+    Like post, but sends data and the arrays in buffers as a frames body.
+    The body is streamed in chunks rather than assembled in memory.
+    """
+    async with post_frames_request(url, _aiter_frames(data, buffers)) as response:
+        if response.status >= 400:
+            raise ApiCallFailedError((await response.json())["message"])
+        if is_frames(response.headers.get("Content-Type")):
+            return decode_frames(await response.read())
+        return await response.json()
+
+
 async def get(url):
     async with get_request(url) as response:
         if response.status >= 400:
@@ -59,3 +133,13 @@ async def get(url):
                 "Unable to retrieve result, please try again later or contact support"
             )
         return await response.text()
+
+
+async def close_client_session():
+    """
+    Closes the client session of the running event loop; a new one is made
+    when next needed.  This should be done before the loop is closed.
+    """
+    session = _client_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
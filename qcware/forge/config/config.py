@@ -1,15 +1,17 @@
+import asyncio
 import contextvars
 import os
 import sys
+import time
 from contextlib import contextmanager
 from enum import Enum
 from functools import reduce
-from typing import Optional
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
 import colorama  # type: ignore
 import requests
-from decouple import config  # type: ignore
+from decouple import Csv, config  # type: ignore
 from packaging import version
 from pydantic import BaseModel, ConstrainedStr, Field
 from qcware.forge import __version__ as Qcware_client_version
@@ -124,6 +126,58 @@ def host_api_semver() -> str:
     return result
 
 
+# Seconds to wait for a host to report its wire features
+Host_wire_features_timeout = 10.0
+
+# Seconds before asking again a host which failed to report its wire
+# features (which meanwhile is taken to support none)
+Host_wire_features_retry_interval = 60.0
+
+# The wire features of each host and when to ask for them again
+_host_wire_features: Dict[str, Tuple[FrozenSet[str], float]] = {}
+
+
+def host_wire_features(host: Optional[str] = None) -> FrozenSet[str]:
+    """
+    Returns the optional wire features (such as binary transports) the host
+    reports supporting.  This is asked of each host once; hosts which do not
+    report any support none.  Hosts which cannot be reached support none
+    until they are asked again, Host_wire_features_retry_interval seconds
+    later.
+    """
+    host = qcware_host(host)
+    cached = _host_wire_features.get(host)
+    if cached is not None and time.monotonic() < cached[1]:
+        return cached[0]
+    features: FrozenSet[str] = frozenset()
+    expiry = time.monotonic() + Host_wire_features_retry_interval
+    try:
+        r = requests.get(
+            urljoin(host, "about/about"), timeout=Host_wire_features_timeout
+        )
+        if r.status_code == 200:
+            features = frozenset(r.json().get("wire_features", []))
+            expiry = float("inf")
+    except (ValueError, requests.exceptions.RequestException):
+        pass
+    _host_wire_features[host] = (features, expiry)
+    return features
+
+
+async def async_host_wire_features(host: Optional[str] = None) -> FrozenSet[str]:
+    """
+    Like host_wire_features, whose answers it shares, but the host is asked
+    in a thread, so that other tasks run meanwhile.
+    """
+    host = qcware_host(host)
+    cached = _host_wire_features.get(host)
+    if cached is not None and time.monotonic() < cached[1]:
+        return cached[0]
+    return await asyncio.get_running_loop().run_in_executor(
+        None, host_wire_features, host
+    )
+
+
 def client_api_incompatibility_message(
     client_version: version.Version, host_version: version.Version
 ) -> str:
@@ -375,6 +429,125 @@ def set_scheduling_mode(new_mode: SchedulingMode):
     os.environ["QCWARE_SCHEDULING_MODE"] = new_value.value
 
 
+class WireFormat(str, Enum):
+    """Encodings for the payloads of API calls.
+
+    'json' sends arrays base64-encoded inside a JSON document.
+
+    'binary' sends arrays as raw buffers alongside a JSON header, if the
+    host supports it, and falls back to 'json' otherwise.
+    """
+
+    json = "json"
+    binary = "binary"
+
+
+def wire_format(override: Optional[WireFormat] = None) -> WireFormat:
+    """
+    Returns the encoding requested for API call payloads.  This is
+    configurable by the environment variable QCWARE_WIRE_FORMAT.
+
+    The default is "json"; "binary" is much more efficient for calls with
+    large array arguments, but is only used with hosts supporting it.
+    """
+    result = override if override is not None else current_context().wire_format
+    return result
+
+
+def set_wire_format(new_format: WireFormat):
+    """
+    Sets the encoding ("json" or "binary") requested for API call payloads.
+    """
+    new_value = WireFormat(new_format)
+    os.environ["QCWARE_WIRE_FORMAT"] = new_value.value
+
+
+def coalesce_calls(override: Optional[bool] = None) -> bool:
+    """
+    Returns whether identical API calls made concurrently (from several
+    threads, or several coroutines) are coalesced into a single call whose
+    result is shared.  This is configurable by the environment variable
+    QCWARE_COALESCE_CALLS.
+
+    The default is False.
+    """
+    result = override if override is not None else current_context().coalesce_calls
+    return result
+
+
+def set_coalesce_calls(coalesce: bool):
+    """
+    Sets whether identical API calls made concurrently are coalesced into a
+    single call.
+    """
+    os.environ["QCWARE_COALESCE_CALLS"] = str(bool(coalesce))
+
+
+def result_spool_dir(override: Optional[str] = None) -> Optional[str]:
+    """
+    Returns the directory in which arrays of large results are stored as
+    memory-mapped files rather than held in memory, or None (the default)
+    to keep results in memory.  This is configurable by the environment
+    variable QCWARE_RESULT_SPOOL_DIR and applies to results sent in the
+    binary wire format.
+    """
+    result = override if override is not None else current_context().result_spool_dir
+    return result
+
+
+def set_result_spool_dir(directory: Optional[str]):
+    """
+    Sets the directory in which arrays of large results are memory-mapped;
+    None keeps results in memory.
+    """
+    if directory is None:
+        os.environ.pop("QCWARE_RESULT_SPOOL_DIR", None)
+    else:
+        os.environ["QCWARE_RESULT_SPOOL_DIR"] = directory
+
+
+class PollingStrategy(str, Enum):
+    """Strategies for spacing out polls of an API call's status.
+
+    'constant' waits `initial_interval` seconds between every poll.
+
+    'exponential' starts at `initial_interval` and multiplies the wait by
+    `multiplier` after every poll, up to `max_interval`, with random jitter.
+
+    'adaptive' first waits until the call is expected to be done, based on
+    how long previous calls to the same method took, and then falls back to
+    'exponential'.
+    """
+
+    constant = "constant"
+    exponential = "exponential"
+    adaptive = "adaptive"
+
+
+def polling_policy(override: Optional["PollingPolicy"] = None) -> "PollingPolicy":
+    """
+    Returns the policy used to space out polls while waiting for an API call
+    to complete.  This is configurable through the environment variables
+    QCWARE_POLLING_STRATEGY, QCWARE_POLLING_INITIAL_INTERVAL,
+    QCWARE_POLLING_MAX_INTERVAL, QCWARE_POLLING_MULTIPLIER,
+    QCWARE_POLLING_JITTER and QCWARE_POLLING_HONOR_RETRY_AFTER.
+
+    The default is exponential polling starting at 0.1 seconds and backing
+    off to at most 2 seconds.
+    """
+    result = override if override is not None else current_context().polling_policy
+    return result
+
+
+def set_polling_strategy(new_strategy: PollingStrategy):
+    """
+    Sets the polling strategy ("constant", "exponential", or "adaptive") used
+    while waiting for API calls to complete.
+    """
+    new_value = PollingStrategy(new_strategy)
+    os.environ["QCWARE_POLLING_STRATEGY"] = new_value.value
+
+
 def set_ibmq_credentials(
     token: Optional[str] = None,
     hub: Optional[str] = None,
@@ -438,6 +611,7 @@ class IBMQCredentials(BaseModel):
 
     class Config:
         extra = "forbid"
+        allow_mutation = False
 
 
 class ApiCredentials(BaseModel):
@@ -446,6 +620,7 @@ class ApiCredentials(BaseModel):
 
     class Config:
         extra = "forbid"
+        allow_mutation = False
 
 
 class Environment(BaseModel):
@@ -474,6 +649,106 @@ class Environment(BaseModel):
     environment: str
     source_file: str
 
+    class Config:
+        allow_mutation = False
+
+
+class PollingPolicy(BaseModel):
+    """How the client waits for an API call to complete.
+
+    As with `ApiCallContext`, all fields are optional so that a temporary
+    context may override only some of them; the defaults are filled in by
+    `root_context`.
+
+    strategy: a PollingStrategy
+
+    initial_interval, max_interval: the first and the largest wait between
+    polls, in seconds
+
+    multiplier: the factor by which the wait grows after every poll for the
+    exponential and adaptive strategies
+
+    jitter: the fraction by which each wait is randomly lengthened or
+    shortened, so that many waiting clients do not poll in lockstep
+
+    honor_retry_after: whether to use the wait suggested by the server (the
+    `retry_after` field of a poll response, in seconds, up to max_interval)
+    when one is given
+    """
+
+    strategy: Optional[PollingStrategy] = None
+    initial_interval: Optional[float] = None
+    max_interval: Optional[float] = None
+    multiplier: Optional[float] = None
+    jitter: Optional[float] = None
+    honor_retry_after: Optional[bool] = None
+
+    class Config:
+        extra = "forbid"
+        allow_mutation = False
+
+
+Default_result_cache_methods = [
+    "optimization.brute_force_minimize",
+    "optimization.find_optimal_qaoa_angles",
+    "qio.loader",
+    "qutils.create_qdot_circuit",
+]
+
+
+class ResultCacheConfig(BaseModel):
+    """The on-disk cache of results of deterministic API calls.
+
+    As with `ApiCallContext`, all fields are optional so that a temporary
+    context may override only some of them; the defaults are filled in by
+    `root_context`.
+
+    enabled: whether results are cached at all (off by default)
+
+    directory: where cached results are stored
+
+    max_size: the total size in bytes of the cache; the least recently used
+    results are evicted beyond it
+
+    ttl: the time in seconds after which a cached result is no longer used
+
+    methods: the names of the API calls (such as "qio.loader") whose results
+    may be cached; only calls which are deterministic functions of their
+    arguments should be listed
+    """
+
+    enabled: Optional[bool] = None
+    directory: Optional[str] = None
+    max_size: Optional[int] = None
+    ttl: Optional[float] = None
+    methods: Optional[List[str]] = None
+
+    class Config:
+        extra = "forbid"
+        allow_mutation = False
+
+
+def result_cache_config(
+    override: Optional[ResultCacheConfig] = None,
+) -> ResultCacheConfig:
+    """
+    Returns the configuration of the on-disk result cache.  This is
+    configurable through the environment variables QCWARE_RESULT_CACHE,
+    QCWARE_RESULT_CACHE_DIR, QCWARE_RESULT_CACHE_MAX_SIZE,
+    QCWARE_RESULT_CACHE_TTL and QCWARE_RESULT_CACHE_METHODS (a comma-separated
+    list of method names).
+
+    The cache is disabled by default; when enabled it holds up to 1GB for
+    up to a week in ~/.cache/qcware/results.
+    """
+    result = override if override is not None else current_context().result_cache
+    return result
+
+
+def set_result_cache_enabled(enabled: bool):
+    """Enables or disables the on-disk cache of results of deterministic calls."""
+    os.environ["QCWARE_RESULT_CACHE"] = str(bool(enabled))
+
 
 def set_environment_environment(new_environment: str):
     """Set the Environment ... environment."""
@@ -501,9 +776,27 @@ class ApiCallContext(BaseModel):
     client_timeout: Optional[int] = None
     async_interval_between_tries: Optional[float] = None
     scheduling_mode: Optional[SchedulingMode] = None
+    polling_policy: Optional[PollingPolicy] = None
+    wire_format: Optional[WireFormat] = None
+    result_spool_dir: Optional[str] = None
+    coalesce_calls: Optional[bool] = None
+    result_cache: Optional[ResultCacheConfig] = None
 
     class Config:
         extra = "forbid"
+        allow_mutation = False
+
+
+# The configuration variables read by root_context; see
+# _environment_fingerprint
+_Root_context_variables: List[str] = []
+
+
+def _tracked_config(name: str, *args, **kwargs):
+    """decouple's config, noting that the root context depends on `name`"""
+    if name not in _Root_context_variables:
+        _Root_context_variables.append(name)
+    return config(name, *args, **kwargs)
 
 
 def root_context() -> ApiCallContext:
@@ -513,39 +806,113 @@ def root_context() -> ApiCallContext:
     Used internally
     """
     return ApiCallContext(
-        qcware_host=config("QCWARE_HOST", "https://api.forge.qcware.com"),
+        qcware_host=_tracked_config("QCWARE_HOST", "https://api.forge.qcware.com"),
         credentials=ApiCredentials(
-            qcware_api_key=config("QCWARE_API_KEY", None),
+            qcware_api_key=_tracked_config("QCWARE_API_KEY", None),
             ibmq=IBMQCredentials(
-                token=config("QCWARE_CRED_IBMQ_TOKEN", None),
-                hub=config("QCWARE_CRED_IBMQ_HUB", None),
-                group=config("QCWARE_CRED_IBMQ_GROUP", None),
-                project=config("QCWARE_CRED_IBMQ_PROJECT", None),
+                token=_tracked_config("QCWARE_CRED_IBMQ_TOKEN", None),
+                hub=_tracked_config("QCWARE_CRED_IBMQ_HUB", None),
+                group=_tracked_config("QCWARE_CRED_IBMQ_GROUP", None),
+                project=_tracked_config("QCWARE_CRED_IBMQ_PROJECT", None),
             ),
         ),
         environment=Environment(
             client="qcware (python)",
             client_version=Qcware_client_version,
             python_version=sys.version,
-            environment=config("QCWARE_ENVIRONMENT_ENVIRONMENT", default="local"),
-            source_file=config("QCWARE_ENVIRONMENT_SOURCE_FILE", default=""),
+            environment=_tracked_config(
+                "QCWARE_ENVIRONMENT_ENVIRONMENT", default="local"
+            ),
+            source_file=_tracked_config("QCWARE_ENVIRONMENT_SOURCE_FILE", default=""),
         ),
-        server_timeout=config("QCWARE_SERVER_TIMEOUT", default=10, cast=int),
-        client_timeout=config("QCWARE_CLIENT_TIMEOUT", default=60, cast=int),
-        async_interval_between_tries=config(
+        server_timeout=_tracked_config("QCWARE_SERVER_TIMEOUT", default=10, cast=int),
+        client_timeout=_tracked_config("QCWARE_CLIENT_TIMEOUT", default=60, cast=int),
+        async_interval_between_tries=_tracked_config(
             "QCWARE_ASYNC_INTERVAL_BETWEEN_TRIES", 0.5, cast=float
         ),
-        scheduling_mode=config(
+        scheduling_mode=_tracked_config(
             "QCWARE_SCHEDULING_MODE", default=SchedulingMode.immediate
         ),
+        polling_policy=PollingPolicy(
+            strategy=_tracked_config(
+                "QCWARE_POLLING_STRATEGY", default=PollingStrategy.exponential
+            ),
+            initial_interval=_tracked_config(
+                "QCWARE_POLLING_INITIAL_INTERVAL", default=0.1, cast=float
+            ),
+            max_interval=_tracked_config(
+                "QCWARE_POLLING_MAX_INTERVAL", default=2.0, cast=float
+            ),
+            multiplier=_tracked_config(
+                "QCWARE_POLLING_MULTIPLIER", default=2.0, cast=float
+            ),
+            jitter=_tracked_config("QCWARE_POLLING_JITTER", default=0.1, cast=float),
+            honor_retry_after=_tracked_config(
+                "QCWARE_POLLING_HONOR_RETRY_AFTER", default=True, cast=bool
+            ),
+        ),
+        wire_format=_tracked_config("QCWARE_WIRE_FORMAT", default=WireFormat.json),
+        result_spool_dir=_tracked_config("QCWARE_RESULT_SPOOL_DIR", default=None),
+        coalesce_calls=_tracked_config(
+            "QCWARE_COALESCE_CALLS", default=False, cast=bool
+        ),
+        result_cache=ResultCacheConfig(
+            enabled=_tracked_config("QCWARE_RESULT_CACHE", default=False, cast=bool),
+            directory=_tracked_config(
+                "QCWARE_RESULT_CACHE_DIR",
+                default=os.path.join("~", ".cache", "qcware", "results"),
+                cast=os.path.expanduser,
+            ),
+            max_size=_tracked_config(
+                "QCWARE_RESULT_CACHE_MAX_SIZE", default=1 << 30, cast=int
+            ),
+            ttl=_tracked_config(
+                "QCWARE_RESULT_CACHE_TTL", default=7 * 24 * 3600, cast=float
+            ),
+            methods=_tracked_config(
+                "QCWARE_RESULT_CACHE_METHODS",
+                default=",".join(Default_result_cache_methods),
+                cast=Csv(),
+            ),
+        ),
     )
 
 
+def _environment_fingerprint() -> tuple:
+    """The current values of the environment variables read by root_context"""
+    return tuple([os.environ.get(name) for name in _Root_context_variables])
+
+
+_root_context_cache: Optional[Tuple[tuple, ApiCallContext]] = None
+
+
+def cached_root_context() -> ApiCallContext:
+    """
+    Returns root_context(), rebuilding it only when one of the environment
+    variables it reads has changed (including through the set_* functions).
+
+    Used internally
+    """
+    global _root_context_cache
+    if (
+        _root_context_cache is None
+        or _root_context_cache[0] != _environment_fingerprint()
+    ):
+        context = root_context()
+        _root_context_cache = (_environment_fingerprint(), context)
+    return _root_context_cache[1]
+
+
 _contexts: contextvars.ContextVar[ApiCallContext] = contextvars.ContextVar(
     "contexts", default=[]
 )  # type:ignore
 
 
+_resolved_context: contextvars.ContextVar[
+    Optional[Tuple[ApiCallContext, list, ApiCallContext]]
+] = contextvars.ContextVar("resolved_context", default=None)
+
+
 def push_context(**kwargs):
     """Manually pushes a configuration context onto the stack.
 
@@ -595,7 +962,9 @@ def merge_models(c1: BaseModel, c2: BaseModel) -> BaseModel:
     d1 = c1.dict()
     d2 = c2.dict()
     result_dict = deep_merge(d1, d2)
-    return c1.copy(update=result_dict)
+    # parse rather than copy(update=...) so that nested models (credentials,
+    # polling policy) come back as models rather than plain dicts
+    return type(c1).parse_obj(result_dict)
 
 
 def current_context() -> ApiCallContext:
@@ -604,10 +973,24 @@ def current_context() -> ApiCallContext:
     This is the calculated root context plus any additional changes
     through the stack.  Normally not called by the user.
 
+    The result is cached until the environment or the stack changes, so
+    the returned context is shared (and, like all contexts, immutable).
+
     """
+    root = cached_root_context()
+    stack = _contexts.get()
+    # push_context and pop_context always set a new stack, so the cached
+    # resolution is current as long as it was made from this very stack
+    # and root context.  Being a ContextVar, the cache follows the stack
+    # across threads and asyncio tasks.
+    cached = _resolved_context.get()
+    if cached is not None and cached[0] is root and cached[1] is stack:
+        return cached[2]
     # known problem below with mypy and reduce, see https://github.com/python/mypy/issues/4150
     # among others
-    return reduce(merge_models, _contexts.get(), root_context())  # type:ignore
+    result = reduce(merge_models, stack, root)  # type:ignore
+    _resolved_context.set((root, stack, result))
+    return result
 
 
 @contextmanager
@@ -30,3 +30,25 @@ or use the .submit or .call_async forms of the API call.
 See the getting started notebook "Retrieving_long_task_results.ipynb" in Forge"""
         super().__init__(message)
         self.api_call_info = api_call_info
+
+
+class ApiBatchTimeoutError(ApiTimeoutError):
+    def __init__(self, call_tokens, message=None):
+        self.call_tokens = list(call_tokens)
+        if message is None:
+            message = f"""Batch of {len(self.call_tokens)} API calls timed out.
+The calls keep running; you can retrieve their results with
+qcware.forge.api_calls.gather_results(e.call_tokens), where e is this error."""
+        super().__init__(dict(uids=self.call_tokens), message=message)
+
+
+class ApiBatchSubmissionError(ApiException):
+    def __init__(self, call_tokens, errors, message=None):
+        self.call_tokens = list(call_tokens)
+        self.errors = list(errors)
+        if message is None:
+            message = f"""{len(self.errors)} API calls of a batch failed to be submitted: {self.errors[0]!r}
+The {len(self.call_tokens)} calls submitted keep running; you can retrieve their
+results with qcware.forge.api_calls.gather_results(e.call_tokens), where e is
+this error."""
+        super().__init__(message)
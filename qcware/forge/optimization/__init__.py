@@ -4,3 +4,11 @@
 
 #  only the following line is autogenerated; further imports can be added below
 from .api import *
+
+#  add further imports below this line
+from .local import (
+    brute_force_minimize_local,
+    qaoa_expectation_value_local,
+    qaoa_sample_local,
+)
+from .qaoa_batch import qaoa_expectation_value_batch
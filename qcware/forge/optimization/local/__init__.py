@@ -0,0 +1,22 @@
+"""
+Local counterparts of some optimization API calls, for problems small
+enough to solve without a round trip to the server (or to check its
+answers).
+
+Calls to the following API calls with backend="local/numpy" are run by
+these functions, on the client, rather than sent to the server:
+
+- brute_force_minimize, by brute_force_minimize_local (an exhaustive
+  search, for problems of up to about 30 variables);
+- qaoa_expectation_value and qaoa_sample, by qaoa_expectation_value_local
+  and qaoa_sample_local (a statevector simulation, for unconstrained
+  problems of up to qaoa.Max_variables, that is 26, variables).
+
+The docstrings of the API calls themselves are generated and only list
+the server's backends.
+"""
+from qcware.forge.optimization.local.brute_force import brute_force_minimize_local
+from qcware.forge.optimization.local.qaoa import (
+    qaoa_expectation_value_local,
+    qaoa_sample_local,
+)
@@ -0,0 +1,257 @@
+"""
+Local brute-force minimization of small binary problems.
+
+The variables are split in three parts.  The last `Low_bits` variables
+are "low": every assignment of them is held at once, as the rows of a
+grid, and the objective and constraint values over the whole grid are
+kept as vectors.  The remaining "high" variables are enumerated in
+Gray-code order, so that consecutive assignments differ in a single
+variable i.  Since a polynomial is linear in each of its variables,
+flipping i changes its values by
+
+    (new x_i - old x_i) * (partial derivative of the polynomial in x_i)
+
+and the derivative is a polynomial in the other variables, which is
+precomputed for each high variable as a combination of products of low
+variables (rows of a "basis" evaluated over the grid) with coefficients
+depending on the other high variables.  Each step therefore costs one
+small matrix-vector product rather than an evaluation of the whole
+polynomial.
+
+The first high variables may further be fixed per task, so that the
+enumeration is split into independent chunks which are run across a
+process pool.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qcware.forge.api_calls.local_backends import (
+    Local_numpy_backend,
+    register_local_backend,
+)
+from qcware.types.optimization import (
+    BruteOptimizeResult,
+    Constraints,
+    Domain,
+    PolynomialObjective,
+)
+from qcware.types.optimization.predicate import Predicate
+from qcware.types.optimization.problem_spec import CompiledPolynomial
+from qcware.types.optimization.results.results_types import binary_ints_to_binstring
+
+# The number of variables whose assignments are held at once as a grid
+Low_bits = 14
+
+# Problems with more variables than this are split across a process pool
+# (unless max_workers is 1)
+Parallel_threshold = 22
+
+# The number of tasks per worker when running across a process pool
+Tasks_per_worker = 4
+
+Polynomial = Dict[Tuple[int, ...], int]
+
+
+def _low_grid(num_low: int, domain: Domain) -> np.ndarray:
+    """Every assignment of num_low variables, in lexicographic order"""
+    rows = np.arange(1 << num_low)[:, None]
+    bits = (rows >> np.arange(num_low - 1, -1, -1)) & 1
+    if domain is Domain.SPIN:
+        return (1 - 2 * bits).astype(np.int8)
+    return bits.astype(np.int8)
+
+
+class _GrayCodeEvaluator:
+    """The values of a polynomial over the low grid, updated as high bits flip"""
+
+    def __init__(
+        self,
+        polynomial: Polynomial,
+        num_variables: int,
+        domain: Domain,
+        grid: np.ndarray,
+        high_values: np.ndarray,
+    ):
+        num_high = num_variables - grid.shape[1]
+        basis_index: Dict[Tuple[int, ...], int] = {}
+        self.derivatives: List[List[Tuple[Tuple[int, ...], int, float]]] = [
+            [] for _ in range(num_high)
+        ]
+        for term, coefficient in polynomial.items():
+            high_part = tuple(v for v in term if v < num_high)
+            low_part = tuple(v - num_high for v in term if v >= num_high)
+            if not high_part:
+                continue
+            b = basis_index.setdefault(low_part, len(basis_index))
+            for i in high_part:
+                others = tuple(v for v in high_part if v != i)
+                self.derivatives[i].append((others, b, coefficient))
+        self.basis = np.ones((len(basis_index), len(grid)))
+        for low_part, b in basis_index.items():
+            for v in low_part:
+                self.basis[b] *= grid[:, v]
+        X = np.empty((len(grid), num_variables), dtype=np.int8)
+        X[:, :num_high] = high_values
+        X[:, num_high:] = grid
+        self.values = CompiledPolynomial(
+            polynomial, num_variables, domain
+        ).compute_values(X, validate=False)
+        self.values = self.values.astype(np.float64)
+
+    def flip(self, i: int, high_values: np.ndarray, new_value: int):
+        """Updates the values for high variable i taking new_value"""
+        derivative = self.derivatives[i]
+        if not derivative:
+            return
+        weights = np.zeros(len(self.basis))
+        for others, b, coefficient in derivative:
+            weights[b] += coefficient * np.prod(high_values[list(others)])
+        self.values += (new_value - high_values[i]) * (weights @ self.basis)
+
+
+def _minimize_chunk(
+    objective: Polynomial,
+    constraints: Sequence[Tuple[Predicate, Polynomial]],
+    num_variables: int,
+    domain: Domain,
+    prefix: Tuple[int, ...],
+    num_low: int,
+) -> Tuple[Optional[float], List[str]]:
+    """
+    Minimizes over the assignments whose first variables are `prefix`,
+    returning the lowest feasible value (None if there is none) and the
+    bitstrings attaining it
+    """
+    grid = _low_grid(num_low, domain)
+    num_high = num_variables - num_low
+    first_value, second_value = (0, 1) if domain is Domain.BOOLEAN else (1, -1)
+    high_values = np.full(num_high, first_value, dtype=np.int64)
+    high_values[: len(prefix)] = prefix
+    evaluators = [
+        _GrayCodeEvaluator(p, num_variables, domain, grid, high_values)
+        for p in [objective] + [p for _, p in constraints]
+    ]
+    objective_evaluator, constraint_evaluators = evaluators[0], evaluators[1:]
+
+    best_value: Optional[float] = None
+    best: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def visit():
+        nonlocal best_value, best
+        feasible = np.ones(len(grid), dtype=bool)
+        for (predicate, _), evaluator in zip(constraints, constraint_evaluators):
+            feasible &= predicate.holds(evaluator.values)
+        if not feasible.any():
+            return
+        values = np.where(feasible, objective_evaluator.values, np.inf)
+        lowest = values.min()
+        if best_value is None or lowest < best_value:
+            best_value, best = lowest, []
+        if lowest == best_value:
+            best.append((high_values.copy(), np.flatnonzero(values == lowest)))
+
+    visit()
+    num_gray = num_high - len(prefix)
+    for t in range(1, 1 << num_gray):
+        # the Gray code of t differs from that of t - 1 in its lowest set bit
+        i = len(prefix) + ((t & -t).bit_length() - 1)
+        new_value = second_value if high_values[i] == first_value else first_value
+        for evaluator in evaluators:
+            evaluator.flip(i, high_values, new_value)
+        high_values[i] = new_value
+        visit()
+
+    argmin = []
+    for high, rows in best:
+        high_string = binary_ints_to_binstring(high.tolist(), domain)
+        for row in rows:
+            argmin.append(
+                high_string + binary_ints_to_binstring(grid[row].tolist(), domain)
+            )
+    return best_value, argmin
+
+
+def brute_force_minimize_local(
+    objective: PolynomialObjective,
+    constraints: Optional[Constraints] = None,
+    max_workers: Optional[int] = None,
+) -> BruteOptimizeResult:
+    """Minimize given objective polynomial subject to constraints, locally.
+
+    This computes the same result as brute_force_minimize without
+    contacting the server, and is run by it for the backend "local/numpy".
+    It enumerates every assignment of the variables, so it is only
+    practical for problems of up to thirty or so variables. Problems of
+    more than Parallel_threshold variables are split into chunks which are
+    run across a process pool.
+
+    Args:
+        objective: The integer-coefficient polynomial to minimize.
+
+        constraints: Optional constraints that solutions must satisfy.
+
+        max_workers: The number of processes to use for large problems;
+            by default, one per CPU. With 1, no process pool is used.
+
+    Returns:
+        BruteOptimizeResult with the minimum value of the objective over
+        the assignments satisfying the constraints and the (lexicographically
+        sorted) assignments attaining it.
+    """
+    num_variables = objective.num_variables
+    domain = objective.domain
+    if constraints is not None and constraints.num_constraints() > 0:
+        if constraints.domain is not domain:
+            raise ValueError("The objective and constraints must have the same domain.")
+        constraint_list = [
+            (predicate, c.polynomial)
+            for predicate in constraints
+            for c in constraints[predicate]
+        ]
+    else:
+        constraint_list = []
+    num_low = min(num_variables, Low_bits)
+    num_high = num_variables - num_low
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers > 1 and num_variables > Parallel_threshold:
+        num_prefix = min(num_high, math.ceil(math.log2(max_workers * Tasks_per_worker)))
+    else:
+        num_prefix = 0
+    bits = [0, 1] if domain is Domain.BOOLEAN else [1, -1]
+    prefixes = [
+        tuple(bits[(p >> (num_prefix - 1 - j)) & 1] for j in range(num_prefix))
+        for p in range(1 << num_prefix)
+    ]
+    task_arguments = [
+        (objective.polynomial, constraint_list, num_variables, domain, p, num_low)
+        for p in prefixes
+    ]
+    if num_prefix == 0:
+        chunk_results = [_minimize_chunk(*args) for args in task_arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunk_results = list(executor.map(_minimize_chunk, *zip(*task_arguments)))
+
+    values = [value for value, _ in chunk_results if value is not None]
+    if not values:
+        return BruteOptimizeResult(domain=domain, solution_exists=False)
+    lowest = min(values)
+    argmin = sorted(
+        bitstring
+        for value, bitstrings in chunk_results
+        if value == lowest
+        for bitstring in bitstrings
+    )
+    if float(lowest).is_integer():
+        lowest = int(lowest)
+    return BruteOptimizeResult(domain=domain, value=lowest, argmin=argmin)
+
+
+register_local_backend(
+    "optimization.brute_force_minimize", Local_numpy_backend, brute_force_minimize_local
+)
@@ -0,0 +1,263 @@
+"""
+Local statevector simulation of QAOA for small unconstrained problems.
+
+The state of n qubits is held as a vector of 2**n amplitudes, indexed so
+that the binary digits of an index, most significant first, are the bits
+of variables 0 to n - 1 (bit 0 is the boolean value 0 or the spin value
+1; bit 1 is 1 or -1).  The QAOA state for angles beta and gamma is
+
+    exp(-i beta[p-1] B) exp(-i gamma[p-1] C) ... exp(-i beta[0] B) exp(-i gamma[0] C) |+>
+
+where C is the objective and B the sum of the Pauli X operators.  C is
+diagonal, so each exp(-i gamma C) multiplies the amplitudes by phases of
+the cost vector (see PolynomialObjective.cost_vector), which is computed
+once.  exp(-i beta B) is a rotation of each qubit, applied to a few
+qubits at a time as a small matrix product (see _apply_mixer).
+
+Several sets of angles may be simulated at once; their states are
+evolved together in blocks of at most State_block_entries amplitudes.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+from qcware.forge.api_calls.local_backends import (
+    Local_numpy_backend,
+    register_local_backend,
+)
+from qcware.types.optimization import BinaryProblem, BinaryResults
+from qcware.types.optimization.problem_spec.cost_vector import index_assignments
+
+# Problems with more variables than this are not simulated locally
+# (the state alone takes 16 * 2**n bytes)
+Max_variables = 26
+
+# The mixer is applied to this many qubits at a time
+Mixer_group_qubits = 5
+
+# Sets of angles are simulated together in blocks of states holding at
+# most about this many amplitudes
+State_block_entries = 1 << 24
+
+
+def _check_problem(problem_instance: BinaryProblem):
+    if problem_instance.constrained and problem_instance.num_constraints() > 0:
+        raise ValueError(
+            "QAOA requires an unconstrained problem; add terms to the "
+            "objective to account for the constraints."
+        )
+    if problem_instance.num_variables > Max_variables:
+        raise ValueError(
+            f"Problems of more than {Max_variables} variables cannot be "
+            f"simulated locally; found {problem_instance.num_variables}."
+        )
+
+
+def _check_angles(beta, gamma) -> Tuple[np.ndarray, np.ndarray]:
+    """beta and gamma as float arrays of shape (number of sets, p)"""
+    beta = np.asarray(beta, dtype=np.float64)
+    gamma = np.asarray(gamma, dtype=np.float64)
+    if beta.shape != gamma.shape or beta.ndim not in (1, 2):
+        raise ValueError(
+            "Expected beta and gamma of the same shape (p,) or (n_points, p); "
+            f"found {beta.shape} and {gamma.shape}."
+        )
+    return beta.reshape(-1, beta.shape[-1]), gamma.reshape(-1, gamma.shape[-1])
+
+
+def _qaoa_states(cost: np.ndarray, beta: np.ndarray, gamma: np.ndarray):
+    """
+    Yields blocks of QAOA states, one per row, for consecutive blocks of
+    the sets of angles (rows of beta and gamma)
+    """
+    num_qubits = len(cost).bit_length() - 1
+    block = max(1, State_block_entries // len(cost))
+    levels = _cost_levels(cost)
+    for start in range(0, len(beta), block):
+        betas = beta[start : start + block]
+        gammas = gamma[start : start + block]
+        states = np.full(
+            (len(betas), len(cost)), 1 / np.sqrt(len(cost)), dtype=np.complex128
+        )
+        for layer in range(betas.shape[1]):
+            states *= _phases(cost, levels, gammas[:, layer])
+            _apply_mixer(states, betas[:, layer], num_qubits)
+        yield states
+
+
+def _cost_levels(cost: np.ndarray) -> Optional[Tuple[int, np.ndarray]]:
+    """
+    For costs which are integers in a range no longer than the cost vector
+    (as for most objectives), the lowest cost and the offset of each cost
+    from it; otherwise None
+    """
+    lowest, highest = cost.min(), cost.max()
+    if highest - lowest >= len(cost) or not (cost == np.round(cost)).all():
+        return None
+    return int(lowest), (cost - lowest).astype(np.int32)
+
+
+def _phases(
+    cost: np.ndarray, levels: Optional[Tuple[int, np.ndarray]], gamma: np.ndarray
+) -> np.ndarray:
+    """exp(-i gamma C) for each gamma (a row), looked up among the phases
+    of the distinct cost levels when there are few of them"""
+    if levels is None:
+        return np.exp(-1j * np.outer(gamma, cost))
+    lowest, offsets = levels
+    level_phases = np.exp(
+        -1j * np.outer(gamma, lowest + np.arange(offsets.max(initial=0) + 1))
+    )
+    return level_phases[:, offsets]
+
+
+def _mixer_matrices(beta: np.ndarray, num_qubits: int) -> np.ndarray:
+    """exp(-i beta (X_0 + ... + X_{k-1})) on num_qubits qubits, for each beta"""
+    cos, minus_i_sin = np.cos(beta), -1j * np.sin(beta)
+    rotation = np.array([[cos, minus_i_sin], [minus_i_sin, cos]]).transpose(2, 0, 1)
+    matrices = np.ones((len(beta), 1, 1), dtype=np.complex128)
+    for _ in range(num_qubits):
+        size = 2 * matrices.shape[1]
+        matrices = np.einsum("bij,bkl->bikjl", matrices, rotation).reshape(
+            len(beta), size, size
+        )
+    return matrices
+
+
+def _apply_mixer(states: np.ndarray, beta: np.ndarray, num_qubits: int):
+    """
+    Applies exp(-i beta B) to each state (row), on Mixer_group_qubits
+    qubits at a time: the amplitudes are viewed as an array with an axis
+    for the indices of those qubits, which is multiplied by the (Kronecker
+    product of the) rotations of the qubits
+    """
+    for first in range(0, num_qubits, Mixer_group_qubits):
+        group = min(Mixer_group_qubits, num_qubits - first)
+        matrices = _mixer_matrices(beta, group)
+        rest = num_qubits - first - group
+        if rest == 0:
+            view = states.reshape(len(states), 1 << first, 1 << group)
+            view[...] = view @ matrices.transpose(0, 2, 1)
+        else:
+            view = states.reshape(len(states), 1 << first, 1 << group, 1 << rest)
+            view[...] = matrices[:, None] @ view
+
+
+def _probabilities(states: np.ndarray) -> np.ndarray:
+    return states.real**2 + states.imag**2
+
+
+def _sample_indices(
+    probabilities: np.ndarray, num_samples: int, rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    """The distinct indices drawn num_samples times and their counts"""
+    counts = rng.multinomial(num_samples, probabilities / probabilities.sum())
+    indices = np.flatnonzero(counts)
+    return indices, counts[indices]
+
+
+def qaoa_expectation_value_local(
+    problem_instance: BinaryProblem,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    num_samples: Optional[int] = None,
+    seed: Optional[int] = None,
+):
+    """Get the QAOA expectation value for a BinaryProblem, locally.
+
+    This computes what qaoa_expectation_value does without contacting the
+    server, by statevector simulation, and is run by it for the backend
+    "local/numpy". Problems of up to Max_variables (26) variables are
+    simulated, taking seconds per set of angles at about 24 variables.
+
+    Args:
+        problem_instance: Unconstrained BinaryProblem specifying the
+            objective function.
+
+        beta: Array of shape (p,) of the beta angles, or of shape
+            (n_points, p) with one set of angles per row.
+
+        gamma: Array of the gamma angles, of the same shape as beta.
+
+        num_samples: When given, the expectation value is estimated from
+            this many measurements rather than computed exactly.
+
+        seed: Seed of the random measurements.
+
+    Returns:
+        The expectation value, or an array of shape (n_points,) of the
+        expectation values for each set of angles.
+    """
+    _check_problem(problem_instance)
+    betas, gammas = _check_angles(beta, gamma)
+    cost = problem_instance.objective.cost_vector()
+    rng = np.random.default_rng(seed)
+    values = []
+    for states in _qaoa_states(cost, betas, gammas):
+        probabilities = _probabilities(states)
+        if num_samples is None:
+            values.append(probabilities @ cost)
+            continue
+        for p in probabilities:
+            indices, counts = _sample_indices(p, num_samples, rng)
+            values.append(np.array([counts @ cost[indices] / num_samples]))
+    values = np.concatenate(values)
+    return values if np.ndim(beta) == 2 else float(values[0])
+
+
+def qaoa_sample_local(
+    problem_instance: BinaryProblem,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    num_samples: int,
+    seed: Optional[int] = None,
+) -> BinaryResults:
+    """Sample the QAOA state for a BinaryProblem, locally.
+
+    This computes what qaoa_sample does without contacting the server, by
+    statevector simulation, and is run by it for the backend "local/numpy".
+    As for qaoa_expectation_value_local, problems may have up to
+    Max_variables (26) variables.
+
+    Args:
+        problem_instance: Unconstrained BinaryProblem specifying the
+            objective function.
+
+        beta: Array of shape (p,) of the beta angles.
+
+        gamma: Array of shape (p,) of the gamma angles.
+
+        num_samples: The number of samples to take from the QAOA state.
+
+        seed: Seed of the random measurements.
+
+    Returns:
+        BinaryResults providing a histogram of the samples.
+    """
+    _check_problem(problem_instance)
+    if np.ndim(beta) != 1:
+        raise ValueError("qaoa_sample takes a single set of angles of shape (p,).")
+    betas, gammas = _check_angles(beta, gamma)
+    objective = problem_instance.objective
+    states = next(_qaoa_states(objective.cost_vector(), betas, gammas))
+    indices, counts = _sample_indices(
+        _probabilities(states[0]), num_samples, np.random.default_rng(seed)
+    )
+    bitstrings = index_assignments(indices, objective.num_variables, objective.domain)
+    return BinaryResults.from_arrays(
+        bitstrings,
+        objective.compute_values(bitstrings, validate=False),
+        problem_instance,
+        counts,
+        task_metadata={},
+        result_metadata={"backend": Local_numpy_backend},
+    )
+
+
+register_local_backend(
+    "optimization.qaoa_expectation_value",
+    Local_numpy_backend,
+    qaoa_expectation_value_local,
+)
+register_local_backend(
+    "optimization.qaoa_sample", Local_numpy_backend, qaoa_sample_local
+)
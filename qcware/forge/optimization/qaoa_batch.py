@@ -0,0 +1,153 @@
+"""
+QAOA expectation values for many sets of angles at once.
+
+Angle optimizers and landscape scans evaluate the same problem at
+thousands of angles.  Hosts listing the Batched_qaoa_angles_wire_feature
+evaluate many sets of angles in one call to qaoa_expectation_value;
+other hosts take one call per set.  Either way the calls are submitted
+concurrently and, since encodings of BinaryProblems are reused (see
+binary_problem_to_wire), the problem is only serialized once.  Their
+results are gathered concurrently too.  Local backends simulate all the
+sets of angles together.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from qcware.forge.api_calls.api_call import gather_results
+from qcware.forge.api_calls.local_backends import local_backend
+from qcware.forge.async_request import close_client_session
+from qcware.forge.config import client_timeout, current_context, host_wire_features
+from qcware.forge.exceptions import (
+    ApiBatchSubmissionError,
+    ApiBatchTimeoutError,
+    ApiTimeoutError,
+)
+from qcware.forge.optimization.api import qaoa_expectation_value
+from qcware.serialization.wire_features import Batched_qaoa_angles_wire_feature
+from qcware.types.optimization import BinaryProblem
+
+# The most sets of angles sent in one call to hosts evaluating many at once
+Max_qaoa_points_per_call = 1024
+
+
+def qaoa_expectation_value_batch(
+    problem_instance: BinaryProblem,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    num_samples: Optional[int] = None,
+    backend: str = "qcware/cpu",
+    max_points_per_call: int = Max_qaoa_points_per_call,
+    max_workers: int = 8,
+) -> np.ndarray:
+    """Get QAOA expectation values for many sets of angles at once.
+
+    Args:
+        problem_instance: Unconstrained BinaryProblem specifying the
+            objective function.
+
+        beta: Array of shape (n_points, p), with one set of beta angles
+            per row.
+
+        gamma: Array of the gamma angles, of the same shape as beta.
+
+        num_samples: As for qaoa_expectation_value.
+
+        backend: As for qaoa_expectation_value; local backends (such as
+            "local/numpy") are run without contacting the server.
+
+        max_points_per_call: The most sets of angles in one call, for
+            hosts evaluating many at once; larger batches are split.
+
+        max_workers: The number of calls submitted at once.
+
+    Returns:
+        Array of shape (n_points,) of the expectation values.
+
+    Raises:
+        ApiBatchTimeoutError: If the calls are not all done within the
+            client timeout; their results may be retrieved later with the
+            call tokens it holds.
+
+        ApiBatchSubmissionError: If some calls fail to be submitted; it
+            holds their errors and the call tokens of the calls which were
+            submitted, which keep running.
+    """
+    beta = np.asarray(beta, dtype=np.float64)
+    gamma = np.asarray(gamma, dtype=np.float64)
+    if beta.shape != gamma.shape or beta.ndim != 2:
+        raise ValueError(
+            "Expected beta and gamma of the same shape (n_points, p); "
+            f"found {beta.shape} and {gamma.shape}."
+        )
+    if len(beta) == 0:
+        return np.zeros(0)
+    if local_backend(qaoa_expectation_value.name, backend) is not None:
+        return qaoa_expectation_value(
+            problem_instance=problem_instance,
+            beta=beta,
+            gamma=gamma,
+            num_samples=num_samples,
+            backend=backend,
+        )
+
+    batched = Batched_qaoa_angles_wire_feature in host_wire_features(
+        current_context().qcware_host
+    )
+    if batched:
+        starts = range(0, len(beta), max_points_per_call)
+        points = [slice(start, start + max_points_per_call) for start in starts]
+    else:
+        points = list(range(len(beta)))
+    submissions = qaoa_expectation_value.submit_many(
+        (
+            dict(
+                problem_instance=problem_instance,
+                beta=beta[p],
+                gamma=gamma[p],
+                num_samples=num_samples,
+                backend=backend,
+            )
+            for p in points
+        ),
+        max_workers=max_workers,
+    )
+    call_tokens = [s.call_token for s in submissions if s.ok]
+    errors = [s.error for s in submissions if not s.ok]
+    if errors:
+        raise ApiBatchSubmissionError(call_tokens, errors) from errors[0]
+    values = _run(_gather_values(call_tokens, client_timeout()))
+    return np.concatenate([np.reshape(v, -1) for v in values]).astype(np.float64)
+
+
+async def _gather_values(call_tokens: List[str], timeout: float) -> list:
+    """The results of the calls, in order, waiting at most timeout seconds"""
+    values = {}
+
+    async def gather():
+        async for call_token, value in gather_results(call_tokens):
+            values[call_token] = value
+
+    try:
+        await asyncio.wait_for(gather(), timeout=timeout)
+    except (asyncio.TimeoutError, ApiTimeoutError):
+        raise ApiBatchTimeoutError(call_tokens) from None
+    finally:
+        await close_client_session()
+    return [values[call_token] for call_token in call_tokens]
+
+
+def _run(coroutine):
+    """
+    Runs coroutine in a new event loop, in another thread (with the
+    current configuration) if this one already runs a loop (as in Jupyter)
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        context = contextvars.copy_context()
+        return executor.submit(context.run, asyncio.run, coroutine).result()
@@ -1,6 +1,29 @@
+import json
+from typing import Callable, Iterator, Optional
+
 import backoff
 import requests
 from qcware.forge.exceptions import ApiCallFailedError, ApiCallResultUnavailableError
+from qcware.forge.timings import record_request_bytes, record_result_bytes
+from qcware.serialization.frames import (
+    Chunk_size,
+    Frames_content_type,
+    FramesDecoder,
+    decode_frames,
+    is_frames,
+    iter_frames,
+    memmap_allocator,
+)
+from qcware.serialization.wire_features import (
+    Client_wire_features,
+    Wire_features_header,
+)
+
+# sent with requests whose responses may be decoded from either encoding
+_Accept_frames = {"Accept": f"{Frames_content_type}, application/json"}
+
+# sent with submissions, so that results may use the encodings we understand
+_Wire_features = {Wire_features_header: ",".join(Client_wire_features)}
 
 _client_session = None
 
@@ -22,25 +45,77 @@ def _fatal_code(e):
 @backoff.on_exception(
     backoff.expo, requests.exceptions.RequestException, max_tries=3, giveup=_fatal_code
 )
-def post_request(url, data):
-    return client_session().post(url, json=data)
+def post_request(url, body: bytes):
+    return client_session().post(
+        url, data=body, headers={"Content-Type": "application/json", **_Wire_features}
+    )
 
 
 @backoff.on_exception(
     backoff.expo, requests.exceptions.RequestException, max_tries=3, giveup=_fatal_code
 )
-def get_request(url):
-    return client_session().get(url)
+def post_frames_request(url, body: Callable[[], Iterator[bytes]]):
+    # the body is streamed from a fresh iterator on every attempt
+    return client_session().post(
+        url,
+        data=body(),
+        headers={
+            "Content-Type": Frames_content_type,
+            **_Accept_frames,
+            **_Wire_features,
+        },
+    )
+
+
+@backoff.on_exception(
+    backoff.expo, requests.exceptions.RequestException, max_tries=3, giveup=_fatal_code
+)
+def get_request(url, headers=None, stream=False):
+    return client_session().get(url, headers=headers, stream=stream)
+
+
+def _payload(response: requests.Response):
+    """The decoded body of a response, which may be JSON or frames"""
+    if is_frames(response.headers.get("Content-Type")):
+        return decode_frames(response.content)
+    return response.json()
+
+
+def encode_json(data) -> bytes:
+    """Encodes a JSON request body (as requests would with post(json=data))"""
+    return json.dumps(data, allow_nan=False).encode("utf-8")
 
 
 def post(url, data):
-    response = post_request(url, data)
+    return post_json(url, encode_json(data))
+
+
+def post_json(url, body: bytes):
+    """Like post, but with the data already encoded by encode_json"""
+    response = post_request(url, body)
     if response.status_code >= 400:
         print(response)
         raise ApiCallFailedError(response.json().get("message", "No message"))
     return response.json()
 
 
+def post_frames(url, data, buffers):
+    """
+    Like post, but sends data and the arrays in buffers as a frames body.
+    The body is streamed in chunks rather than assembled in memory.
+    """
+
+    def body():
+        for piece in iter_frames(data, buffers):
+            record_request_bytes(len(piece))
+            yield piece
+
+    response = post_frames_request(url, body)
+    if response.status_code >= 400:
+        raise ApiCallFailedError(response.json().get("message", "No message"))
+    return _payload(response)
+
+
 def get(url):
     response = get_request(url)
     if response.status_code >= 400:
@@ -48,3 +123,26 @@ def get(url):
             "Unable to retrieve result, please try again later or contact support"
         )
     return response.text
+
+
+def get_payload(url, spool_dir: Optional[str] = None):
+    """
+    Retrieves and decodes a JSON or frames document.  Frames documents are
+    decoded as they are downloaded, with their arrays memory-mapped from
+    files in `spool_dir` if one is given.
+    """
+    with get_request(url, headers=_Accept_frames, stream=True) as response:
+        if response.status_code >= 400:
+            raise ApiCallResultUnavailableError(
+                "Unable to retrieve result, please try again later or contact support"
+            )
+        if not is_frames(response.headers.get("Content-Type")):
+            record_result_bytes(len(response.content))
+            return json.loads(response.content)
+        decoder = FramesDecoder(
+            allocate=None if spool_dir is None else memmap_allocator(spool_dir)
+        )
+        for chunk in response.iter_content(chunk_size=Chunk_size):
+            record_result_bytes(len(chunk))
+            decoder.feed(chunk)
+        return decoder.result()
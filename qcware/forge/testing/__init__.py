@@ -0,0 +1,5 @@
+from qcware.forge.testing.mock_server import (
+    MockForgeServer,
+    MockServerConfig,
+    Default_handlers,
+)
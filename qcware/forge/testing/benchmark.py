@@ -0,0 +1,359 @@
+"""
+Benchmarks of the client's throughput against a MockForgeServer.
+
+Each benchmark makes the same calls through one of the client's paths:
+
+sync: calling the API call, one call after another
+
+async: `call_async`, with up to `concurrency` calls in flight at once
+
+batch: `submit_many`, then `gather_results`
+
+and reports the calls completed per second, the 50th and 99th
+percentile latencies of a call and the peak memory allocated by the
+client (as traced by tracemalloc, in a separate run so that tracing
+does not slow the timed one).  For the batch path, the latency of a
+call is the time from the start of the batch until its result arrived.
+
+`measure_import_time` measures the time taken to import a module in a
+fresh interpreter, such as a worker process pays on startup, and
+`measure_context_overhead` the time every call takes to resolve its
+ApiCallContext.
+
+`run_benchmarks` runs the mock server in a separate process, so that
+neither its work nor its memory is counted against the client.  From
+the command line::
+
+    python -m qcware.forge.testing.benchmark --calls 200 --latency 0.005
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import importlib
+import multiprocessing
+import socket
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from functools import reduce
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+import requests
+import tabulate
+
+from qcware.forge.api_calls import gather_results
+from qcware.forge.async_request import close_client_session
+from qcware.forge.config import (
+    WireFormat,
+    additional_config,
+    current_context,
+    merge_models,
+    root_context,
+)
+from qcware.forge.qml import fit_and_predict
+from qcware.forge.test import echo
+from qcware.forge.testing.mock_server import MockForgeServer, MockServerConfig
+
+config_module = importlib.import_module("qcware.forge.config.config")
+
+ArgumentSets = Sequence[Mapping[str, Any]]
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    workload: str
+    path: str
+    calls: int
+    seconds: float
+    p50: float
+    p99: float
+    peak_memory: Optional[int] = None
+
+    @property
+    def calls_per_second(self) -> float:
+        return self.calls / self.seconds
+
+
+def benchmark_sync(api_call, argument_sets: ArgumentSets) -> List[float]:
+    """Makes the calls one after another, returning the latency of each"""
+    latencies = []
+    for kwargs in argument_sets:
+        start = time.perf_counter()
+        api_call(**kwargs)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def benchmark_async(
+    api_call, argument_sets: ArgumentSets, concurrency: int = 16
+) -> List[float]:
+    """Makes the calls with call_async, returning the latency of each"""
+
+    async def timed_call(semaphore: asyncio.Semaphore, kwargs):
+        async with semaphore:
+            start = time.perf_counter()
+            await api_call.call_async(**kwargs)
+            return time.perf_counter() - start
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        try:
+            return await asyncio.gather(
+                *(timed_call(semaphore, kwargs) for kwargs in argument_sets)
+            )
+        finally:
+            await close_client_session()
+
+    return list(asyncio.run(run()))
+
+
+def benchmark_batch(
+    api_call,
+    argument_sets: ArgumentSets,
+    max_workers: int = 8,
+    max_in_flight: int = 32,
+) -> List[float]:
+    """
+    Submits the calls with submit_many and retrieves them with
+    gather_results, returning the time from the start until each
+    result arrived
+    """
+
+    async def gather(call_tokens):
+        latencies = []
+        try:
+            async for _ in gather_results(call_tokens, max_in_flight=max_in_flight):
+                latencies.append(time.perf_counter() - start)
+        finally:
+            await close_client_session()
+        return latencies
+
+    start = time.perf_counter()
+    submissions = api_call.submit_many(argument_sets, max_workers=max_workers)
+    for submission in submissions:
+        if not submission.ok:
+            raise submission.error
+    return asyncio.run(gather([s.call_token for s in submissions]))
+
+
+Paths: Dict[str, Callable[..., List[float]]] = {
+    "sync": benchmark_sync,
+    "async": benchmark_async,
+    "batch": benchmark_batch,
+}
+
+
+def run_benchmark(
+    workload: str,
+    path: str,
+    api_call,
+    argument_sets: ArgumentSets,
+    measure_memory: bool = True,
+) -> BenchmarkResult:
+    """Runs the benchmark of one path with the calls of one workload"""
+    benchmark = Paths[path]
+    start = time.perf_counter()
+    latencies = benchmark(api_call, argument_sets)
+    seconds = time.perf_counter() - start
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            benchmark(api_call, argument_sets)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return BenchmarkResult(
+        workload=workload,
+        path=path,
+        calls=len(argument_sets),
+        seconds=seconds,
+        p50=float(np.percentile(latencies, 50)),
+        p99=float(np.percentile(latencies, 99)),
+        peak_memory=peak_memory,
+    )
+
+
+def echo_workload(num_calls: int):
+    """Small calls with small results"""
+    return echo, [dict(text=f"call {i}") for i in range(num_calls)]
+
+
+def array_workload(num_calls: int, rows: int = 10000, columns: int = 8):
+    """Calls carrying arrays of `rows` samples each way"""
+    rng = np.random.default_rng(0)
+    X = rng.random((rows, columns))
+    y = rng.integers(0, 2, size=rows)
+    return fit_and_predict, [
+        dict(X=X, y=y, T=X, model="QNearestCentroid") for _ in range(num_calls)
+    ]
+
+
+def measure_import_time(module: str = "qcware.forge", repeat: int = 5) -> float:
+    """
+    The median time in seconds, over `repeat` fresh interpreters, taken to
+    import `module` (as reported by python -X importtime)
+    """
+    times = []
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        # the last line reports the module itself, cumulative time in us
+        last_line = process.stderr.strip().splitlines()[-1]
+        times.append(int(last_line.split("|")[1]) / 1e6)
+    return float(np.median(times))
+
+
+def measure_context_overhead(
+    num_contexts: int = 0, number: int = 2000
+) -> Dict[str, float]:
+    """
+    The time in seconds taken by current_context(), as made by every call,
+    with num_contexts contexts pushed: "cached" as it is, and "uncached"
+    when the context is resolved again from the environment every time (as
+    it was before it was cached)
+    """
+
+    def uncached():
+        return reduce(merge_models, config_module._contexts.get(), root_context())
+
+    with contextlib.ExitStack() as stack:
+        for i in range(num_contexts):
+            stack.enter_context(additional_config(server_timeout=10 + i))
+        return {
+            name: min(timeit.repeat(f, number=number, repeat=3)) / number
+            for name, f in [("cached", current_context), ("uncached", uncached)]
+        }
+
+
+def _serve(config: Optional[MockServerConfig], port: int):
+    MockForgeServer(config).serve(port=port, quiet=True)
+
+
+@contextlib.contextmanager
+def mock_server_process(
+    config: Optional[MockServerConfig] = None, startup_timeout: float = 30
+) -> Iterator[str]:
+    """Runs a MockForgeServer in a separate process, yielding its url"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(config, port), daemon=True
+    )
+    process.start()
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                if requests.get(f"{url}/about/about").status_code == 200:
+                    break
+            except requests.exceptions.ConnectionError:
+                pass
+            if not process.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("The mock server did not start")
+            time.sleep(0.05)
+        yield url
+    finally:
+        process.terminate()
+        process.join()
+
+
+def run_benchmarks(
+    num_calls: int = 100,
+    server_config: Optional[MockServerConfig] = None,
+    wire_format: WireFormat = WireFormat.json,
+    paths: Sequence[str] = tuple(Paths),
+    array_rows: int = 10000,
+    measure_memory: bool = True,
+) -> List[BenchmarkResult]:
+    """Runs every path with the echo and array workloads"""
+    workloads = {
+        "echo": echo_workload(num_calls),
+        "arrays": array_workload(num_calls, rows=array_rows),
+    }
+    results = []
+    with mock_server_process(server_config) as url:
+        with additional_config(qcware_host=url, wire_format=wire_format):
+            for workload, (api_call, argument_sets) in workloads.items():
+                for path in paths:
+                    results.append(
+                        run_benchmark(
+                            workload, path, api_call, argument_sets, measure_memory
+                        )
+                    )
+    return results
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    return tabulate.tabulate(
+        [
+            [
+                r.workload,
+                r.path,
+                r.calls,
+                f"{r.calls_per_second:.1f}",
+                f"{r.p50 * 1000:.1f}",
+                f"{r.p99 * 1000:.1f}",
+                "n/a" if r.peak_memory is None else f"{r.peak_memory / 1024:.0f}",
+            ]
+            for r in results
+        ],
+        headers=[
+            "workload",
+            "path",
+            "calls",
+            "calls/s",
+            "p50 ms",
+            "p99 ms",
+            "peak KiB",
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the client against a mock Forge host"
+    )
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--queue-delay", type=float, default=0.0)
+    parser.add_argument("--array-rows", type=int, default=10000)
+    parser.add_argument(
+        "--wire-format", choices=[f.value for f in WireFormat], default="json"
+    )
+    parser.add_argument("--paths", nargs="+", choices=list(Paths), default=list(Paths))
+    parser.add_argument("--no-memory", action="store_true")
+    args = parser.parse_args()
+    results = run_benchmarks(
+        num_calls=args.calls,
+        server_config=MockServerConfig(
+            latency=args.latency, queue_delay=args.queue_delay
+        ),
+        wire_format=WireFormat(args.wire_format),
+        paths=args.paths,
+        array_rows=args.array_rows,
+        measure_memory=not args.no_memory,
+    )
+    print(f"import qcware.forge: {measure_import_time() * 1000:.1f}ms")
+    for num_contexts in [0, 2]:
+        overhead = measure_context_overhead(num_contexts)
+        print(
+            f"current_context() with {num_contexts} pushed contexts: "
+            f"{overhead['cached'] * 1e6:.1f}us "
+            f"(uncached {overhead['uncached'] * 1e6:.1f}us)"
+        )
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+A local stand-in for the Forge API, for exercising and benchmarking the
+client without a connection to a real host.
+
+The server implements the endpoints the client uses: submission to
+each method's endpoint, polling (`/api_calls`), `/api_calls/status`,
+`/api_calls/params`, `/api_calls/cancel`, `/about/about` and the
+downloads of results and parameters from `result_url` and `params_url`.
+Calls are not actually run; a handler registered for the method
+computes a stand-in result, which becomes available `queue_delay`
+seconds after submission.  Every request is answered after `latency`
+seconds, as if made over a network.
+
+The server may be run in a background thread of the current process::
+
+    with MockForgeServer(MockServerConfig(latency=0.01)) as server:
+        with additional_config(qcware_host=server.url):
+            echo(text="hello")
+
+or on its own with `python -m qcware.forge.testing.mock_server`.
+"""
+import argparse
+import asyncio
+import dataclasses
+import datetime
+import json
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+from aiohttp import web
+
+from qcware.forge.config import client_api_semver
+from qcware.forge.optimization.local.qaoa import qaoa_expectation_value_local
+from qcware.serialization.frames import (
+    Frames_content_type,
+    Frames_wire_feature,
+    decode_frames,
+    encode_frames,
+    is_frames,
+)
+from qcware.serialization.transforms import (
+    server_args_from_wire,
+    server_result_to_wire,
+)
+from qcware.serialization.transforms.helpers import collect_ndarray_buffers
+from qcware.serialization.transforms.transform_results import result_represents_error
+from qcware.serialization.wire_features import (
+    Batched_qaoa_angles_wire_feature,
+    Sparse_polynomials_wire_feature,
+    Wire_features_header,
+    enable_wire_features,
+    parse_wire_features,
+)
+
+
+@dataclasses.dataclass
+class MockServerConfig:
+    """
+    The behaviour of a MockForgeServer.
+
+    latency: seconds added to the handling of every request
+
+    queue_delay: seconds from the submission of a call until its result
+    is available
+
+    result_size: the number of elements of array results; by default as
+    many as there are samples in the call's input
+
+    inline_result_limit: results whose JSON encoding is longer than this
+    many bytes are served from a result_url rather than in the poll response
+
+    wire_features: the optional wire features reported in /about/about
+    """
+
+    latency: float = 0.0
+    queue_delay: float = 0.0
+    result_size: Optional[int] = None
+    inline_result_limit: int = 4096
+    wire_features: Tuple[str, ...] = (
+        Frames_wire_feature,
+        Sparse_polynomials_wire_feature,
+        Batched_qaoa_angles_wire_feature,
+    )
+
+
+# a handler receives the server configuration and the arguments of a call
+# (as from server_args_from_wire) and returns the result of the call
+Handler = Callable[..., Any]
+
+
+def _echo(config: MockServerConfig, text: str, **kwargs):
+    return text
+
+
+def _labels(config: MockServerConfig, X, T=None, **kwargs):
+    samples = X if T is None else T
+    size = len(samples) if config.result_size is None else config.result_size
+    return np.random.default_rng().integers(0, 2, size=size)
+
+
+def _qaoa_expectation_value(
+    config: MockServerConfig, problem_instance, beta, gamma, num_samples=None, **kwargs
+):
+    # simulated exactly; the backend is ignored
+    if (
+        np.ndim(beta) != 1
+        and Batched_qaoa_angles_wire_feature not in config.wire_features
+    ):
+        raise ValueError("Expected angles of shape (p,).")
+    return qaoa_expectation_value_local(problem_instance, beta, gamma, num_samples)
+
+
+Default_handlers: Dict[str, Handler] = {
+    "test.echo": _echo,
+    "qml.fit_and_predict": _labels,
+    "optimization.qaoa_expectation_value": _qaoa_expectation_value,
+}
+
+
+@dataclasses.dataclass
+class _MockCall:
+    uid: str
+    method: str
+    params_body: bytes
+    params_content_type: str
+    ready_at: float
+    wire_features: FrozenSet[str] = frozenset()
+    state: str = "open"
+    result: Any = None
+    wire_result: Any = None
+    wire_size: int = 0
+    time_created: str = dataclasses.field(
+        default_factory=lambda: datetime.datetime.utcnow().isoformat()
+    )
+
+
+class MockForgeServer:
+    """
+    A mock Forge host.  `handlers` maps method names (such as "test.echo")
+    to Handlers, adding to or replacing the Default_handlers; calls to
+    methods without a handler fail as they would on the host.
+    """
+
+    def __init__(
+        self,
+        config: Optional[MockServerConfig] = None,
+        handlers: Optional[Dict[str, Handler]] = None,
+    ):
+        self.config = MockServerConfig() if config is None else config
+        self.handlers = {**Default_handlers, **({} if handlers is None else handlers)}
+        self.calls: Dict[str, _MockCall] = {}
+        self.url: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def application(self) -> web.Application:
+        # request bodies may hold large arrays
+        app = web.Application(middlewares=[self._add_latency], client_max_size=1 << 34)
+        app.add_routes(
+            [
+                web.get("/about/about", self.about),
+                web.post("/api_calls", self.poll),
+                web.post("/api_calls/status", self.status),
+                web.post("/api_calls/params", self.params),
+                web.post("/api_calls/cancel", self.cancel),
+                web.get("/results/{uid}", self.result),
+                web.get("/params/{uid}", self.params_body),
+                web.post("/{endpoint:.+}", self.submit),
+            ]
+        )
+        return app
+
+    @web.middleware
+    async def _add_latency(self, request: web.Request, handler):
+        if self.config.latency > 0:
+            await asyncio.sleep(self.config.latency)
+        return await handler(request)
+
+    def _call(self, uid: str) -> _MockCall:
+        if uid not in self.calls:
+            raise web.HTTPNotFound(
+                text=json.dumps(dict(message=f"No such call {uid}")),
+                content_type="application/json",
+            )
+        return self.calls[uid]
+
+    def _finish(self, call: _MockCall):
+        if call.state == "open" and time.monotonic() >= call.ready_at:
+            call.state = (
+                "error" if result_represents_error(call.wire_result) else "success"
+            )
+
+    def _record(self, call: _MockCall, request: web.Request, with_result=True):
+        self._finish(call)
+        record = dict(
+            uid=call.uid,
+            method=call.method,
+            state=call.state,
+            time_created=call.time_created,
+        )
+        if with_result and call.state in ("success", "error"):
+            if call.wire_size > self.config.inline_result_limit:
+                record[
+                    "result_url"
+                ] = f"{request.scheme}://{request.host}/results/{call.uid}"
+            else:
+                record["result"] = call.wire_result
+        return record
+
+    async def about(self, request: web.Request):
+        return web.json_response(
+            dict(
+                api_semver=client_api_semver(),
+                wire_features=list(self.config.wire_features),
+            )
+        )
+
+    async def submit(self, request: web.Request):
+        method = request.match_info["endpoint"].replace("/", ".")
+        content_type = request.headers.get("Content-Type", "application/json")
+        body = await request.read()
+        data = decode_frames(body) if is_frames(content_type) else json.loads(body)
+        call = _MockCall(
+            uid=str(uuid.uuid4()),
+            method=method,
+            params_body=body,
+            params_content_type=content_type,
+            ready_at=time.monotonic() + self.config.queue_delay,
+            # results may use the optional encodings the submitting client knows
+            wire_features=parse_wire_features(
+                request.headers.get(Wire_features_header)
+            ),
+        )
+        try:
+            args = server_args_from_wire(method, **data)
+            args.pop("api_call_context", None)
+            if method not in self.handlers:
+                raise NotImplementedError(
+                    f"The mock server does not implement {method}"
+                )
+            call.result = self.handlers[method](self.config, **args)
+        except Exception as e:
+            call.result = dict(error=str(e), traceback=traceback.format_exc())
+        with enable_wire_features(call.wire_features):
+            call.wire_result = server_result_to_wire(method, call.result)
+        call.wire_size = len(json.dumps(call.wire_result))
+        self.calls[call.uid] = call
+        return web.json_response(self._record(call, request, with_result=False))
+
+    async def poll(self, request: web.Request):
+        data = await request.json()
+        call = self._call(data["call_token"])
+        # like the host, wait for the call to finish for up to the server timeout
+        server_timeout = data.get("api_call_context", {}).get("server_timeout", 0)
+        if call.state == "open":
+            await asyncio.sleep(
+                max(0, min(call.ready_at - time.monotonic(), server_timeout))
+            )
+        return web.json_response(self._record(call, request))
+
+    async def status(self, request: web.Request):
+        data = await request.json()
+        call = self._call(data["call_token"])
+        return web.json_response(self._record(call, request, with_result=False))
+
+    async def cancel(self, request: web.Request):
+        data = await request.json()
+        call = self._call(data["call_token"])
+        self._finish(call)
+        if call.state == "open":
+            call.state = "cancelled"
+        return web.json_response(self._record(call, request, with_result=False))
+
+    async def params(self, request: web.Request):
+        data = await request.json()
+        call = self._call(data["call_token"])
+        return web.json_response(
+            dict(
+                uid=call.uid,
+                method=call.method,
+                params_url=f"{request.scheme}://{request.host}/params/{call.uid}",
+            )
+        )
+
+    async def params_body(self, request: web.Request):
+        call = self._call(request.match_info["uid"])
+        return web.Response(
+            body=call.params_body,
+            headers={"Content-Type": call.params_content_type},
+        )
+
+    async def result(self, request: web.Request):
+        call = self._call(request.match_info["uid"])
+        accepted = request.headers.get("Accept", "")
+        if (
+            Frames_wire_feature in self.config.wire_features
+            and Frames_content_type in accepted
+        ):
+            with collect_ndarray_buffers() as buffers, enable_wire_features(
+                call.wire_features
+            ):
+                wire_result = server_result_to_wire(call.method, call.result)
+            return web.Response(
+                body=encode_frames(wire_result, buffers),
+                headers={"Content-Type": Frames_content_type},
+            )
+        return web.json_response(call.wire_result)
+
+    async def _start(self, host: str, port: int):
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        self.url = f"http://{bound_host}:{bound_port}"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Serves from a background thread, returning the url of the server.
+        By default an unused port is chosen.
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="mock-forge-server", daemon=True
+        )
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(host, port), self._loop).result()
+        return self.url
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop, self._thread, self._runner, self.url = None, None, None, None
+
+    def serve(self, host: str = "127.0.0.1", port: int = 5454, quiet: bool = False):
+        """Serves in the foreground until interrupted"""
+        web.run_app(
+            self.application(), host=host, port=port, print=None if quiet else print
+        )
+
+    def __enter__(self) -> "MockForgeServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a mock Forge host")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5454)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--queue-delay", type=float, default=0.0)
+    parser.add_argument("--result-size", type=int, default=None)
+    parser.add_argument("--inline-result-limit", type=int, default=4096)
+    parser.add_argument(
+        "--json-only",
+        action="store_true",
+        help="do not offer the binary (frames) transport",
+    )
+    args = parser.parse_args()
+    config = MockServerConfig(
+        latency=args.latency,
+        queue_delay=args.queue_delay,
+        result_size=args.result_size,
+        inline_result_limit=args.inline_result_limit,
+        wire_features=() if args.json_only else (Frames_wire_feature,),
+    )
+    MockForgeServer(config).serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Timing instrumentation of API calls.
+
+Every call made through an ApiCall (`do`, `call_async` and `submit`)
+records a `CallTimings`, which breaks down where the time went:
+
+bind: binding the arguments to the call's signature
+
+to_wire: client_args_to_wire
+
+encode: encoding the wire arguments as JSON (for the binary transport,
+only the header; arrays are compressed while being sent)
+
+post: posting the call to the host
+
+poll: each poll of the call's status, recorded separately in `polls`
+
+download: retrieving the result from result_url
+
+from_wire: client_result_from_wire
+
+as well as the time spent queued (from submission until the call was
+first seen in a state other than "new") and the sizes of the request
+and the downloaded result in bytes.
+
+When a call is complete its timings are passed to every hook registered
+with `register_timing_hook`; `log_timings` is such a hook, and
+`collect_timings` aggregates the timings of calls made within it.
+"""
+import contextvars
+import dataclasses
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from qcware.forge import logger
+
+
+@dataclasses.dataclass
+class CallTimings:
+    """The timings of a single API call; all times are in seconds."""
+
+    method: str
+    call_token: Optional[str] = None
+    total: Optional[float] = None
+    stages: Dict[str, float] = dataclasses.field(default_factory=dict)
+    polls: List[float] = dataclasses.field(default_factory=list)
+    queue_time: Optional[float] = None
+    request_bytes: int = 0
+    result_bytes: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+    submitted_at: Optional[float] = dataclasses.field(default=None, repr=False)
+
+
+TimingHook = Callable[[CallTimings], None]
+
+_timing_hooks: List[TimingHook] = []
+
+_current_timings: contextvars.ContextVar[
+    Optional[CallTimings]
+] = contextvars.ContextVar("current_timings", default=None)
+
+
+def register_timing_hook(hook: TimingHook):
+    """Calls `hook` with the CallTimings of every completed API call"""
+    _timing_hooks.append(hook)
+
+
+def unregister_timing_hook(hook: TimingHook):
+    _timing_hooks.remove(hook)
+
+
+def current_timings() -> Optional[CallTimings]:
+    """The timings of the API call being made, if any"""
+    return _current_timings.get()
+
+
+@contextmanager
+def timed_call(method: str) -> Iterator[CallTimings]:
+    """
+    Records the timings of an API call made within the context, passing
+    them to the timing hooks at the end.  If no hooks are registered,
+    nothing is recorded.
+    """
+    if not _timing_hooks:
+        yield CallTimings(method=method)
+        return
+    timings = CallTimings(method=method)
+    token = _current_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    except BaseException as e:
+        timings.error = type(e).__name__
+        raise
+    finally:
+        timings.total = time.perf_counter() - start
+        _current_timings.reset(token)
+        for hook in list(_timing_hooks):
+            try:
+                hook(timings)
+            except Exception as e:
+                logger.warning(f"Timing hook {hook} failed: {e}")
+
+
+@contextmanager
+def timed(stage: str):
+    """Adds the time spent within the context to `stage` of the current call"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings.stages[stage] = timings.stages.get(stage, 0.0) + elapsed
+
+
+def record_submitted(call_token: str):
+    """Notes that the current call has been submitted"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.call_token = call_token
+        timings.submitted_at = time.perf_counter()
+
+
+def record_request_bytes(num_bytes: int):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.request_bytes += num_bytes
+
+
+def record_result_bytes(num_bytes: int):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.result_bytes += num_bytes
+
+
+def record_poll(seconds: float, state: Optional[str]):
+    """Notes a poll of the current call, which found it in `state`"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.polls.append(seconds)
+        if (
+            timings.queue_time is None
+            and state != "new"
+            and timings.submitted_at is not None
+        ):
+            timings.queue_time = time.perf_counter() - timings.submitted_at
+
+
+def log_timings(timings: CallTimings, level: int = logging.DEBUG):
+    """A timing hook which logs a one-line breakdown of each call"""
+    if logger.isEnabledFor(level):
+        stages = ", ".join(f"{k} {v * 1000:.1f}ms" for k, v in timings.stages.items())
+        queue_time = (
+            "n/a" if timings.queue_time is None else f"{timings.queue_time:.3f}s"
+        )
+        logger.log(
+            level,
+            f"{timings.method} ({timings.call_token}) took {timings.total:.3f}s: "
+            f"{stages}; {len(timings.polls)} polls taking {sum(timings.polls):.3f}s; "
+            f"queued {queue_time}; sent {timings.request_bytes} bytes, "
+            f"downloaded {timings.result_bytes} bytes",
+        )
+
+
+class TimingsCollector:
+    """
+    Aggregates the timings of calls by method.  `samples[method][measure]`
+    lists the values of a measure (a stage name, or one of "total", "poll",
+    "queue_time", "request_bytes" or "result_bytes") over all calls to the
+    method.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.samples: Dict[str, Dict[str, List[float]]] = {}
+
+    def __call__(self, timings: CallTimings):
+        self.calls[timings.method] = self.calls.get(timings.method, 0) + 1
+        samples = self.samples.setdefault(timings.method, {})
+
+        def add(measure: str, value: Optional[float]):
+            if value is not None:
+                samples.setdefault(measure, []).append(value)
+
+        add("total", timings.total)
+        for stage, seconds in timings.stages.items():
+            add(stage, seconds)
+        for seconds in timings.polls:
+            add("poll", seconds)
+        add("queue_time", timings.queue_time)
+        add("request_bytes", timings.request_bytes)
+        add("result_bytes", timings.result_bytes)
+
+    def histogram(self, method: str, measure: str, bins=10):
+        """The histogram (counts, bin edges) of a measure, as from np.histogram"""
+        return np.histogram(self.samples[method][measure], bins=bins)
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """The count, mean, 50th, 90th and 99th percentile of every measure"""
+        return {
+            method: {
+                measure: dict(
+                    count=len(values),
+                    mean=float(np.mean(values)),
+                    p50=float(np.percentile(values, 50)),
+                    p90=float(np.percentile(values, 90)),
+                    p99=float(np.percentile(values, 99)),
+                )
+                for measure, values in samples.items()
+            }
+            for method, samples in self.samples.items()
+        }
+
+
+@contextmanager
+def collect_timings() -> Iterator[TimingsCollector]:
+    """
+    Collects the timings of all API calls completed within the context, such
+    as for profiling a workload::
+
+        with collect_timings() as collector:
+            run_workload()
+        print(collector.summary())
+    """
+    collector = TimingsCollector()
+    register_timing_hook(collector)
+    try:
+        yield collector
+    finally:
+        unregister_timing_hook(collector)
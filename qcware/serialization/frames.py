@@ -0,0 +1,309 @@
+"""
+A binary transport for API call payloads which carry large arrays.
+
+In the JSON transport every array is base64-encoded into the document,
+which inflates it by a third and costs a full copy in the JSON encoder
+and again in the decoder.  A "frames" body instead holds a JSON header
+followed by the raw bytes of each array::
+
+    magic | header length | header | buffer 0 | buffer 1 | ...
+
+The header is the usual JSON document, except that the "ndarray" field
+of each serialized array is replaced by the index of its buffer under
+`Buffer_key`.  Each buffer is written as a sequence of length-prefixed
+chunks ending with an empty chunk, so that it may be produced without
+knowing its size in advance.  All lengths are little-endian unsigned
+64-bit integers.
+
+`iter_frames` produces the body piece by piece, slicing (and, if
+requested, compressing) each array `Chunk_size` bytes at a time, so a
+body may be streamed to the host while holding little more than the
+arrays themselves in memory.
+
+On decoding, buffers which arrive in a single chunk are handed to
+`dict_to_ndarray` as views into the body, so uncompressed arrays are
+read with `np.frombuffer` without any copy at all.  A body being
+downloaded can instead be fed piece by piece to a `FramesDecoder`,
+which decompresses each chunk straight into a preallocated array (in
+memory, or memory-mapped from a file with `memmap_allocator`), so the
+body is never held in full.
+
+Clients only use frames when configured to (the `wire_format` of the
+context) and when the host lists `Frames_wire_feature` among its wire
+features; otherwise payloads are sent as JSON.
+"""
+import json
+import os
+import struct
+import tempfile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+import lz4.frame
+import numpy as np
+
+Frames_wire_feature = "frames"
+Frames_content_type = "application/x-qcware-frames"
+Buffer_key = "$buffer"
+Chunk_size = 1 << 20
+
+_Magic = b"QCWF\x01"
+_Length = struct.Struct("<Q")
+_End_of_buffer = _Length.pack(0)
+
+
+class ArrayBuffer:
+    """The raw contents of an array to be sent as a buffer of a frames body."""
+
+    def __init__(self, array: np.ndarray, compression: str):
+        self.array = np.ascontiguousarray(array)
+        self.compression = compression
+
+    def chunks(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """
+        The bytes of the buffer, compressed as requested, in non-empty chunks.
+        Uncompressed chunks are views of the array rather than copies; when
+        compressing, a single lz4 frame is produced from slices of
+        `chunk_size` bytes.
+        """
+        chunk_size = Chunk_size if chunk_size is None else chunk_size
+        data = self.array.reshape(-1).view(np.uint8).data
+        slices = (data[i : i + chunk_size] for i in range(0, len(data), chunk_size))
+        if self.compression == "lz4":
+            compressor = lz4.frame.LZ4FrameCompressor()
+            yield compressor.begin()
+            for s in slices:
+                compressed = compressor.compress(s)
+                if len(compressed) > 0:
+                    yield compressed
+            yield compressor.flush()
+        else:
+            yield from slices
+
+
+class RawBuffer:
+    """
+    Bytes which are already in the form of a buffer, such as the "ndarray"
+    entry of an array decoded from another frames body.
+    """
+
+    def __init__(self, data):
+        self.data = memoryview(data).cast("B")
+
+    def chunks(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        chunk_size = Chunk_size if chunk_size is None else chunk_size
+        for i in range(0, len(self.data), chunk_size):
+            yield self.data[i : i + chunk_size]
+
+
+def is_frames(content_type: str) -> bool:
+    """Whether a Content-Type header denotes a frames body"""
+    return content_type is not None and content_type.startswith(Frames_content_type)
+
+
+def iter_frames(
+    data: Any, buffers: Sequence[Union[ArrayBuffer, RawBuffer]]
+) -> Iterator[bytes]:
+    """
+    Yields the pieces of the frames body holding `data` and `buffers`, for
+    use as a streamed request body.  Pieces may be views of the arrays, so
+    those should not be modified until the body has been sent.
+    """
+    header = json.dumps(data).encode("utf-8")
+    yield _Magic + _Length.pack(len(header)) + header
+    for buffer in buffers:
+        for chunk in buffer.chunks():
+            yield _Length.pack(len(chunk))
+            yield chunk
+        yield _End_of_buffer
+
+
+def encode_frames(data: Any, buffers: Sequence[Union[ArrayBuffer, RawBuffer]]) -> bytes:
+    """Encodes `data`, whose arrays are held in `buffers`, as a frames body"""
+    return b"".join(iter_frames(data, buffers))
+
+
+def _read_length(body: memoryview, position: int) -> int:
+    if position + _Length.size > len(body):
+        raise ValueError("Truncated frames body")
+    return _Length.unpack_from(body, position)[0]
+
+
+def decode_frames(body) -> Any:
+    """
+    Decodes a frames body (any bytes-like object), returning the JSON header
+    with the buffer of each array in place of its base64 data.
+    """
+    body = memoryview(body).cast("B")
+    if body[: len(_Magic)] != _Magic:
+        raise ValueError("Not a frames body")
+    position = len(_Magic)
+    header_length = _read_length(body, position)
+    position += _Length.size
+    header = body[position : position + header_length]
+    position += header_length
+
+    buffers: List[Any] = []
+    while position < len(body):
+        chunks = []
+        while True:
+            length = _read_length(body, position)
+            position += _Length.size
+            if length == 0:
+                break
+            if position + length > len(body):
+                raise ValueError("Truncated frames body")
+            chunks.append(body[position : position + length])
+            position += length
+        buffers.append(chunks[0] if len(chunks) == 1 else b"".join(chunks))
+
+    def resolve_buffer(d: dict):
+        if Buffer_key in d:
+            d["ndarray"] = buffers[d.pop(Buffer_key)]
+        return d
+
+    return json.loads(str(header, "utf-8"), object_hook=resolve_buffer)
+
+
+Allocator = Callable[[tuple, np.dtype], np.ndarray]
+
+
+def memmap_allocator(directory: str) -> Allocator:
+    """
+    Allocates arrays memory-mapped from files in `directory`, so that large
+    results are paged from disk rather than held in memory.  The files are
+    removed once mapped (where the platform allows it) and their space is
+    released when the arrays are garbage-collected.
+    """
+
+    def allocate(shape: tuple, dtype: np.dtype) -> np.ndarray:
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype)
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".qcware")
+        os.close(fd)
+        try:
+            return np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                # Windows will not remove a mapped file
+                pass
+
+    return allocate
+
+
+class FramesDecoder:
+    """
+    Incrementally decodes a frames body which is fed to it in pieces of any
+    size, such as those of a streamed HTTP response.
+
+    Once the header has arrived each array is allocated with `allocate`
+    (np.empty by default) and its chunks are decompressed straight into
+    it as they come, so only the arrays and a single piece are held in
+    memory at any time.  `result()` returns the decoded header with each
+    array in place of its buffer, as for decode_frames.
+    """
+
+    def __init__(self, allocate: Optional[Allocator] = None):
+        self._allocate = np.empty if allocate is None else allocate
+        self._state = "preamble"
+        self._pending = bytearray()
+        self._needed = len(_Magic) + _Length.size
+        self._remaining = 0
+        self._data: Any = None
+        self._arrays: Dict[int, dict] = {}
+        self._buffer_index = 0
+        self._target: Optional[memoryview] = None
+        self._offset = 0
+        self._decompressor: Optional[lz4.frame.LZ4FrameDecompressor] = None
+
+    def feed(self, data):
+        """Decodes the next piece of the body"""
+        data = memoryview(data).cast("B")
+        while len(data) > 0:
+            if self._state == "chunk":
+                n = min(self._remaining, len(data))
+                self._write(data[:n])
+                data = data[n:]
+                self._remaining -= n
+                if self._remaining == 0:
+                    self._expect("length", _Length.size)
+            else:
+                n = min(self._needed - len(self._pending), len(data))
+                self._pending += data[:n]
+                data = data[n:]
+                if len(self._pending) == self._needed:
+                    field = bytes(self._pending)
+                    self._pending.clear()
+                    self._advance(field)
+
+    def result(self) -> Any:
+        """The decoded body; raises ValueError if it is incomplete"""
+        if (
+            self._state != "length"
+            or len(self._pending) > 0
+            or self._target is not None
+            or self._buffer_index < len(self._arrays)
+        ):
+            raise ValueError("Truncated frames body")
+        return self._data
+
+    def _expect(self, state: str, needed: int):
+        self._state = state
+        self._needed = needed
+
+    def _advance(self, field: bytes):
+        if self._state == "preamble":
+            if field[: len(_Magic)] != _Magic:
+                raise ValueError("Not a frames body")
+            self._expect("header", _Length.unpack_from(field, len(_Magic))[0])
+        elif self._state == "header":
+            self._data = json.loads(str(field, "utf-8"), object_hook=self._register)
+            self._expect("length", _Length.size)
+        else:
+            length = _Length.unpack(field)[0]
+            if self._target is None:
+                self._begin_buffer()
+            if length == 0:
+                self._finish_buffer()
+            else:
+                self._state = "chunk"
+                self._remaining = length
+
+    def _register(self, d: dict):
+        if Buffer_key in d:
+            self._arrays[d[Buffer_key]] = d
+        return d
+
+    def _begin_buffer(self):
+        d = self._arrays.get(self._buffer_index)
+        if d is None:
+            raise ValueError(f"Unreferenced buffer {self._buffer_index}")
+        array = self._allocate(tuple(d["shape"]), np.dtype(d["dtype"]))
+        self._target = memoryview(array.reshape(-1).view(np.uint8))
+        self._offset = 0
+        self._decompressor = (
+            lz4.frame.LZ4FrameDecompressor() if d["compression"] == "lz4" else None
+        )
+
+    def _write(self, piece: memoryview):
+        if self._decompressor is not None:
+            piece = self._decompressor.decompress(piece)
+        end = self._offset + len(piece)
+        if end > len(self._target):
+            raise ValueError(f"Buffer {self._buffer_index} is larger than its array")
+        self._target[self._offset : end] = piece
+        self._offset = end
+
+    def _finish_buffer(self):
+        if self._offset != len(self._target) or (
+            self._decompressor is not None and not self._decompressor.eof
+        ):
+            raise ValueError(f"Buffer {self._buffer_index} is smaller than its array")
+        d = self._arrays[self._buffer_index]
+        del d[Buffer_key]
+        d["ndarray"] = self._target
+        d["compression"] = "none"
+        self._target = None
+        self._decompressor = None
+        self._buffer_index += 1
@@ -1,9 +1,62 @@
 import base64
-from typing import Dict
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
 
 import lz4.frame
 import numpy as np
 from icontract import require
+from qcware.serialization.frames import ArrayBuffer, Buffer_key
+
+Compression_threshold = 1024
+
+_ndarray_buffers: contextvars.ContextVar[
+    Optional[List[ArrayBuffer]]
+] = contextvars.ContextVar("ndarray_buffers", default=None)
+
+
+@contextmanager
+def collect_ndarray_buffers():
+    """
+    Within this context, ndarray_to_dict does not encode arrays but appends
+    them to the yielded list, to be sent as buffers of a frames body (see
+    qcware.serialization.frames).
+    """
+    buffers: List[ArrayBuffer] = []
+    token = _ndarray_buffers.set(buffers)
+    try:
+        yield buffers
+    finally:
+        _ndarray_buffers.reset(token)
+
+
+def collecting_ndarray_buffers() -> bool:
+    """Whether arrays are currently collected by collect_ndarray_buffers"""
+    return _ndarray_buffers.get() is not None
+
+
+def reuse_ndarray_buffers(data: Any, buffers: Sequence[ArrayBuffer]) -> Any:
+    """
+    Adds `buffers`, collected while encoding `data` earlier, to the buffers
+    being collected now and returns `data` with its references to them
+    renumbered accordingly (copying the dicts which hold references).
+    """
+    collected = _ndarray_buffers.get()
+    offset = len(collected)
+    collected.extend(buffers)
+    if offset == 0:
+        return data
+
+    def renumber(x):
+        if isinstance(x, dict):
+            if Buffer_key in x:
+                return {**x, Buffer_key: x[Buffer_key] + offset}
+            return {k: renumber(v) for k, v in x.items()}
+        if isinstance(x, list):
+            return [renumber(v) for v in x]
+        return x
+
+    return renumber(data)
 
 
 def ndarray_to_dict(x: np.ndarray):
@@ -13,8 +66,18 @@ def ndarray_to_dict(x: np.ndarray):
     else:
         if isinstance(x, list) or isinstance(x, tuple):
             x = np.array(x)
+        buffers = _ndarray_buffers.get()
+        if buffers is not None:
+            buffers.append(
+                ArrayBuffer(x, "lz4" if x.nbytes > Compression_threshold else "none")
+            )
+            return {
+                Buffer_key: len(buffers) - 1,
+                "compression": buffers[-1].compression,
+                "dtype": x.dtype.str,
+                "shape": x.shape,
+            }
         b = x.tobytes()
-        Compression_threshold = 1024
         if len(b) > Compression_threshold:
             b = lz4.frame.compress(b)
             compression = "lz4"
@@ -29,10 +92,17 @@ def ndarray_to_dict(x: np.ndarray):
 
 
 def dict_to_ndarray(d: dict):
+    """
+    The inverse of ndarray_to_dict.  The "ndarray" entry may be the base64
+    string of the JSON transport or the raw buffer from a frames body; an
+    uncompressed buffer is used directly, without copying.
+    """
     if d is None:
         return None
     else:
-        b = base64.b64decode(d["ndarray"])
+        b = d["ndarray"]
+        if isinstance(b, str):
+            b = base64.b64decode(b)
         if d["compression"] == "lz4":
             b = lz4.frame.decompress(b)
         return np.frombuffer(
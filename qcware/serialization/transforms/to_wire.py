@@ -1,10 +1,25 @@
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
 from functools import singledispatch
 
+import numpy as np
+
 from qcware.serialization.transforms.helpers import (
+    collect_ndarray_buffers,
+    collecting_ndarray_buffers,
     dict_to_ndarray,
     ndarray_to_dict,
     remap_q_indices_from_strings,
     remap_q_indices_to_strings,
+    reuse_ndarray_buffers,
+)
+from qcware.serialization.wire_features import (
+    Columnar_samples_wire_feature,
+    Sparse_polynomials_wire_feature,
+    enabled_wire_features,
+    wire_feature_enabled,
 )
 from qcware.types.optimization import (
     BinaryProblem,
@@ -12,7 +27,13 @@ from qcware.types.optimization import (
     Constraints,
     PolynomialObjective,
 )
-from qcware.types.optimization.results.results_types import BinaryResults, Sample
+from qcware.types.optimization.problem_spec.objective import (
+    default_variable_name_mapping,
+)
+from qcware.types.optimization.results.results_types import (
+    BinaryResults,
+    SampleTable,
+)
 from qcware.types.qml import (
     FitData,
     QMeansFitData,
@@ -28,23 +49,113 @@ def to_wire(x):
     raise NotImplementedError(f"Unsupported Type: {type(x)}")
 
 
+# The types whose encodings depend on the enabled wire features
+Wire_feature_dependent_types = (
+    BinaryProblem,
+    BinaryResults,
+    Constraints,
+    PolynomialObjective,
+)
+
+
+def uses_wire_features(x) -> bool:
+    """Whether the encoding of x may depend on the enabled wire features"""
+    if isinstance(x, Wire_feature_dependent_types):
+        return True
+    if isinstance(x, dict):
+        return any(uses_wire_features(v) for v in x.values())
+    if isinstance(x, (list, tuple)):
+        return any(uses_wire_features(v) for v in x)
+    return False
+
+
+# The version of the sparse encoding of a polynomial
+Sparse_polynomial_wire_version = 1
+
+
 @to_wire.register(PolynomialObjective)
 def polynomial_objective_to_wire(x):
+    """
+    Encodes a PolynomialObjective.  If the receiver understands sparse
+    polynomials, the terms are sent as arrays in "sparse_polynomial" (see
+    polynomial_to_sparse_wire); otherwise as a dict keyed by the string
+    of each term in "polynomial".
+    """
     result = x.dict()
-    result["polynomial"] = remap_q_indices_to_strings(result["polynomial"])
-    result["variable_name_mapping"] = {
-        str(k): v for k, v in result["variable_name_mapping"].items()
-    }
+    sparse_polynomial = None
+    if wire_feature_enabled(Sparse_polynomials_wire_feature):
+        sparse_polynomial = polynomial_to_sparse_wire(x.polynomial, x.num_variables)
+    if sparse_polynomial is None:
+        result["polynomial"] = remap_q_indices_to_strings(result["polynomial"])
+    else:
+        del result["polynomial"]
+        result["sparse_polynomial"] = sparse_polynomial
+        # the receiver makes the default names itself
+        if x.variable_name_mapping == default_variable_name_mapping(
+            x.num_variables, x.domain
+        ):
+            result["variable_name_mapping"] = None
+    if result["variable_name_mapping"] is not None:
+        result["variable_name_mapping"] = {
+            str(k): v for k, v in result["variable_name_mapping"].items()
+        }
     return result
 
 
+def polynomial_to_sparse_wire(polynomial: dict, num_variables: int):
+    """
+    Encodes the terms of a polynomial as in compressed sparse row matrices:
+    the variables of all terms in one array, the offsets in that array at
+    which each term starts (and the last ends) and the coefficients of the
+    terms.  Returns None for coefficients which do not fit an int64 or
+    float64 array.
+    """
+    coefficients = np.array(list(polynomial.values()))
+    if len(polynomial) > 0 and coefficients.dtype.kind not in "iuf":
+        return None
+    lengths = np.fromiter(map(len, polynomial), dtype=np.int64, count=len(polynomial))
+    offsets = np.zeros(len(polynomial) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    variable_dtype = np.int32 if num_variables <= np.iinfo(np.int32).max else np.int64
+    variables = np.fromiter(
+        itertools.chain.from_iterable(polynomial),
+        dtype=variable_dtype,
+        count=int(offsets[-1]),
+    )
+    return dict(
+        version=Sparse_polynomial_wire_version,
+        term_offsets=ndarray_to_dict(offsets),
+        variables=ndarray_to_dict(variables),
+        coefficients=ndarray_to_dict(coefficients),
+    )
+
+
+def check_sparse_polynomial_version(d: dict):
+    if d["version"] > Sparse_polynomial_wire_version:
+        raise ValueError(
+            f"Unsupported sparse polynomial encoding version {d['version']}; "
+            "upgrading the client may help."
+        )
+
+
 def polynomial_objective_from_wire(d: dict):
     remapped_dict = d.copy()
-
+    if remapped_dict["variable_name_mapping"] is not None:
+        remapped_dict["variable_name_mapping"] = {
+            int(k): v for k, v in remapped_dict["variable_name_mapping"].items()
+        }
+    sparse_polynomial = remapped_dict.pop("sparse_polynomial", None)
+    if sparse_polynomial is not None:
+        check_sparse_polynomial_version(sparse_polynomial)
+        return PolynomialObjective.from_term_arrays(
+            dict_to_ndarray(sparse_polynomial["term_offsets"]),
+            dict_to_ndarray(sparse_polynomial["variables"]),
+            dict_to_ndarray(sparse_polynomial["coefficients"]),
+            remapped_dict["num_variables"],
+            domain=remapped_dict["domain"],
+            variable_name_mapping=remapped_dict["variable_name_mapping"],
+        )
     remapped_dict["polynomial"] = remap_q_indices_from_strings(d["polynomial"])
-    remapped_dict["variable_name_mapping"] = {
-        int(k): v for k, v in remapped_dict["variable_name_mapping"].items()
-    }
     return PolynomialObjective(**remapped_dict)
 
 
@@ -67,8 +178,43 @@ def constraints_from_wire(d: dict):
     return Constraints(**remapped_dict)
 
 
+# The number of encoded BinaryProblems kept for reuse by binary_problem_to_wire
+Binary_problem_wire_cache_size = 16
+
+_binary_problem_wire_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_binary_problem_wire_cache_lock = threading.Lock()
+
+
 @to_wire.register(BinaryProblem)
 def binary_problem_to_wire(x):
+    """
+    Encodes a BinaryProblem.  Problems are often sent many times (for
+    instance with different angles to qaoa_expectation_value), so the
+    encodings of the most recently sent problems are kept, keyed by their
+    content hash and the optional encodings in use.  The nested values of
+    the result may be shared between calls and must not be modified.
+    """
+    collecting = collecting_ndarray_buffers()
+    key = (x.content_hash(), enabled_wire_features(), collecting)
+    with _binary_problem_wire_cache_lock:
+        cached = _binary_problem_wire_cache.get(key)
+        if cached is not None:
+            _binary_problem_wire_cache.move_to_end(key)
+    if cached is None:
+        # arrays are collected separately, to be added to those of each call
+        with collect_ndarray_buffers() if collecting else nullcontext() as buffers:
+            cached = (_binary_problem_to_wire(x), buffers)
+        with _binary_problem_wire_cache_lock:
+            _binary_problem_wire_cache[key] = cached
+            while len(_binary_problem_wire_cache) > Binary_problem_wire_cache_size:
+                _binary_problem_wire_cache.popitem(last=False)
+    result, buffers = cached
+    if buffers is not None:
+        result = reuse_ndarray_buffers(result, buffers)
+    return dict(result)
+
+
+def _binary_problem_to_wire(x: BinaryProblem) -> dict:
     result = x.dict()
     result["objective"] = to_wire(result["objective"])
     result["constraints"] = (
@@ -88,9 +234,22 @@ def binary_problem_from_wire(d: dict):
     return BinaryProblem(**remapped_dict)
 
 
+# The version of the columnar encoding of a SampleTable
+Sample_table_wire_version = 1
+
+
 @to_wire.register(BinaryResults)
-def _(x):
-    result = x.dict()
+def binary_results_to_wire(x):
+    """
+    Encodes BinaryResults.  If the receiver understands columnar samples,
+    the arrays of the sample table are sent as a versioned "sample_table";
+    otherwise each sample is sent in "sample_ordered_dict".
+    """
+    result = x.dict(exclude={"sample_table"})
+    if wire_feature_enabled(Columnar_samples_wire_feature):
+        result["sample_table"] = sample_table_to_wire(x.sample_table)
+    else:
+        result["sample_ordered_dict"] = sample_ordered_dict_to_wire(x.sample_table)
     result["original_problem"] = to_wire(x.original_problem)
     result["task_metadata"] = {
         k: v
@@ -100,12 +259,67 @@ def _(x):
     return result
 
 
+def sample_ordered_dict_to_wire(x: SampleTable):
+    """The original encoding of samples, as dicts keyed by bitstring"""
+    return {
+        key: dict(bitstring=bitstring, value=value, occurrences=occurrences)
+        for key, bitstring, value, occurrences in zip(
+            x.keys(),
+            x.bitstrings().tolist(),
+            x.values.tolist(),
+            x.occurrences.tolist(),
+        )
+    }
+
+
+def sample_table_to_wire(x: SampleTable):
+    return dict(
+        version=Sample_table_wire_version,
+        num_variables=x.num_variables,
+        domain=x.domain.value,
+        packed_bitstrings=ndarray_to_dict(x.packed_bitstrings),
+        values=ndarray_to_dict(x.values),
+        occurrences=ndarray_to_dict(x.occurrences),
+    )
+
+
+def sample_table_from_wire(d: dict) -> SampleTable:
+    if d["version"] > Sample_table_wire_version:
+        raise ValueError(
+            f"Unsupported sample table encoding version {d['version']}; "
+            "upgrading the client may help."
+        )
+    return SampleTable(
+        dict_to_ndarray(d["packed_bitstrings"]),
+        dict_to_ndarray(d["values"]),
+        dict_to_ndarray(d["occurrences"]),
+        num_variables=d["num_variables"],
+        domain=d["domain"],
+    )
+
+
+def sample_ordered_dict_from_wire(d: dict, problem: BinaryProblem) -> SampleTable:
+    """Decodes the samples of the original, dict encoding straight into arrays"""
+    samples = d.values()
+    bitstrings = np.array([s["bitstring"] for s in samples])
+    return SampleTable.from_bitstrings(
+        bitstrings.reshape(len(samples), problem.num_variables),
+        [s["value"] for s in samples],
+        [s.get("occurrences", 1) for s in samples],
+        domain=problem.domain,
+    )
+
+
 def binary_results_from_wire(d: dict):
     remapped_dict = d.copy()
-    remapped_dict["sample_ordered_dict"] = {
-        k: Sample(**v) for k, v in remapped_dict["sample_ordered_dict"].items()
-    }
-    remapped_dict["original_problem"] = binary_problem_from_wire(d["original_problem"])
+    original_problem = binary_problem_from_wire(d["original_problem"])
+    remapped_dict["original_problem"] = original_problem
+    if "sample_table" in d:
+        remapped_dict["sample_table"] = sample_table_from_wire(d["sample_table"])
+    else:
+        remapped_dict["sample_table"] = sample_ordered_dict_from_wire(
+            remapped_dict.pop("sample_ordered_dict"), original_problem
+        )
     return BinaryResults(**remapped_dict)
 
 
@@ -0,0 +1,62 @@
+"""
+Optional encodings of API call payloads, which not every client or host
+understands.
+
+Clients list the optional encodings of results they can decode in the
+`Wire_features_header` of the requests submitting calls, so that a host
+may use them for the results of those calls.  Hosts list the optional
+encodings they can decode (along with transports such as frames) among
+the wire features reported by /about/about.
+
+Encoders only use an optional encoding within `enable_wire_features`,
+so by default payloads keep the encodings every client and host
+understands.
+"""
+import contextvars
+from contextlib import contextmanager
+from typing import FrozenSet, Iterable, Optional
+
+# BinaryResults with their samples as arrays rather than a dict of Samples
+Columnar_samples_wire_feature = "columnar_samples"
+
+# PolynomialObjectives with their terms as arrays rather than a dict
+Sparse_polynomials_wire_feature = "sparse_polynomials"
+
+# qaoa_expectation_value with angles of shape (n_points, p), returning
+# an array of the expectation values for each set of angles
+Batched_qaoa_angles_wire_feature = "batched_qaoa_angles"
+
+Client_wire_features = (Columnar_samples_wire_feature,)
+Wire_features_header = "X-Qcware-Wire-Features"
+
+_enabled_wire_features: contextvars.ContextVar[FrozenSet[str]] = contextvars.ContextVar(
+    "enabled_wire_features", default=frozenset()
+)
+
+
+@contextmanager
+def enable_wire_features(features: Iterable[str]):
+    """
+    Within this context, encoders may use the given optional encodings,
+    as the receiver of the payload understands them.
+    """
+    token = _enabled_wire_features.set(frozenset(features))
+    try:
+        yield
+    finally:
+        _enabled_wire_features.reset(token)
+
+
+def wire_feature_enabled(feature: str) -> bool:
+    return feature in _enabled_wire_features.get()
+
+
+def enabled_wire_features() -> FrozenSet[str]:
+    return _enabled_wire_features.get()
+
+
+def parse_wire_features(header: Optional[str]) -> FrozenSet[str]:
+    """The optional encodings listed in a Wire_features_header"""
+    if not header:
+        return frozenset()
+    return frozenset(f.strip() for f in header.split(",") if f.strip())
@@ -9,7 +9,9 @@ def dict_to_ndarray(d: dict):
     if d is None:
         return None
     else:
-        b = base64.b64decode(d["ndarray"])
+        b = d["ndarray"]
+        if isinstance(b, str):
+            b = base64.b64decode(b)
         if d["compression"] == "lz4":
             b = lz4.frame.decompress(b)
         return np.frombuffer(
@@ -2,5 +2,5 @@ from .predicate import Predicate
 from .variable_types import Domain
 from .problem_spec import PolynomialObjective, Constraints
 from .problem_spec import BinaryProblem
-from .results import BruteOptimizeResult, BinaryResults, Sample
+from .results import BruteOptimizeResult, BinaryResults, Sample, SampleTable
 from . import utils
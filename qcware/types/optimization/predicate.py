@@ -1,5 +1,7 @@
 import enum
 
+import numpy as np
+
 
 class Predicate(str, enum.Enum):
     """Relations for constraint specification."""
@@ -13,3 +15,19 @@ class Predicate(str, enum.Enum):
 
     def __repr__(self):
         return str(self).__str__()
+
+    def holds(self, values) -> np.ndarray:
+        """Elementwise, whether the predicate holds for an array of values."""
+        values = np.asarray(values)
+        if self is Predicate.NONNEGATIVE:
+            return values >= 0
+        elif self is Predicate.POSITIVE:
+            return values > 0
+        elif self is Predicate.NONPOSITIVE:
+            return values <= 0
+        elif self is Predicate.NEGATIVE:
+            return values < 0
+        elif self is Predicate.ZERO:
+            return values == 0
+        else:
+            return values != 0
@@ -1,3 +1,4 @@
 from .objective import PolynomialObjective
+from .compiled_polynomial import CompiledPolynomial
 from .constraints import Constraints
 from .binary_problem import BinaryProblem
@@ -1,20 +1,23 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 from typing import Dict, Tuple, Optional
 
 from .. import Predicate, Domain
 
 from . import PolynomialObjective
 from . import Constraints
+from .utils.immutable import content_digest
 
 
 class BinaryProblem(BaseModel):
     objective: PolynomialObjective
     constraints: Optional[Constraints] = None
     name: str = "my_qcware_binary_problem"
+    _content_hash: Optional[str] = PrivateAttr(None)
 
     class Config:
         validate_assignment = True
         allow_mutation = False
+        frozen = True
         arbitrary_types_allowed = True
 
     def __str__(self) -> str:
@@ -29,6 +32,24 @@ class BinaryProblem(BaseModel):
             out += self.constraints.__str__()
         return out
 
+    def content_hash(self) -> str:
+        """A digest of the problem, which is the same for equal
+        BinaryProblems in every process (see
+        PolynomialObjective.content_hash).
+        """
+        if self._content_hash is None:
+            self._content_hash = content_digest(
+                (
+                    "BinaryProblem",
+                    self.objective.content_hash(),
+                    None
+                    if self.constraints is None
+                    else self.constraints.content_hash(),
+                    self.name,
+                )
+            )
+        return self._content_hash
+
     @classmethod
     def from_dict(
         cls, objective: Dict[Tuple[int, ...], int], domain: Domain = Domain.BOOLEAN
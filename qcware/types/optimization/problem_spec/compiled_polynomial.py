@@ -0,0 +1,167 @@
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from qcware.types.optimization.variable_types import Domain, domain_bit_values
+
+# Samples are evaluated in blocks so that the intermediate arrays of a
+# block hold at most about this many entries.
+Block_entries = 1 << 22
+
+# Quadratic terms are evaluated with a dense (num_variables, num_variables)
+# matrix when it is no larger than this many entries and not much sparser
+# than the terms themselves; otherwise term by term like higher degrees.
+Dense_quadratic_entries = 1 << 22
+Dense_quadratic_sparsity = 16
+
+
+def check_assignments(X: np.ndarray, num_variables: int, domain: Optional[Domain]):
+    """Check that X holds one assignment of the variables per row.
+
+    Raises ValueError if X does not have shape (n_samples, num_variables)
+    or (when a domain is given) holds values other than its bit values.
+    """
+    if X.ndim != 2 or X.shape[1] != num_variables:
+        raise ValueError(
+            f"Expected an array of shape (n_samples, {num_variables}) "
+            f"but found shape {X.shape}."
+        )
+    if domain is not None:
+        valid_bits = domain_bit_values(domain)
+        if not np.isin(X, valid_bits).all():
+            raise ValueError(
+                f"Assignments are expected to have domain {domain} but "
+                f"found entries outside of {valid_bits}."
+            )
+
+
+class CompiledPolynomial:
+    """A binary polynomial compiled for vectorized evaluation.
+
+    The terms of the polynomial are grouped by degree. For each degree d
+    there is an integer array of shape (number of terms, d) holding the
+    variables of each term and a vector holding their coefficients; the
+    constant term is kept separately.
+
+    With this representation, the polynomial can be evaluated at many
+    assignments of its variables at once by `compute_values`, which takes
+    an array with one assignment per row. Since every variable is 0 or 1
+    (or 1 or -1 for spin variables), the value of a term at each assignment
+    is just the product of the columns for its variables, and the value of
+    the polynomial is a matrix-vector product of these term values with
+    the coefficients. The same computation serves both domains. Linear
+    terms, and quadratic terms if there are many of them, are instead
+    evaluated as x.a and x.Qx with a dense vector a and matrix Q.
+
+    Values are computed in floating point and rounded back to integers for
+    integer coefficients, which is exact as long as the values and partial
+    sums are below 2**53 in magnitude.
+
+    Attributes:
+        num_variables: The number of variables of the polynomial.
+
+        domain: Specifies if variables take on boolean (0, 1) or spin (1, -1)
+            values.
+
+        constant: The constant term of the polynomial.
+
+        terms: Dict from degree to the array of the terms of that degree.
+
+        coefficients: Dict from degree to the coefficients of the terms
+            of that degree, in the same order as in `terms`.
+    """
+
+    num_variables: int
+    domain: Domain
+    constant: Union[int, float]
+    terms: Dict[int, np.ndarray]
+    coefficients: Dict[int, np.ndarray]
+
+    def __init__(
+        self,
+        polynomial: Dict[Tuple[int, ...], int],
+        num_variables: int,
+        domain: Union[Domain, str] = Domain.BOOLEAN,
+    ):
+        self.num_variables = num_variables
+        self.domain = Domain(domain.lower())
+        self.constant = polynomial.get((), 0)
+        grouped: Dict[int, list] = {}
+        for term, coefficient in polynomial.items():
+            if len(term) > 0:
+                grouped.setdefault(len(term), []).append((term, coefficient))
+        self.terms = {}
+        self.coefficients = {}
+        for degree, items in sorted(grouped.items()):
+            self.terms[degree] = np.array(
+                [term for term, _ in items], dtype=np.intp
+            ).reshape(-1, degree)
+            self.coefficients[degree] = np.array([c for _, c in items])
+
+        self._integer = (
+            all(np.issubdtype(c.dtype, np.integer) for c in self.coefficients.values())
+            and float(self.constant).is_integer()
+        )
+        self._linear = np.zeros(num_variables)
+        if 1 in self.terms:
+            np.add.at(self._linear, self.terms[1][:, 0], self.coefficients[1])
+        self._quadratic = None
+        if 2 in self.terms:
+            num_entries = num_variables * num_variables
+            if (
+                num_entries <= Dense_quadratic_entries
+                and num_entries <= Dense_quadratic_sparsity * len(self.terms[2])
+            ):
+                self._quadratic = np.zeros((num_variables, num_variables))
+                np.add.at(
+                    self._quadratic,
+                    (self.terms[2][:, 0], self.terms[2][:, 1]),
+                    self.coefficients[2],
+                )
+
+    def compute_values(self, X, validate: bool = True) -> np.ndarray:
+        """Compute the value of the polynomial at many assignments at once.
+
+        Args:
+            X: Array of shape (n_samples, num_variables) with one assignment
+                of the variables per row, using the bit values of the domain.
+                A single assignment of shape (num_variables,) is also accepted.
+
+            validate: When True, check that X only holds bit values of the
+                domain. Skipping this saves a pass over X.
+
+        Returns:
+            Array of shape (n_samples,) with the value at each assignment (or
+            a scalar for a single assignment).
+        """
+        X = np.asarray(X)
+        single = X.ndim == 1
+        if single:
+            X = X.reshape(1, -1)
+        if validate:
+            check_assignments(X, self.num_variables, self.domain)
+        values = np.empty(len(X))
+        widest = max([self.num_variables] + [len(t) for t in self.terms.values()])
+        block = max(1, Block_entries // max(1, widest))
+        for start in range(0, len(X), block):
+            values[start : start + block] = self._block_values(
+                X[start : start + block].astype(np.float64)
+            )
+        if self._integer:
+            values = np.rint(values).astype(np.int64)
+        return values[0] if single else values
+
+    def _block_values(self, rows: np.ndarray) -> np.ndarray:
+        values = np.full(len(rows), float(self.constant))
+        if 1 in self.terms:
+            values += rows @ self._linear
+        for degree, terms in self.terms.items():
+            if degree == 1:
+                continue
+            if degree == 2 and self._quadratic is not None:
+                values += np.einsum("ij,ij->i", rows @ self._quadratic, rows)
+                continue
+            products = rows[:, terms[:, 0]]
+            for k in range(1, degree):
+                products *= rows[:, terms[:, k]]
+            values += products @ self.coefficients[degree]
+        return values
@@ -1,18 +1,27 @@
 import itertools
 import textwrap
-from typing import Dict, List, Union, Iterable, Optional
+from typing import Dict, List, Tuple, Union, Iterable, Optional
 
+import numpy as np
 import tabulate
 from qcware.types.optimization.predicate import Predicate
 from qcware.types.optimization.variable_types import Domain
 from qcware.types.optimization import utils
 from qcware.types.optimization.problem_spec import PolynomialObjective
+from qcware.types.optimization.problem_spec.compiled_polynomial import (
+    check_assignments,
+)
 from qcware.types.optimization.problem_spec.utils import (
     constraint_validation as validator,
 )
+from qcware.types.optimization.problem_spec.utils.immutable import (
+    FrozenDict,
+    WriteOnce,
+    content_digest,
+)
 
 
-class Constraints:
+class Constraints(WriteOnce):
     """Specification of constraints on binary variables.
 
     An object of class Constraints does not have information about the
@@ -53,11 +62,28 @@ class Constraints:
     reason that we are using [p] and [q] instead of just p and q is that we can
     add additional constraints of those types in this fashion by adding
     more entries to the lists.
+
+    Constraints are immutable; the lists of constraints are kept as tuples.
+    Like PolynomialObjectives, equal Constraints have equal hashes.
     """
 
-    constraint_dict: Dict[Predicate, List[PolynomialObjective]]
+    constraint_dict: Dict[Predicate, Tuple[PolynomialObjective, ...]]
     domain: Domain
 
+    __slots__ = (
+        "constraint_dict",
+        "num_variables",
+        "predicates",
+        "degree_dict",
+        "degree_set",
+        "max_degree_dict",
+        "max_degree",
+        "domain",
+        "_total_num_constraints",
+        "_num_constraints_dict",
+        "_content_hash",
+    )
+
     def __init__(
         self,
         constraints: Dict[Predicate, List[PolynomialObjective]],
@@ -104,11 +130,13 @@ class Constraints:
             variable_name_mapping=variable_name_mapping,
         )
         del constraints
-        self.constraint_dict = parsed_constraints.constraint_dict
+        self.constraint_dict = FrozenDict(
+            (predicate, tuple(polynomials))
+            for predicate, polynomials in parsed_constraints.constraint_dict.items()
+        )
         self.num_variables = num_variables
-        self.predicates = set(self.constraint_dict)
-        self.degree_dict = {rel: [] for rel in self.predicates}
-        self.degree_set = set()
+        self.predicates = frozenset(self.constraint_dict)
+        degree_dict = {rel: [] for rel in self.predicates}
         self._total_num_constraints = 0
         self._num_constraints_dict = {rel: 0 for rel in self.predicates}
 
@@ -117,8 +145,7 @@ class Constraints:
             selected_domain = Domain(domain.lower())
         for predicate in self.predicates:
             for c in self.constraint_dict[predicate]:
-                self.degree_dict[predicate].append(c.degree)
-                self.degree_set.add(c.degree)
+                degree_dict[predicate].append(c.degree)
                 self._total_num_constraints += 1
                 self._num_constraints_dict[predicate] += 1
                 if selected_domain is None:
@@ -130,13 +157,18 @@ class Constraints:
                     )
 
         self.domain = selected_domain
-        self.max_degree_dict = {
-            predicate: max(degs) for predicate, degs in self.degree_dict.items()
-        }
+        self.degree_dict = FrozenDict(
+            (predicate, tuple(degs)) for predicate, degs in degree_dict.items()
+        )
+        self.degree_set = frozenset(itertools.chain.from_iterable(degree_dict.values()))
+        self.max_degree_dict = FrozenDict(
+            (predicate, max(degs)) for predicate, degs in degree_dict.items()
+        )
         if self.constraint_dict == {}:
             self.max_degree = None
         else:
             self.max_degree = max(self.max_degree_dict.values())
+        self._content_hash = None
 
     def get_constraint_group(
         self, predicate: Predicate, order: Union[int, Iterable[int], None] = None
@@ -213,6 +245,75 @@ class Constraints:
             else:
                 raise TypeError(f"Expected Predicate, found {type(predicate)}")
 
+    def _prepare_assignments(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        check_assignments(X, self.num_variables, self.domain)
+        return X
+
+    def _cheapest_first(self):
+        """(predicate, constraint) pairs, from fewest terms to most"""
+        pairs = [
+            (predicate, constraint)
+            for predicate in self.predicates
+            for constraint in self.constraint_dict[predicate]
+        ]
+        return sorted(pairs, key=lambda pair: len(pair[1].polynomial))
+
+    def is_feasible(self, X) -> np.ndarray:
+        """Determine which assignments of the variables satisfy all constraints.
+
+        Every constraint polynomial is evaluated over the whole batch at once
+        (see PolynomialObjective.compute_values). Constraints are checked from
+        the cheapest to the most expensive, and each one is only evaluated at
+        the assignments which satisfied all constraints checked before it.
+
+        Args:
+            X: Array of shape (n_samples, num_variables) with one assignment
+                of the variables per row.
+
+        Returns:
+            Boolean array of shape (n_samples,).
+        """
+        X = self._prepare_assignments(X)
+        feasible = np.ones(len(X), dtype=bool)
+        remaining = np.arange(len(X))
+        for predicate, constraint in self._cheapest_first():
+            if len(remaining) == 0:
+                break
+            values = constraint.compute_values(X[remaining], validate=False)
+            satisfied = predicate.holds(values)
+            feasible[remaining[~satisfied]] = False
+            remaining = remaining[satisfied]
+        return feasible
+
+    def violations(self, X) -> Dict[Predicate, np.ndarray]:
+        """Count the constraints violated by assignments of the variables.
+
+        Unlike is_feasible, this evaluates every constraint at every
+        assignment.
+
+        Args:
+            X: Array of shape (n_samples, num_variables) with one assignment
+                of the variables per row.
+
+        Returns:
+            Dict from each predicate to an int array of shape (n_samples,)
+            holding the number of constraints of that predicate violated by
+            each assignment. Summing over the samples gives the number of
+            violations in the batch.
+        """
+        X = self._prepare_assignments(X)
+        counts = {}
+        for predicate in self.predicates:
+            count = np.zeros(len(X), dtype=np.int64)
+            for constraint in self.constraint_dict[predicate]:
+                values = constraint.compute_values(X, validate=False)
+                count += ~predicate.holds(values)
+            counts[predicate] = count
+        return counts
+
     def __len__(self):
         """Get the total number of constraints"""
         return self.num_constraints()
@@ -223,6 +324,36 @@ class Constraints:
     def __getitem__(self, item):
         return self.constraint_dict.__getitem__(item)
 
+    def __eq__(self, other):
+        if not isinstance(other, Constraints):
+            return NotImplemented
+        return self is other or (
+            self.num_variables == other.num_variables
+            and self.domain is other.domain
+            and self.constraint_dict == other.constraint_dict
+        )
+
+    def __hash__(self):
+        return hash(self.content_hash())
+
+    def content_hash(self) -> str:
+        """A digest of the constraints, which is the same for equal
+        Constraints in every process (see PolynomialObjective.content_hash).
+        """
+        if self._content_hash is None:
+            self._content_hash = content_digest(
+                (
+                    "Constraints",
+                    self.num_variables,
+                    None if self.domain is None else self.domain.value,
+                    sorted(
+                        (predicate.value, [c.content_hash() for c in polynomials])
+                        for predicate, polynomials in self.constraint_dict.items()
+                    ),
+                )
+            )
+        return self._content_hash
+
     def __repr__(self):
         out = "Constraints(\n"
         out += f"    constraints={self.constraint_dict},\n"
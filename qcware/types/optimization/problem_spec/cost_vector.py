@@ -0,0 +1,186 @@
+"""
+The values of a polynomial at every assignment of its variables.
+
+The cost vector of a polynomial of n variables has 2**n entries, indexed
+so that the binary digits of an index, most significant first, are the
+bits of variables 0 to n - 1 (bit 0 is the boolean value 0 or the spin
+value 1; bit 1 is 1 or -1).
+
+The variables are split into "high" variables (the leading bits of an
+index) and "low" ones, so that each term is the product of a monomial of
+high variables and one of low variables.  With a table H of the values
+of the high monomials at every assignment of the high variables, a table
+L likewise for the low monomials and the matrix M of the coefficients
+pairing them, the cost vector, viewed as a matrix indexed by the high
+and the low bits, is H M L^T.  It is computed a block of rows at a time
+and, for polynomials of many terms, summed over tiles of the terms, so
+that no matrix grows much beyond Pairing_block_entries entries.
+
+The products are computed in float64, in which sums of integers are exact
+only up to 2**53.  Exact integer cost vectors are computed by splitting
+the coefficients into limbs small enough that the cost vector of each
+limb stays within that bound, and summing those vectors in int64.
+"""
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from qcware.types.optimization.problem_spec.compiled_polynomial import Block_entries
+from qcware.types.optimization.variable_types import Domain
+
+# The most entries of the matrices multiplied to compute the cost vector
+# (other than the chunks of the vector itself)
+Pairing_block_entries = 1 << 22
+
+# Integers up to this magnitude, and sums of them, are exact in float64
+Exact_float_bound = 1 << 53
+
+Monomials = Dict[Tuple[int, ...], int]
+
+
+def index_assignments(
+    indices: np.ndarray, num_variables: int, domain: Domain
+) -> np.ndarray:
+    """The assignments of the variables at indices of a cost vector, one
+    row per index"""
+    indices = np.asarray(indices, dtype=np.int64)
+    bits = (indices[:, None] >> np.arange(num_variables - 1, -1, -1)) & 1
+    if domain is Domain.SPIN:
+        return (1 - 2 * bits).astype(np.int8)
+    return bits.astype(np.int8)
+
+
+def _monomial_table(
+    monomials: Monomials, indices: np.ndarray, num_variables: int, domain: Domain
+) -> np.ndarray:
+    """The value of each monomial (a column) at the assignment of each
+    index (a row)"""
+    values = index_assignments(indices, num_variables, domain)
+    table = np.ones((len(values), len(monomials)))
+    for monomial, column in monomials.items():
+        for v in monomial:
+            table[:, column] *= values[:, v]
+    return table
+
+
+def _pairing(
+    terms: List[Tuple[Tuple[int, ...], int]], num_high: int
+) -> Tuple[Monomials, Monomials, np.ndarray]:
+    """The high and low monomials of terms (numbered by their columns in
+    the monomial tables) and the matrix of coefficients pairing them"""
+    high: Monomials = {}
+    low: Monomials = {}
+    rows, columns, coefficients = [], [], []
+    for term, coefficient in terms:
+        rows.append(high.setdefault(tuple(v for v in term if v < num_high), len(high)))
+        columns.append(
+            low.setdefault(tuple(v - num_high for v in term if v >= num_high), len(low))
+        )
+        coefficients.append(coefficient)
+    pairing = np.zeros((len(high), len(low)))
+    np.add.at(pairing, (rows, columns), coefficients)
+    return high, low, pairing
+
+
+def _tile_products(
+    tiles: List[Tuple[Monomials, Monomials, np.ndarray]],
+    num_low: int,
+    domain: Domain,
+) -> Iterator[Tuple[Monomials, np.ndarray]]:
+    """The high monomials of each tile and the product M L^T for it"""
+    low_indices = np.arange(1 << num_low)
+    for high, low, pairing in tiles:
+        yield high, pairing @ _monomial_table(low, low_indices, num_low, domain).T
+
+
+def _limbs(polynomial: Dict[Tuple[int, ...], int]) -> Tuple[List[dict], int]:
+    """Polynomials whose integer coefficients are the limbs of those of
+    polynomial, least significant first, each of the returned number of
+    bits, such that the cost vector of each limb is exact in float64"""
+    coefficients = {term: int(coefficient) for term, coefficient in polynomial.items()}
+    if sum(abs(c) for c in coefficients.values()) <= Exact_float_bound:
+        return [coefficients], 0
+    # len(polynomial) limbs of fewer than bits bits sum to at most 2**53
+    bits = Exact_float_bound.bit_length() - 1 - len(polynomial).bit_length()
+    mask = (1 << bits) - 1
+    limbs = []
+    while any(coefficients.values()):
+        limbs.append(
+            {
+                term: (abs(c) & mask) * (1 if c > 0 else -1)
+                for term, c in coefficients.items()
+            }
+        )
+        coefficients = {
+            term: (abs(c) >> bits) * (1 if c > 0 else -1)
+            for term, c in coefficients.items()
+        }
+    return limbs, bits
+
+
+def cost_vector_chunks(
+    polynomial: Dict[Tuple[int, ...], int],
+    num_variables: int,
+    domain: Domain,
+    chunk_size: int = Block_entries,
+    dtype=np.float64,
+) -> Iterator[np.ndarray]:
+    """
+    Yields consecutive chunks of at most chunk_size entries of the cost
+    vector of a polynomial, which is computed chunk by chunk.  The chunks
+    are float64, except that for integer dtypes and integer coefficients
+    they are exact int64 values.
+    """
+    if np.dtype(dtype).kind not in "iu" or not all(
+        isinstance(c, (int, np.integer)) for c in polynomial.values()
+    ):
+        yield from _float_chunks(polynomial, num_variables, domain, chunk_size)
+        return
+    limbs, bits = _limbs(polynomial)
+    for parts in zip(
+        *[_float_chunks(limb, num_variables, domain, chunk_size) for limb in limbs]
+    ):
+        chunk = np.zeros(len(parts[0]), dtype=np.int64)
+        for i, part in enumerate(parts):
+            chunk += part.astype(np.int64) << (i * bits)
+        yield chunk
+
+
+def _float_chunks(
+    polynomial: Dict[Tuple[int, ...], int],
+    num_variables: int,
+    domain: Domain,
+    chunk_size: int,
+) -> Iterator[np.ndarray]:
+    """The float64 chunks of the cost vector of a polynomial"""
+    chunk_size = max(1, chunk_size)
+    # whole rows of the matrix H M L^T make up each chunk
+    num_low = min(num_variables - num_variables // 2, chunk_size.bit_length() - 1)
+    num_high = num_variables - num_low
+    rows_per_chunk = chunk_size >> num_low
+
+    # tiles of at most tile_terms terms, sorted so that terms sharing high
+    # monomials share tiles
+    terms = sorted(
+        polynomial.items(), key=lambda item: [v for v in item[0] if v < num_high]
+    )
+    tile_terms = min(
+        int(Pairing_block_entries**0.5),
+        Pairing_block_entries // max(1 << num_low, rows_per_chunk),
+    )
+    tile_terms = max(1, tile_terms)
+    tiles = [
+        _pairing(terms[start : start + tile_terms], num_high)
+        for start in range(0, len(terms), tile_terms)
+    ]
+    # the products M L^T are computed once when they are small enough to
+    # keep, and otherwise again for each chunk
+    products = None
+    if sum(len(high) for high, _, _ in tiles) << num_low <= Pairing_block_entries:
+        products = list(_tile_products(tiles, num_low, domain))
+
+    for start in range(0, 1 << num_high, rows_per_chunk):
+        indices = np.arange(start, min(start + rows_per_chunk, 1 << num_high))
+        values = np.zeros((len(indices), 1 << num_low))
+        for high, product in products or _tile_products(tiles, num_low, domain):
+            values += _monomial_table(high, indices, num_high, domain) @ product
+        yield values.reshape(-1)
@@ -1,13 +1,30 @@
-from typing import Dict, Tuple, Set, Union, Optional
+import os
+import tempfile
+from typing import Dict, FrozenSet, Iterator, Tuple, Set, Union, Optional
+import numpy as np
 import qubovert as qv
 from icontract import require
+from qcware.types.optimization.problem_spec.compiled_polynomial import (
+    Block_entries,
+    CompiledPolynomial,
+)
+from qcware.types.optimization.problem_spec.cost_vector import cost_vector_chunks
 from qcware.types.optimization.problem_spec.utils import (
     polynomial_validation as validator,
 )
+from qcware.types.optimization.problem_spec.utils.immutable import (
+    FrozenDict,
+    WriteOnce,
+    content_digest,
+)
+from qcware.types.optimization.problem_spec.utils.polynomial_arrays import (
+    canonical_polynomial_from_arrays,
+    sorted_term_arrays,
+)
 from qcware.types.optimization.variable_types import Domain
 
 
-class PolynomialObjective:
+class PolynomialObjective(WriteOnce):
     """Integer-valued polynomial of binary variables with int coefficients.
 
     Objects of this class specify polynomials of some number of
@@ -47,6 +64,11 @@ class PolynomialObjective:
     in the polynomial. For example, the polynomial p(a, b) = 12 b might be
     mistaken for q(b) = 12 b.
 
+    PolynomialObjectives are immutable: their attributes cannot be set and
+    the polynomial dict cannot be modified. Equal PolynomialObjectives
+    have equal hashes (see `content_hash`), so they can be used as dict
+    keys and in sets.
+
     Attributes:
         polynomial: The polynomial is specified by a dict as described above.
             We only use tuples of int as keys and the range of ints must
@@ -54,7 +76,8 @@ class PolynomialObjective:
             type int. This is because we are only treating integer-coefficient
             polynomials.
 
-        variables: Set of ints representing the variables.
+        active_variables: Frozenset of the variables appearing in the
+            polynomial.
 
         num_variables: The number of variables for the polynomial. This number
             can be larger than the actual number of variables that appear
@@ -71,12 +94,27 @@ class PolynomialObjective:
     """
 
     polynomial: Dict[Tuple[int, ...], int]
-    variables: Set[int]
+    active_variables: FrozenSet[int]
     num_variables: int
     degree: Union[int, float]
     domain: Domain
     variable_name_mapping: Dict[int, str]
 
+    __slots__ = (
+        "polynomial",
+        "active_variables",
+        "num_active_variables",
+        "num_variables",
+        "degree",
+        "domain",
+        "variable_name_mapping",
+        "_qv_polynomial",
+        "_qv_polynomial_named",
+        "_compiled",
+        "_content_hash",
+        "_cost_vectors",
+    )
+
     #    @require(lambda polynomial: len(polynomial) > 0)
     def __init__(
         self,
@@ -98,33 +136,132 @@ class PolynomialObjective:
             num_variables=num_variables,
             validate_types=validate_types,
         )
+        self._set_polynomial(
+            parsed_polynomial.poly,
+            parsed_polynomial.variables,
+            parsed_polynomial.deg,
+            variable_name_mapping,
+        )
 
-        self.polynomial = parsed_polynomial.poly
-        self.active_variables = parsed_polynomial.variables
-        self.num_active_variables = len(self.active_variables)
-        self.degree = parsed_polynomial.deg
-        if self.degree < 0:
-            self.degree = float("-inf")
-
-        self.variable_name_mapping = variable_name_mapping
-
-        def default_symbol(variable_type: Domain):
-            if variable_type is Domain.BOOLEAN:
-                return "x"
-            elif variable_type is Domain.SPIN:
-                return "z"
+    @classmethod
+    def _from_simplified(
+        cls,
+        polynomial: Dict[Tuple[int, ...], int],
+        num_variables: int,
+        domain: Domain,
+        active_variables: Set[int],
+        degree: int,
+        variable_name_mapping: Optional[Dict[int, str]] = None,
+    ) -> "PolynomialObjective":
+        """Make a PolynomialObjective from a polynomial already simplified
+        and validated, skipping both steps"""
+        result = cls.__new__(cls)
+        result.num_variables = num_variables
+        result.domain = Domain(domain)
+        result._set_polynomial(
+            polynomial, active_variables, degree, variable_name_mapping
+        )
+        return result
 
+    def _set_polynomial(
+        self,
+        polynomial: Dict[Tuple[int, ...], int],
+        active_variables: Set[int],
+        degree: int,
+        variable_name_mapping: Optional[Dict[int, str]],
+    ):
+        self.polynomial = FrozenDict(polynomial)
+        self.active_variables = frozenset(active_variables)
+        self.num_active_variables = len(self.active_variables)
+        self.degree = degree if degree >= 0 else float("-inf")
         if variable_name_mapping is None:
-            symbol = default_symbol(self.domain)
-            self.variable_name_mapping = {
-                i: f"{symbol}_{i}" for i in range(num_variables)
-            }
+            variable_name_mapping = default_variable_name_mapping(
+                self.num_variables, self.domain
+            )
+        self.variable_name_mapping = FrozenDict(variable_name_mapping)
 
         # We use qubovert to compute function values. Since we don't want
         # to reconstruct a qubovert object every time we use it, we keep
-        # these private attributes around to use as a cache.
+        # these private attributes around to use as a cache. This is safe
+        # because PolynomialObjective is immutable.
         self._qv_polynomial = None
         self._qv_polynomial_named = None
+        self._compiled = None
+        self._content_hash = None
+        self._cost_vectors = None
+
+    @classmethod
+    def from_arrays(
+        cls,
+        rows,
+        cols,
+        coefficients,
+        num_variables: int,
+        domain: Union[Domain, str] = Domain.BOOLEAN,
+        constant: int = 0,
+        variable_name_mapping: Optional[Dict[int, str]] = None,
+    ) -> "PolynomialObjective":
+        """Make a quadratic PolynomialObjective from arrays of its terms.
+
+        The polynomial is the sum of coefficients[i] x_rows[i] x_cols[i]
+        and the constant, as for a QUBO given as a sparse matrix in
+        coordinate format. Entries with rows[i] == cols[i] give linear terms
+        for boolean variables (and constants for spin variables).
+
+        This makes the same polynomial as passing the terms as a dict to
+        the constructor, but is much faster for large problems.
+        """
+        rows = np.asarray(rows).reshape(-1)
+        cols = np.asarray(cols).reshape(-1)
+        coefficients = np.asarray(coefficients).reshape(-1)
+        if not len(rows) == len(cols) == len(coefficients):
+            raise ValueError(
+                f"Found {len(rows)} rows, {len(cols)} columns and "
+                f"{len(coefficients)} coefficients."
+            )
+        variables = np.stack([rows, cols], axis=1).reshape(-1)
+        offsets = np.arange(0, 2 * len(rows) + 1, 2)
+        if constant != 0:
+            offsets = np.append(offsets, offsets[-1])
+            coefficients = np.append(coefficients, constant)
+        return cls.from_term_arrays(
+            offsets,
+            variables,
+            coefficients,
+            num_variables,
+            domain=domain,
+            variable_name_mapping=variable_name_mapping,
+        )
+
+    @classmethod
+    def from_term_arrays(
+        cls,
+        term_offsets,
+        variables,
+        coefficients,
+        num_variables: int,
+        domain: Union[Domain, str] = Domain.BOOLEAN,
+        variable_name_mapping: Optional[Dict[int, str]] = None,
+    ) -> "PolynomialObjective":
+        """Make a PolynomialObjective from arrays of its terms of any degree.
+
+        The terms are laid out as in compressed sparse row matrices: term i
+        has the variables variables[term_offsets[i]:term_offsets[i + 1]]
+        and the coefficient coefficients[i]. Terms are simplified as by the
+        constructor, but with array operations rather than qubovert.
+        """
+        domain = Domain(domain.lower())
+        polynomial, active_variables, degree = canonical_polynomial_from_arrays(
+            term_offsets, variables, coefficients, num_variables, domain
+        )
+        return cls._from_simplified(
+            polynomial,
+            num_variables,
+            domain,
+            active_variables,
+            degree,
+            variable_name_mapping,
+        )
 
     def keys(self):
         return self.polynomial.keys()
@@ -153,14 +290,62 @@ class PolynomialObjective:
     def __getitem__(self, item):
         return self.polynomial.__getitem__(item)
 
+    def __eq__(self, other):
+        if not isinstance(other, PolynomialObjective):
+            return NotImplemented
+        return self is other or (
+            self.num_variables == other.num_variables
+            and self.domain is other.domain
+            and self.polynomial == other.polynomial
+            and self.variable_name_mapping == other.variable_name_mapping
+        )
+
+    def __hash__(self):
+        return hash(self.content_hash())
+
+    def content_hash(self) -> str:
+        """A digest of the content of this polynomial.
+
+        Equal PolynomialObjectives have the same content hash, in every
+        process, so it can be used as a key for caches of anything derived
+        from the polynomial. It is computed once and then cached.
+        """
+        if self._content_hash is None:
+            terms, coefficients = sorted_term_arrays(self.polynomial)
+            if (
+                coefficients.dtype.kind in "iuf"
+                and (coefficients == np.round(coefficients)).all()
+            ):
+                # so that 2 and 2.0 (which compare equal) hash alike
+                coefficients = coefficients.astype(np.int64)
+            elif coefficients.dtype.kind not in "iuf":
+                coefficients = np.array(list(map(repr, coefficients)))
+            variable_name_mapping = self.variable_name_mapping
+            if variable_name_mapping == default_variable_name_mapping(
+                self.num_variables, self.domain
+            ):
+                variable_name_mapping = {}
+            self._content_hash = content_digest(
+                (
+                    "PolynomialObjective",
+                    self.num_variables,
+                    self.domain.value,
+                    sorted(variable_name_mapping.items()),
+                ),
+                terms,
+                coefficients,
+            )
+        return self._content_hash
+
     def clone(self):
         """Make a copy of this PolynomialObjective."""
-        return PolynomialObjective(
-            polynomial=self.polynomial,
+        return PolynomialObjective._from_simplified(
+            polynomial=dict(self.polynomial),
             num_variables=self.num_variables,
             domain=self.domain,
+            active_variables=set(self.active_variables),
+            degree=self.degree,
             variable_name_mapping=self.variable_name_mapping.copy(),
-            validate_types=False,
         )
 
     def qubovert(self, use_variable_names: bool = False):
@@ -170,8 +355,6 @@ class PolynomialObjective:
         the domain of the variables.
 
         This method creates a cached qubovert object once it is called.
-        TODO: This fact makes it particularly important that
-            PolynomialObjective is immutable. We should try to enforce this.
 
         Args:
             use_variable_names: When True, the variables in the qubovert
@@ -264,18 +447,22 @@ class PolynomialObjective:
             'mapping': {1: 0}
         }.
         """
-        qv_form = self.qubovert(use_variable_names=False)
-        reduced_qv = qv_form.to_enumerated()
-        mapping = qv_form.mapping
-        num_vars = reduced_qv.num_binary_variables
-
+        # variables are numbered in order of appearance, as qubovert does
+        mapping: Dict[int, int] = {}
+        for term in self.polynomial:
+            for variable in term:
+                mapping.setdefault(variable, len(mapping))
+        reduced = {
+            tuple(sorted(mapping[v] for v in term)): coefficient
+            for term, coefficient in self.polynomial.items()
+        }
         return {
-            "polynomial": PolynomialObjective(
-                polynomial=reduced_qv,
-                num_variables=num_vars,
+            "polynomial": PolynomialObjective._from_simplified(
+                polynomial=reduced,
+                num_variables=len(mapping),
                 domain=self.domain,
-                variable_name_mapping=None,
-                validate_types=False,
+                active_variables=set(range(len(mapping))),
+                degree=self.degree,
             ),
             "mapping": mapping,
         }
@@ -285,6 +472,116 @@ class PolynomialObjective:
         qv_polynomial = self.qubovert(use_variable_names=use_variable_names)
         return qv_polynomial.value(variable_values)
 
+    def compiled(self) -> CompiledPolynomial:
+        """Get a CompiledPolynomial for vectorized evaluation.
+
+        Like the qubovert model, this is created once and then cached.
+        """
+        if self._compiled is None:
+            self._compiled = CompiledPolynomial(
+                polynomial=self.polynomial,
+                num_variables=self.num_variables,
+                domain=self.domain,
+            )
+        return self._compiled
+
+    def compute_values(self, X, validate: bool = True):
+        """Compute the values of this polynomial at many inputs at once.
+
+        Args:
+            X: Array of shape (n_samples, num_variables) with one assignment
+                of the variables per row, as 0 and 1 for boolean variables
+                or 1 and -1 for spin variables.
+
+            validate: When True, check that X only holds valid bit values.
+
+        Returns:
+            Array of shape (n_samples,) with the value at each assignment.
+        """
+        return self.compiled().compute_values(X, validate=validate)
+
+    def cost_vector_chunks(
+        self, chunk_size: int = Block_entries, dtype=np.float64
+    ) -> Iterator[np.ndarray]:
+        """Compute the values of this polynomial at every input, in chunks.
+
+        This yields the cost vector (see cost_vector) as consecutive chunks
+        of at most chunk_size entries, each computed as it is needed, so
+        that only about one chunk is held in memory at a time.
+        """
+        dtype = np.dtype(dtype)
+        for chunk in cost_vector_chunks(
+            self.polynomial, self.num_variables, self.domain, chunk_size, dtype
+        ):
+            yield _as_dtype(chunk, dtype)
+
+    def cost_vector(
+        self, dtype=np.float64, cache_directory: Optional[str] = None
+    ) -> np.ndarray:
+        """Compute the values of this polynomial at every input.
+
+        Entry i of the cost vector is the value of the polynomial when the
+        binary digits of i, most significant first, are the bits of
+        variables 0 to num_variables - 1 (where bit 0 is the boolean value
+        0 or the spin value 1, and bit 1 is 1 or -1).
+
+        Like the compiled polynomial, the vector is computed once per dtype
+        and then cached. It is read-only.
+
+        Args:
+            dtype: The dtype of the vector. For integer dtypes, values are
+                exact when the coefficients are integers (as long as they
+                fit in the dtype), and are otherwise rounded.
+
+            cache_directory: When given, the vector is instead written to a
+                file in this directory named after the content hash of the
+                polynomial (or read from it, if it was written before, by
+                any process), and returned as a read-only memory map. This
+                suits vectors too large to be held in memory.
+
+        Returns:
+            Array of shape (2**num_variables,) of the values.
+        """
+        dtype = np.dtype(dtype)
+        if cache_directory is not None:
+            return self._cached_cost_vector(dtype, cache_directory)
+        if self._cost_vectors is None:
+            self._cost_vectors = {}
+        if dtype not in self._cost_vectors:
+            vector = np.concatenate(list(self.cost_vector_chunks(dtype=dtype)))
+            vector.flags.writeable = False
+            self._cost_vectors[dtype] = vector
+        return self._cost_vectors[dtype]
+
+    def _cached_cost_vector(self, dtype: np.dtype, cache_directory: str):
+        path = os.path.join(
+            cache_directory, f"cost_vector-{self.content_hash()}-{dtype.name}.npy"
+        )
+        if not os.path.exists(path):
+            os.makedirs(cache_directory, exist_ok=True)
+            # written under another name first, so that a partly written
+            # file is never read
+            handle, temporary_path = tempfile.mkstemp(dir=cache_directory)
+            os.close(handle)
+            try:
+                vector = np.lib.format.open_memmap(
+                    temporary_path,
+                    mode="w+",
+                    dtype=dtype,
+                    shape=(1 << self.num_variables,),
+                )
+                start = 0
+                for chunk in self.cost_vector_chunks(dtype=dtype):
+                    vector[start : start + len(chunk)] = chunk
+                    start += len(chunk)
+                vector.flush()
+                del vector
+                os.replace(temporary_path, path)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+        return np.load(path, mmap_mode="r")
+
     @classmethod
     def __get_validators__(cls):
         yield cls.validate_type
@@ -364,6 +661,12 @@ class PolynomialObjective:
         }
 
 
+def default_variable_name_mapping(num_variables: int, domain: Domain) -> Dict[int, str]:
+    """Names variables x_0, x_1, ... (z_0, z_1, ... for spin variables)."""
+    symbol = "x" if domain is Domain.BOOLEAN else "z"
+    return {i: f"{symbol}_{i}" for i in range(num_variables)}
+
+
 def simplify_polynomial(polynomial: dict, domain: Domain) -> dict:
     """Simplify given polynomial dict."""
     domain = Domain(domain.lower())
@@ -375,3 +678,10 @@ def simplify_polynomial(polynomial: dict, domain: Domain) -> dict:
         raise TypeError(f"Expected a Domain but found {type(domain)}.")
 
     return dict(simplified_qv)
+
+
+def _as_dtype(values: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """values as dtype, rounded first from floats for integer dtypes"""
+    if dtype.kind in "iu" and values.dtype.kind == "f":
+        values = np.rint(values)
+    return values.astype(dtype, copy=False)
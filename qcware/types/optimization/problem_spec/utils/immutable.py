@@ -0,0 +1,75 @@
+"""
+Building blocks for the immutable problem specification types.
+
+PolynomialObjective and Constraints cache derived data (qubovert models,
+compiled polynomials, content hashes), which is only safe if the
+specification itself never changes after construction.
+"""
+import hashlib
+from typing import Any
+
+import numpy as np
+
+
+class FrozenDict(dict):
+    """A dict which cannot be modified after construction.
+
+    This is a dict subclass (rather than a mapping proxy) so that it still
+    compares equal to dicts with the same items and pickles and serializes
+    like one. Copies made with `copy()` or `dict()` are ordinary dicts.
+    """
+
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} does not support modification.")
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    __ior__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+    def __reduce__(self):
+        # the default for dict subclasses restores items with __setitem__
+        return (type(self), (dict(self),))
+
+    def __repr__(self):
+        return dict.__repr__(self)
+
+
+class WriteOnce:
+    """Mixin for classes with __slots__ whose public attributes are set
+    once, while constructing the object, and never changed afterwards.
+    Private attributes (caches of derived data) may still be set."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: Any):
+        if not name.startswith("_") and hasattr(self, name):
+            raise AttributeError(
+                f"{type(self).__name__} is immutable; cannot set attribute {name}."
+            )
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str):
+        raise AttributeError(
+            f"{type(self).__name__} is immutable; cannot delete attribute {name}."
+        )
+
+
+def content_digest(content: Any, *arrays: np.ndarray) -> str:
+    """A hex digest of the repr of `content` and the contents of `arrays`.
+
+    `content` should be built from ints, strings and sorted sequences so
+    that the digest is the same in every process (unlike the builtin hash
+    of strings).
+    """
+    digest = hashlib.blake2b(repr(content).encode(), digest_size=16)
+    for array in arrays:
+        digest.update(repr((array.dtype.str, array.shape)).encode())
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
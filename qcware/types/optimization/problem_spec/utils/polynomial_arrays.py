@@ -0,0 +1,193 @@
+"""
+Vectorized construction of polynomial dicts from arrays of terms.
+
+This produces the same polynomial dict as simplifying the terms with
+qubovert's PUBOMatrix or PUSOMatrix (as PolynomialObjective does) but
+works on whole arrays at once: the terms are padded into the rows of a
+matrix, the variables of each term are sorted, repeated variables are
+reduced (x x = x for boolean variables and z z = 1 for spin variables),
+terms which are then identical are merged by summing their coefficients
+and terms with zero coefficient are dropped.  Terms are kept in the order
+in which they first appear.
+"""
+from typing import Dict, Set, Tuple
+
+import itertools
+
+import numpy as np
+from qcware.types.optimization.variable_types import Domain
+
+
+def canonical_polynomial_from_arrays(
+    term_offsets: np.ndarray,
+    variables: np.ndarray,
+    coefficients: np.ndarray,
+    num_variables: int,
+    domain: Domain,
+) -> Tuple[Dict[Tuple[int, ...], int], Set[int], int]:
+    """
+    Build a simplified polynomial dict from terms laid out as in compressed
+    sparse row matrices: term i has the variables
+    variables[term_offsets[i]:term_offsets[i + 1]] and the coefficient
+    coefficients[i].
+
+    Returns:
+        The polynomial dict, the set of variables appearing in it and its
+        degree (the length of its longest term, or -1 if it has none).
+
+    Raises:
+        ValueError if the arrays are inconsistent, a variable is outside of
+        range(num_variables) or a coefficient is not an integer.
+    """
+    term_offsets = np.asarray(term_offsets, dtype=np.int64).reshape(-1)
+    variables = np.asarray(variables).reshape(-1)
+    coefficients = _integer_coefficients(coefficients)
+    if len(term_offsets) != len(coefficients) + 1:
+        raise ValueError(
+            f"Expected {len(coefficients) + 1} term offsets for "
+            f"{len(coefficients)} coefficients but found {len(term_offsets)}."
+        )
+    lengths = np.diff(term_offsets)
+    if (
+        term_offsets[0] != 0
+        or (lengths < 0).any()
+        or term_offsets[-1] != len(variables)
+    ):
+        raise ValueError(
+            "Term offsets must increase from 0 to the number of variables "
+            "of all terms."
+        )
+    if len(variables) > 0 and (
+        not np.issubdtype(variables.dtype, np.integer)
+        or variables.min() < 0
+        or variables.max() >= num_variables
+    ):
+        raise ValueError(
+            f"Specified number of variables {num_variables} is inconsistent "
+            f"with the variables in the polynomial.\nExpected variables to be "
+            f"ints in the range {{0,...,{num_variables - 1}}}."
+        )
+
+    # one row per term, padded with a value sorting after every variable
+    padding = num_variables
+    degree = int(lengths.max(initial=0))
+    terms = np.full((len(lengths), degree), padding, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    columns = np.arange(len(variables)) - np.repeat(term_offsets[:-1], lengths)
+    terms[rows, columns] = variables
+    terms.sort(axis=1)
+    terms = _reduce_repeated_variables(terms, padding, domain)
+
+    first, inverse = _unique_rows(terms, padding)
+    sums = np.zeros(len(first), dtype=coefficients.dtype)
+    np.add.at(sums, inverse, coefficients)
+    nonzero = np.flatnonzero(sums != 0)
+    order = nonzero[np.argsort(_insertion_positions(inverse, coefficients)[nonzero])]
+    terms = terms[first[order]]
+    sums = sums[order]
+
+    term_lengths = (terms != padding).sum(axis=1)
+    polynomial = {
+        tuple(term[:length]): coefficient
+        for term, length, coefficient in zip(
+            terms.tolist(), term_lengths.tolist(), sums.tolist()
+        )
+    }
+    active_variables = set(np.unique(terms[terms != padding]).tolist())
+    degree = int(term_lengths.max()) if len(terms) > 0 else -1
+    return polynomial, active_variables, degree
+
+
+def sorted_term_arrays(
+    polynomial: Dict[Tuple[int, ...], int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The terms of a polynomial dict as the rows of an int64 matrix, padded
+    with -1, in lexicographic order (which does not depend on the order of
+    the dict), and their coefficients in the same order.
+    """
+    lengths = np.fromiter(map(len, polynomial), dtype=np.int64, count=len(polynomial))
+    variables = np.fromiter(
+        itertools.chain.from_iterable(polynomial),
+        dtype=np.int64,
+        count=int(lengths.sum()),
+    )
+    terms = np.full((len(lengths), int(lengths.max(initial=0))), -1, dtype=np.int64)
+    term_starts = np.cumsum(lengths) - lengths
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    terms[rows, np.arange(len(variables)) - np.repeat(term_starts, lengths)] = variables
+    order = np.lexsort(terms.T[::-1]) if terms.shape[1] > 0 else np.arange(len(terms))
+    coefficients = np.array(list(polynomial.values()))
+    return terms[order], coefficients[order]
+
+
+def _insertion_positions(inverse: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+    """
+    For each distinct term, the index of the last of its occurrences which
+    took its running sum from zero to nonzero.  Adding the terms one by one
+    to a dict, deleting those whose sum becomes zero (as qubovert does),
+    leaves the terms in the order of these positions.
+    """
+    order = np.argsort(inverse, kind="stable")
+    sorted_coefficients = coefficients[order]
+    sums = np.cumsum(sorted_coefficients)
+    # the sums restarted at each term
+    group_starts = np.flatnonzero(np.diff(inverse[order], prepend=-1))
+    group_sizes = np.diff(np.append(group_starts, len(order)))
+    before = sums[group_starts] - sorted_coefficients[group_starts]
+    running = sums - np.repeat(before, group_sizes)
+    inserted = (running == sorted_coefficients) & (running != 0)
+    positions = np.full(len(group_starts), -1, dtype=np.int64)
+    np.maximum.at(positions, inverse[order][inserted], order[inserted])
+    return positions
+
+
+def _integer_coefficients(coefficients) -> np.ndarray:
+    coefficients = np.asarray(coefficients).reshape(-1)
+    if np.issubdtype(coefficients.dtype, np.integer):
+        return coefficients.astype(np.int64)
+    if np.issubdtype(coefficients.dtype, np.floating) or len(coefficients) == 0:
+        integers = coefficients.astype(np.int64)
+        if (integers == coefficients).all():
+            return integers
+    raise ValueError("Polynomial coefficients must be integers.")
+
+
+def _reduce_repeated_variables(
+    terms: np.ndarray, padding: int, domain: Domain
+) -> np.ndarray:
+    """
+    Reduce repeated variables in terms whose variables are sorted, leaving
+    one of each for boolean variables and one of each odd number for spin
+    variables, and sort the padding back to the end.
+    """
+    if terms.shape[1] < 2:
+        return terms
+    for j in range(1, terms.shape[1]):
+        repeated = (terms[:, j] == terms[:, j - 1]) & (terms[:, j] != padding)
+        terms[repeated, j - 1] = padding
+        if domain is Domain.SPIN:
+            terms[repeated, j] = padding
+    terms.sort(axis=1)
+    # drop the columns which are now padding in every term
+    width = int((terms != padding).sum(axis=1).max(initial=0))
+    return np.ascontiguousarray(terms[:, :width])
+
+
+def _unique_rows(terms: np.ndarray, padding: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The first index of each distinct row, and for each row the index of
+    its distinct row among them"""
+    if terms.shape[1] == 0:
+        return np.zeros(min(1, len(terms)), dtype=np.intp), np.zeros(
+            len(terms), dtype=np.intp
+        )
+    base = padding + 1
+    if base ** terms.shape[1] < 2**63:
+        # a term as a number in base (num_variables + 1); ints sort fastest
+        keys = np.zeros(len(terms), dtype=np.int64)
+        for j in range(terms.shape[1]):
+            keys = keys * base + terms[:, j]
+    else:
+        keys = terms.view(np.dtype((np.void, terms.shape[1] * 8))).reshape(-1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first, inverse.reshape(-1)
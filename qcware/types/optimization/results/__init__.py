@@ -1,2 +1,2 @@
 from .results_types import BruteOptimizeResult
-from .results_types import Sample, BinaryResults
+from .results_types import Sample, SampleTable, SampleAccumulator, BinaryResults
@@ -1,11 +1,12 @@
 from collections import OrderedDict
-from itertools import tee, takewhile
-from typing import Iterator, List, Optional, Tuple, Union, Iterable
+from itertools import islice, tee, takewhile
+from typing import Iterator, List, Optional, Sequence, Tuple, Union, Iterable
 
 import numpy as np
 import pydantic
 from qcware.types.optimization import Domain
 from qcware.types.optimization.problem_spec import BinaryProblem
+from qcware.types.optimization.problem_spec.compiled_polynomial import Block_entries
 from qcware.types.optimization.results import utils
 from qcware.types.optimization.variable_types import domain_bit_values
 from typing import Dict
@@ -74,13 +75,441 @@ def spin_sample_to_bool_sample(s: Sample):
         raise ValueError(f"Expected sample to have spin domain.\nFound: {s}")
 
 
+class SampleTable(Sequence):
+    """The distinct samples of a BinaryResults, stored as arrays.
+
+    Each sample takes one row of three arrays: its bitstring packed
+    eight variables per byte (a set bit meaning 1 in the boolean domain
+    and -1 in the spin domain), its value and its number of occurrences.
+    Rows are sorted by value, keeping the given order among equal values.
+
+    The table is a sequence of Sample objects, which are only built
+    when indexed or iterated over.
+
+    Attributes:
+        packed_bitstrings: uint8 array of shape
+            (num_samples, ceil(num_variables / 8)).
+
+        values: int64 array of the value of each sample.
+
+        occurrences: int64 array of the occurrences of each sample.
+
+        num_variables: The number of variables of each bitstring.
+
+        domain: Specifies if variables take on boolean (0, 1) or spin (1, -1)
+            values.
+    """
+
+    def __init__(
+        self,
+        packed_bitstrings: np.ndarray,
+        values: np.ndarray,
+        occurrences: np.ndarray,
+        num_variables: int,
+        domain: Domain = Domain.BOOLEAN,
+    ):
+        values = np.asarray(values, dtype=np.int64).reshape(-1)
+        occurrences = np.asarray(occurrences, dtype=np.int64).reshape(-1)
+        packed_bitstrings = np.asarray(packed_bitstrings, dtype=np.uint8).reshape(
+            len(values), _packed_width(num_variables)
+        )
+        if len(occurrences) != len(values):
+            raise ValueError(
+                f"Found {len(values)} values but {len(occurrences)} occurrences."
+            )
+        if (occurrences <= 0).any():
+            raise ValueError("Sample occurrences must be positive.")
+        if len(values) > 1 and (values[1:] < values[:-1]).any():
+            order = np.argsort(values, kind="stable")
+            packed_bitstrings = packed_bitstrings[order]
+            values = values[order]
+            occurrences = occurrences[order]
+        self.packed_bitstrings = np.ascontiguousarray(packed_bitstrings)
+        self.values = values
+        self.occurrences = occurrences
+        self.num_variables = num_variables
+        self.domain = Domain(domain)
+        self._index: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_bitstrings(
+        cls,
+        bitstrings: np.ndarray,
+        values: np.ndarray,
+        occurrences: np.ndarray,
+        domain: Domain = Domain.BOOLEAN,
+    ) -> "SampleTable":
+        """Build a table from a (num_samples, num_variables) array of bitstrings.
+
+        The bitstrings hold the bit values of the domain and are expected
+        to be distinct.
+        """
+        bitstrings = np.asarray(bitstrings)
+        if bitstrings.ndim != 2:
+            raise ValueError(
+                f"Expected an array of bitstrings of shape "
+                f"(num_samples, num_variables) but found shape {bitstrings.shape}."
+            )
+        return cls(
+            pack_bitstrings(bitstrings, domain),
+            values,
+            occurrences,
+            num_variables=bitstrings.shape[1],
+            domain=domain,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        bitstrings: np.ndarray,
+        values: np.ndarray,
+        occurrences: Optional[np.ndarray] = None,
+        domain: Domain = Domain.BOOLEAN,
+    ) -> "SampleTable":
+        """Build a table from samples which may repeat bitstrings.
+
+        Args:
+            bitstrings: Array of shape (num_samples, num_variables) with the
+                bit values of each sample.
+
+            values: The objective value of each sample; samples with the
+                same bitstring must have the same value.
+
+            occurrences: The occurrences of each sample (by default, 1 each);
+                these are summed over samples with the same bitstring.
+
+            domain: Specifies if variables take on boolean (0, 1) or spin
+                (1, -1) values.
+        """
+        bitstrings = np.asarray(bitstrings)
+        if bitstrings.ndim != 2:
+            raise ValueError(
+                f"Expected an array of bitstrings of shape "
+                f"(num_samples, num_variables) but found shape {bitstrings.shape}."
+            )
+        accumulator = SampleAccumulator(bitstrings.shape[1], domain)
+        accumulator.add(bitstrings, values, occurrences)
+        return accumulator.table()
+
+    @classmethod
+    def from_samples(
+        cls,
+        samples: Iterable[Sample],
+        num_variables: int,
+        domain: Domain = Domain.BOOLEAN,
+    ) -> "SampleTable":
+        samples = list(samples)
+        if samples:
+            bitstrings = samples_to_array(samples, domain, num_variables)
+        else:
+            bitstrings = np.zeros((0, num_variables), dtype=np.int8)
+        return cls(
+            pack_bitstrings(bitstrings, domain, validate=False),
+            [s.value for s in samples],
+            [s.occurrences for s in samples],
+            num_variables=num_variables,
+            domain=domain,
+        )
+
+    def bitstrings(self, rows=slice(None)) -> np.ndarray:
+        """The bitstrings of the given rows, as an int8 array of bit values."""
+        bits = self._bits(rows)
+        if self.domain is Domain.SPIN:
+            return 1 - 2 * bits
+        return bits
+
+    def _bits(self, rows) -> np.ndarray:
+        """The set bits of the given rows, unpacked as 0 or 1"""
+        return np.unpackbits(
+            self.packed_bitstrings[rows], axis=-1, count=self.num_variables
+        ).view(np.int8)
+
+    def key(self, i: int) -> str:
+        """The bitstring of row i in a format like '011' or '+--'."""
+        return _Key_characters[self.domain][self._bits(i)].tobytes().decode("ascii")
+
+    def keys(self) -> List[str]:
+        """The bitstring of every row in a format like '011' or '+--'."""
+        if self.num_variables == 0:
+            return [""] * len(self)
+        characters = _Key_characters[self.domain][self._bits(slice(None))]
+        keys = characters.view(f"S{self.num_variables}").reshape(-1)
+        return [k.decode("ascii") for k in keys]
+
+    def find(self, bitstring: Union[str, Iterable[int]]) -> Optional[int]:
+        """The row of the given bitstring, or None if it was not sampled."""
+        if isinstance(bitstring, str):
+            characters = _Key_characters[self.domain].tobytes().decode("ascii")
+            bits = np.array([characters.find(c) for c in bitstring], dtype=np.int8)
+        else:
+            bits = np.asarray(list(bitstring))
+            valid = np.isin(bits, domain_bit_values(self.domain))
+            bits = (bits != domain_bit_values(self.domain)[0]).astype(np.int8)
+            bits[~valid] = -1
+        if len(bits) != self.num_variables or (bits < 0).any():
+            return None
+        if self._index is None:
+            rows = _row_keys(self.packed_bitstrings)
+            order = np.argsort(rows, kind="stable")
+            self._index = (rows[order], order)
+        sorted_rows, order = self._index
+        target = _row_keys(np.packbits(bits.reshape(1, -1), axis=-1))
+        position = np.searchsorted(sorted_rows, target[0])
+        if position < len(sorted_rows) and sorted_rows[position] == target[0]:
+            return int(order[position])
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.packed_bitstrings.nbytes + self.values.nbytes + self.occurrences.nbytes
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = range(len(self))[i]
+        # the rows were validated as a whole, so skip validating each Sample
+        return Sample.construct(
+            bitstring=tuple(self.bitstrings(i).tolist()),
+            value=int(self.values[i]),
+            occurrences=int(self.occurrences[i]),
+        )
+
+    def __iter__(self) -> Iterator[Sample]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if not isinstance(other, SampleTable):
+            return NotImplemented
+        return (
+            self.num_variables == other.num_variables
+            and self.domain is other.domain
+            and np.array_equal(self.values, other.values)
+            and np.array_equal(self.occurrences, other.occurrences)
+            and np.array_equal(self.packed_bitstrings, other.packed_bitstrings)
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"SampleTable({len(self)} samples of {self.num_variables} "
+            f"{self.domain.value} variables)"
+        )
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate_type
+
+    @classmethod
+    def validate_type(cls, v):
+        if not isinstance(v, cls):
+            raise TypeError(f"Expected a SampleTable, found {type(v)}")
+        return v
+
+
+class SampleAccumulator:
+    """Merges chunks of samples into a SampleTable as they arrive.
+
+    Each chunk is packed as it is added. Samples with the same bitstring
+    are merged (in the order their bitstrings were first added), summing
+    their occurrences, whenever the chunks added since the last merge
+    hold more samples than were left by it, so that the total cost of
+    merging stays proportional to the number of samples added. A merge
+    finds repeated bitstrings with np.unique over the packed rows and
+    checks that their values agree.
+
+    Args:
+        num_variables: The number of variables of each bitstring.
+
+        domain: Specifies if variables take on boolean (0, 1) or spin (1, -1)
+            values.
+    """
+
+    def __init__(self, num_variables: int, domain: Domain = Domain.BOOLEAN):
+        self.num_variables = num_variables
+        self.domain = Domain(domain)
+        self._merged = (
+            np.zeros((0, _packed_width(num_variables)), dtype=np.uint8),
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int64),
+        )
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._num_pending = 0
+
+    def add(
+        self,
+        bitstrings: np.ndarray,
+        values: np.ndarray,
+        occurrences: Optional[np.ndarray] = None,
+    ) -> "SampleAccumulator":
+        """Add a chunk of samples, as for SampleTable.from_arrays."""
+        bitstrings = np.asarray(bitstrings)
+        if bitstrings.ndim != 2 or bitstrings.shape[1] != self.num_variables:
+            raise ValueError(
+                f"Expected an array of bitstrings of shape "
+                f"(num_samples, {self.num_variables}) but found shape "
+                f"{bitstrings.shape}."
+            )
+        values = np.asarray(values, dtype=np.int64).reshape(-1)
+        if occurrences is None:
+            occurrences = np.ones(len(values), dtype=np.int64)
+        occurrences = np.asarray(occurrences, dtype=np.int64).reshape(-1)
+        if not len(bitstrings) == len(values) == len(occurrences):
+            raise ValueError(
+                f"Found {len(bitstrings)} bitstrings, {len(values)} values and "
+                f"{len(occurrences)} occurrences."
+            )
+        if (occurrences <= 0).any():
+            raise ValueError("Sample occurrences must be positive.")
+        packed = pack_bitstrings(bitstrings, self.domain)
+        self._pending.append((packed, values, occurrences))
+        self._num_pending += len(values)
+        if self._num_pending > len(self._merged[1]):
+            self._merge()
+        return self
+
+    def _merge(self):
+        packed, values, occurrences = (
+            np.concatenate(parts) for parts in zip(self._merged, *self._pending)
+        )
+        self._merged = _merge_repeated_bitstrings(packed, values, occurrences)
+        self._pending = []
+        self._num_pending = 0
+
+    def table(self) -> SampleTable:
+        """The distinct samples added so far, sorted by value."""
+        if self._pending:
+            self._merge()
+        return SampleTable(
+            *self._merged, num_variables=self.num_variables, domain=self.domain
+        )
+
+
+def _merge_repeated_bitstrings(
+    packed: np.ndarray, values: np.ndarray, occurrences: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge the rows with the same packed bitstring, summing occurrences"""
+    _, first, inverse = np.unique(
+        _row_keys(packed), return_index=True, return_inverse=True
+    )
+    # keep the bitstrings in the order they were first seen
+    order = np.argsort(first)
+    first = first[order]
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    inverse = rank[inverse.reshape(-1)]
+    if (values != values[first][inverse]).any():
+        raise ValueError(
+            "Encountered samples with identical bitstring but "
+            "distinct objective values."
+        )
+    merged_occurrences = np.zeros(len(first), dtype=np.int64)
+    np.add.at(merged_occurrences, inverse, occurrences)
+    return packed[first], values[first], merged_occurrences
+
+
+# the characters of bitstring keys, indexed by the set bits
+_Key_characters = {
+    Domain.BOOLEAN: np.frombuffer(b"01", dtype=np.uint8),
+    Domain.SPIN: np.frombuffer(b"+-", dtype=np.uint8),
+}
+
+
+def _packed_width(num_variables: int) -> int:
+    return (num_variables + 7) // 8
+
+
+def _row_keys(packed: np.ndarray) -> np.ndarray:
+    """A single sortable item per row of a packed bitstring array"""
+    width = packed.shape[1]
+    if width <= 8:
+        # integers sort much faster than bytes
+        padded = np.zeros((len(packed), 8), dtype=np.uint8)
+        padded[:, :width] = packed
+        return padded.view(">u8").reshape(-1)
+    packed = np.ascontiguousarray(packed)
+    return packed.view(np.dtype((np.void, width))).reshape(-1)
+
+
+def pack_bitstrings(
+    bitstrings: np.ndarray, domain: Domain, validate: bool = True
+) -> np.ndarray:
+    """Pack a (num_samples, num_variables) array of bit values into bytes.
+
+    The array is packed in blocks, so that checking (when validate is True)
+    that it only holds bit values of the domain needs little memory.
+    """
+    bitstrings = np.asarray(bitstrings)
+    num_samples, num_variables = bitstrings.shape
+    zero_bit, one_bit = domain_bit_values(domain)
+    packed = np.empty((num_samples, _packed_width(num_variables)), dtype=np.uint8)
+    block = max(1, Block_entries // max(1, num_variables))
+    for start in range(0, num_samples, block):
+        rows = bitstrings[start : start + block]
+        set_bits = rows != zero_bit
+        if validate and not (rows[set_bits] == one_bit).all():
+            raise ValueError(
+                f"Bitstrings are expected to have domain {domain} but "
+                f"found entries outside of {[zero_bit, one_bit]}."
+            )
+        packed[start : start + block] = np.packbits(set_bits, axis=-1)
+    return packed
+
+
 class BinaryResults(pydantic.BaseModel):
-    sample_ordered_dict: OrderedDict
+    """Samples of a BinaryProblem, ordered by objective value.
+
+    The samples are held in a SampleTable; a `sample_ordered_dict` mapping
+    bitstring strings to Samples is still accepted on construction and is
+    available (built on first use) as a property.
+    """
+
+    sample_table: SampleTable
     original_problem: BinaryProblem
     task_metadata: Optional[dict] = None
     result_metadata: Optional[dict] = None
+    _sample_ordered_dict: Optional[OrderedDict] = pydantic.PrivateAttr(None)
     _sample_list: Optional[List[Sample]] = pydantic.PrivateAttr(None)
 
+    @pydantic.root_validator(pre=True)
+    def table_from_sample_ordered_dict(cls, values):
+        if "sample_ordered_dict" in values:
+            if "sample_table" in values:
+                raise ValueError(
+                    "Specify only one of sample_table and sample_ordered_dict."
+                )
+            problem = values.get("original_problem")
+            if isinstance(problem, dict):
+                problem = BinaryProblem(**problem)
+            if not isinstance(problem, BinaryProblem):
+                raise ValueError("Expected original_problem to be a BinaryProblem.")
+            values = dict(values, original_problem=problem)
+            samples = values.pop("sample_ordered_dict").values()
+            values["sample_table"] = SampleTable.from_samples(
+                (s if isinstance(s, Sample) else Sample(**s) for s in samples),
+                num_variables=problem.num_variables,
+                domain=problem.domain,
+            )
+        return values
+
+    @pydantic.validator("sample_table")
+    def table_matches_problem(cls, table, values):
+        problem = values.get("original_problem")
+        if problem is not None and (
+            table.num_variables != problem.num_variables
+            or table.domain is not problem.domain
+        ):
+            raise ValueError(
+                f"The samples have {table.num_variables} {table.domain.value} "
+                f"variables but the original problem has "
+                f"{problem.num_variables} {problem.domain.value} variables."
+            )
+        return table
+
     @classmethod
     def from_unsorted_samples(
         cls,
@@ -89,44 +518,56 @@ class BinaryResults(pydantic.BaseModel):
         task_metadata: Optional[dict] = None,
         result_metadata: Optional[dict] = None,
     ):
-        # accumulator indexed by bitstring:
-        accumulator = {}
-
-        for s in samples:
-            bitstring = s.str_bitstring(domain=original_problem.domain)
-            if bitstring in accumulator:
-                accumulator[bitstring].occurrences += s.occurrences
-                if accumulator[bitstring].value != s.value:
-                    raise ValueError(
-                        "Encountered samples with identical bitstring but "
-                        "distinct objective values."
-                    )
-            else:
-                accumulator[bitstring] = s
-                if len(bitstring) != original_problem.num_variables:
+        num_variables = original_problem.num_variables
+        accumulator = SampleAccumulator(num_variables, original_problem.domain)
+        # samples are added in chunks to bound the memory of their arrays
+        chunk_size = max(1, Block_entries // max(1, num_variables))
+        samples = iter(samples)
+        while True:
+            chunk = list(islice(samples, chunk_size))
+            if not chunk:
+                break
+            for s in chunk:
+                if len(s.bitstring) != num_variables:
                     raise ValueError(
                         f"Encountered bitstring with {len(s.bitstring)} "
-                        f"variables. Expected "
-                        f"{original_problem.num_variables}."
+                        f"variables. Expected {num_variables}."
                     )
-
-        sample_ordered_dict = (
-            (k, v) for (k, v) in sorted(accumulator.items(), key=lambda x: x[1].value)
-        )
-        sample_ordered_dict = OrderedDict(sample_ordered_dict)
+            accumulator.add(
+                np.array([s.bitstring for s in chunk]).reshape(-1, num_variables),
+                [s.value for s in chunk],
+                [s.occurrences for s in chunk],
+            )
         return cls(
-            sample_ordered_dict=sample_ordered_dict,
+            sample_table=accumulator.table(),
             original_problem=original_problem,
             task_metadata=task_metadata,
             result_metadata=result_metadata,
         )
 
-    def __eq__(self, value):
-        return (
-            self.sample_ordered_dict == value.sample_ordered_dict
-            and self.original_problem == value.original_problem
-            and self.task_metadata == value.task_metadata
-            and self.result_metadata == value.result_metadata
+    @classmethod
+    def from_arrays(
+        cls,
+        bitstrings: np.ndarray,
+        values: np.ndarray,
+        original_problem: BinaryProblem,
+        occurrences: Optional[np.ndarray] = None,
+        task_metadata: Optional[dict] = None,
+        result_metadata: Optional[dict] = None,
+    ):
+        """Build results from arrays of samples which may repeat bitstrings.
+
+        See SampleTable.from_arrays for the arrays; to merge samples as they
+        arrive in chunks, add them to a SampleAccumulator and pass its
+        table() as sample_table.
+        """
+        return cls(
+            sample_table=SampleTable.from_arrays(
+                bitstrings, values, occurrences, domain=original_problem.domain
+            ),
+            original_problem=original_problem,
+            task_metadata=task_metadata,
+            result_metadata=result_metadata,
         )
 
     def __getitem__(self, bitstring: Union[str, Iterable[int]]) -> Sample:
@@ -140,39 +581,49 @@ class BinaryResults(pydantic.BaseModel):
             Sample with occurrences set to the total number of occurrences
             for this particular bitstring.
         """
-        if not isinstance(bitstring, str):
-            bitstring = binary_ints_to_binstring(bitstring, domain=self.domain)
-
-        try:
-            return self.sample_ordered_dict[bitstring]
-        except KeyError:
+        row = self.sample_table.find(bitstring)
+        if row is None:
+            if not isinstance(bitstring, str):
+                bitstring = binary_ints_to_binstring(bitstring, domain=self.domain)
             raise KeyError(f"There is no sample matching {bitstring}.")
+        return self.sample_table[row]
 
     def num_occurrences(self, bitstring: Union[str, Iterable[int]]) -> int:
         """Get the number of occurrences for a given binary string.
 
         If the specified bitstring does has no samples, 0 is returned.
         """
-        try:
-            return self[bitstring].occurrences
-        except KeyError:
-            return 0
+        row = self.sample_table.find(bitstring)
+        return 0 if row is None else int(self.sample_table.occurrences[row])
 
-    def keys(self):
+    def keys(self) -> Iterator[str]:
         """Iterate through str representations of samples.
 
         The keys are binary strings like '0101'. The order of the iteration
         goes from lowest values of the objective function to highest.
         """
-        return self.sample_ordered_dict.keys()
+        table = self.sample_table
+        return (table.key(i) for i in range(len(table)))
 
-    def items(self):
+    def items(self) -> Iterator[Tuple[str, Sample]]:
         """Iterate through the sample data.
 
         The order of iteration goes from lowest values of the objective
         function to the highest.
         """
-        return self.sample_ordered_dict.items()
+        table = self.sample_table
+        return ((table.key(i), table[i]) for i in range(len(table)))
+
+    @property
+    def sample_ordered_dict(self) -> OrderedDict:
+        """OrderedDict from bitstring strings to samples, ordered by value.
+
+        This holds a Sample object per distinct bitstring, so for large
+        results prefer the arrays of sample_table.
+        """
+        if self._sample_ordered_dict is None:
+            self._sample_ordered_dict = OrderedDict(self.items())
+        return self._sample_ordered_dict
 
     @property
     def domain(self) -> Domain:
@@ -185,19 +636,20 @@ class BinaryResults(pydantic.BaseModel):
         return self.original_problem.num_variables
 
     @property
-    def samples(self):
-        return self.sample_ordered_dict.values()
+    def samples(self) -> SampleTable:
+        """The samples, ordered by objective value."""
+        return self.sample_table
 
     @property
     def sample_list(self) -> List[Sample]:
         """List of all samples ordered by objective value."""
         if self._sample_list is None:
-            self._sample_list = list(self.sample_ordered_dict.values())
+            self._sample_list = list(self.sample_table)
         return self._sample_list
 
     @property
     def num_distinct_bitstrings(self) -> int:
-        return len(self.sample_ordered_dict)
+        return len(self.sample_table)
 
     @property
     def total_num_occurrences(self) -> int:
@@ -205,13 +657,12 @@ class BinaryResults(pydantic.BaseModel):
 
         Includes in the count multiple occurrences of the same strings.
         """
-        return sum(s.occurrences for s in self.sample_list)
+        return int(self.sample_table.occurrences.sum())
 
     @property
     def lowest_value(self) -> int:
         """Lowest observed value of the objective function."""
-        first_sample = next(iter(self.samples))
-        return first_sample.value
+        return int(self.sample_table.values[0])
 
     @property
     def lowest_value_bitstring(self) -> Tuple[int, ...]:
@@ -221,15 +672,12 @@ class BinaryResults(pydantic.BaseModel):
         lowest value. To get all bitstrings with lowest value, use
         lowest_value_sample_list.
         """
-        first_sample = next(iter(self.samples))
-        return first_sample.bitstring
+        return self.sample_table[0].bitstring
 
     @property
     def lowest_value_sample_list(self) -> List[Sample]:
         """List of samples with lowest observed objective value."""
-        lowest_value = self.lowest_value
-        samples = takewhile(lambda s: s.value == lowest_value, self.samples)
-        return list(samples)
+        return self.sample_table[: self.num_bitstrings_lowest_value]
 
     @property
     def num_occurrences_lowest_value(self) -> int:
@@ -238,8 +686,8 @@ class BinaryResults(pydantic.BaseModel):
 
     def num_occurrences_under(self, val: int) -> int:
         """The number of occurrences below a given objective value."""
-        samples = takewhile(lambda s: s.value < val, self.samples)
-        return sum(s.occurrences for s in samples)
+        table = self.sample_table
+        return int(table.occurrences[: self.num_bitstrings_under(val)].sum())
 
     @property
     def num_bitstrings_lowest_value(self) -> int:
@@ -248,12 +696,11 @@ class BinaryResults(pydantic.BaseModel):
 
     def num_bitstrings_under(self, val: int) -> int:
         """The number of distinct bitstrings below a given objective value."""
-        samples = takewhile(lambda s: s.value < val, self.samples)
-        return sum(1 for _ in samples)
+        return int(np.searchsorted(self.sample_table.values, val, side="left"))
 
     def __eq__(self, other: "BinaryResults"):
         conditions = (
-            self.sample_ordered_dict == other.sample_ordered_dict,
+            self.sample_table == other.sample_table,
             self.original_problem == other.original_problem,
             self.task_metadata == other.task_metadata,
             self.result_metadata == other.result_metadata,
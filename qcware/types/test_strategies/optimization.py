@@ -32,7 +32,9 @@ def keys(min_var: int = 0, max_var: int = 4):
 
 
 def qdicts(min_var: int = 0, max_var: int = 4, min_size: int = 1, max_size: int = 3):
-    return dictionaries(keys(), integers(1, 5), min_size=1, max_size=3)
+    return dictionaries(
+        keys(min_var, max_var), integers(1, 5), min_size=min_size, max_size=max_size
+    )
 
 
 @composite
@@ -60,11 +62,15 @@ def constraints(draw, num_vars):
             min_size=1,
         )
     )
-    # we force all constraints here to have the same number of variables
-    for constraint, polys in constraint_dict.items():
-        for p in polys:
-            p.domain = domain
-            p.num_variables = num_vars
+    # we force all constraints here to have the same domain and number of
+    # variables; objectives are immutable, so they are rebuilt
+    constraint_dict = {
+        predicate: [
+            PolynomialObjective(p.polynomial, num_variables=num_vars, domain=domain)
+            for p in polys
+        ]
+        for predicate, polys in constraint_dict.items()
+    }
     return Constraints(constraint_dict, num_vars)
 
 
@@ -110,4 +116,4 @@ def sample_sequences(draw, problem, num_samples):
 @composite
 def binary_results(draw, problem, num_samples):
     these_samples = draw(sample_sequences(problem, num_samples))
-    return BinaryResults.from_unsorted_samples(samples, original_problem)
+    return BinaryResults.from_unsorted_samples(these_samples, problem)
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from qcware.serialization.transforms.to_wire import binary_results_from_wire, to_wire
+from qcware.types.optimization import (
+    BinaryProblem,
+    BinaryResults,
+    PolynomialObjective,
+    Sample,
+    SampleTable,
+)
+from qcware.types.optimization.results import SampleAccumulator
+from qcware.serialization.wire_features import (
+    Columnar_samples_wire_feature,
+    enable_wire_features,
+)
+
+
+def problem(domain="boolean", num_variables=3):
+    return BinaryProblem(
+        objective=PolynomialObjective(
+            polynomial={(0,): 1, (0, 1): -2, (num_variables - 1,): 1},
+            num_variables=num_variables,
+            domain=domain,
+        )
+    )
+
+
+def sample(p: BinaryProblem, bitstring, occurrences=1):
+    value = p.objective.compute_value(dict(enumerate(bitstring)))
+    return Sample(bitstring=bitstring, value=value, occurrences=occurrences)
+
+
+@pytest.mark.parametrize("domain", ["boolean", "spin"])
+def test_results_api(domain):
+    p = problem(domain)
+    bits = [0, 1] if domain == "boolean" else [1, -1]
+    bitstrings = [tuple(bits[(n >> k) & 1] for k in range(3)) for n in range(8)]
+    samples = [sample(p, b, occurrences=n + 1) for n, b in enumerate(bitstrings)]
+    results = BinaryResults.from_unsorted_samples(samples * 2, p)
+    expected = sorted(samples, key=lambda s: s.value)
+
+    assert results.num_distinct_bitstrings == 8
+    assert list(results.samples) == [s + s for s in expected]
+    assert list(results.keys()) == [s.str_bitstring(p.domain) for s in expected]
+    for key, s in results.items():
+        assert results[key] == results[s.bitstring] == s
+        assert results.num_occurrences(key) == s.occurrences
+    assert results.total_num_occurrences == 2 * sum(range(1, 9))
+    assert results.lowest_value == expected[0].value
+    lowest = [s + s for s in expected if s.value == expected[0].value]
+    assert results.lowest_value_sample_list == lowest
+    assert results.num_occurrences_lowest_value == sum(s.occurrences for s in lowest)
+    assert results.num_bitstrings_under(expected[-1].value) == sum(
+        s.value < expected[-1].value for s in expected
+    )
+    assert list(results.sample_ordered_dict) == list(results.keys())
+
+
+def test_missing_bitstrings():
+    p = problem(num_variables=10)
+    results = BinaryResults.from_unsorted_samples([sample(p, (0,) * 10)], p)
+    for missing in ["0000000001", (1,) + (0,) * 9, "000", "+" * 10]:
+        assert results.num_occurrences(missing) == 0
+        with pytest.raises(KeyError):
+            results[missing]
+
+
+def test_inconsistent_samples():
+    p = problem()
+    with pytest.raises(ValueError, match="distinct objective values"):
+        BinaryResults.from_unsorted_samples(
+            [Sample(bitstring=(0, 0, 0), value=v) for v in (0, 1)], p
+        )
+    with pytest.raises(ValueError, match="Expected 3"):
+        BinaryResults.from_unsorted_samples([Sample(bitstring=(0, 0), value=0)], p)
+    with pytest.raises(ValueError, match="entries outside"):
+        SampleTable.from_bitstrings([[0, 2]], [0], [1])
+
+
+def test_table_is_sorted_and_packed():
+    rng = np.random.default_rng(0)
+    bitstrings = rng.integers(0, 2, size=(1000, 20))
+    values = rng.integers(-5, 5, size=1000)
+    table = SampleTable.from_bitstrings(bitstrings, values, np.ones(1000))
+    order = np.argsort(values, kind="stable")
+    assert table.packed_bitstrings.shape == (1000, 3)
+    assert (table.values == values[order]).all()
+    assert (table.bitstrings() == bitstrings[order]).all()
+    assert table.find(bitstrings[order[10]]) == 10
+
+
+def test_legacy_construction():
+    p = problem("spin")
+    samples = [sample(p, b) for b in [(1, 1, 1), (-1, 1, -1), (1, -1, 1)]]
+    sample_ordered_dict = OrderedDict(
+        (s.str_bitstring(p.domain), s) for s in sorted(samples, key=lambda s: s.value)
+    )
+    results = BinaryResults(
+        sample_ordered_dict=sample_ordered_dict,
+        original_problem=p,
+        task_metadata={},
+        result_metadata={},
+    )
+    assert results == BinaryResults.from_unsorted_samples(
+        samples, p, task_metadata={}, result_metadata={}
+    )
+    assert results.sample_ordered_dict == sample_ordered_dict
+
+
+@pytest.mark.parametrize("num_variables", [5, 70])
+def test_from_arrays_merges_repeated_bitstrings(num_variables):
+    rng = np.random.default_rng(1)
+    p = problem(num_variables=num_variables)
+    bitstrings = rng.integers(0, 2, size=(2000, num_variables))
+    bitstrings[:, 3:] = 0
+    values = p.objective.compute_values(bitstrings)
+    occurrences = rng.integers(1, 4, size=2000)
+    results = BinaryResults.from_arrays(bitstrings, values, p, occurrences)
+    expected = BinaryResults.from_unsorted_samples(
+        (
+            Sample(bitstring=tuple(b), value=v, occurrences=o)
+            for b, v, o in zip(bitstrings.tolist(), values.tolist(), occurrences)
+        ),
+        p,
+    )
+    assert results.num_distinct_bitstrings == 8
+    assert results.total_num_occurrences == occurrences.sum()
+    assert results == expected
+
+    accumulator = SampleAccumulator(num_variables)
+    for start in range(0, 2000, 300):
+        accumulator.add(
+            bitstrings[start : start + 300],
+            values[start : start + 300],
+            occurrences[start : start + 300],
+        )
+    assert accumulator.table() == results.sample_table
+
+
+def test_from_arrays_checks_values():
+    with pytest.raises(ValueError, match="distinct objective values"):
+        SampleTable.from_arrays([[0, 1], [1, 1], [0, 1]], [0, 1, 2])
+    accumulator = SampleAccumulator(2, domain="spin")
+    accumulator.add([[1, -1]], [3])
+    with pytest.raises(ValueError, match="distinct objective values"):
+        accumulator.add([[1, -1], [1, 1]], [4, 0])
+    with pytest.raises(ValueError, match="shape"):
+        accumulator.add([[1, -1, 1]], [4])
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+@pytest.mark.parametrize("domain", ["boolean", "spin"])
+def test_wire_format(domain, columnar):
+    rng = np.random.default_rng(2)
+    p = problem(domain, num_variables=11)
+    bitstrings = rng.integers(0, 2, size=(500, 11))
+    if domain == "spin":
+        bitstrings = 1 - 2 * bitstrings
+    results = BinaryResults.from_arrays(
+        bitstrings,
+        p.objective.compute_values(bitstrings),
+        p,
+        task_metadata={},
+        result_metadata={"solver": "test"},
+    )
+    features = [Columnar_samples_wire_feature] if columnar else []
+    with enable_wire_features(features):
+        wire = to_wire(results)
+    assert ("sample_table" in wire) == columnar
+    assert ("sample_ordered_dict" in wire) != columnar
+    from_wire = binary_results_from_wire(wire)
+    assert from_wire.sample_table == results.sample_table
+    assert from_wire.original_problem == p
+    assert from_wire.original_problem.content_hash() == p.content_hash()
+    assert from_wire.result_metadata == results.result_metadata
@@ -2,6 +2,10 @@ import itertools
 
 import pytest
 from qcware.forge.optimization import brute_force_minimize
+from qcware.serialization.wire_features import (
+    Sparse_polynomials_wire_feature,
+    enable_wire_features,
+)
 from qcware.serialization.transforms.to_wire import (
     constraints_from_wire,
     polynomial_objective_from_wire,
@@ -209,6 +213,36 @@ def test_serialize_constraints():
     assert to_wire(c) == to_wire(c2)
 
 
+@pytest.mark.parametrize("domain", ["boolean", "spin"])
+def test_serialize_sparse_objective(domain):
+    p = PolynomialObjective(
+        polynomial={(): 3, (0,): -1, (1, 4): 2, (0, 2, 3): 5},
+        num_variables=5,
+        domain=domain,
+    )
+    with enable_wire_features([Sparse_polynomials_wire_feature]):
+        wire = to_wire(p)
+    assert "polynomial" not in wire and wire["variable_name_mapping"] is None
+    assert p.dict() == polynomial_objective_from_wire(wire).dict()
+
+    named = PolynomialObjective(
+        polynomial={(0,): 1}, num_variables=2, variable_name_mapping={0: "a", 1: "b"}
+    )
+    with enable_wire_features([Sparse_polynomials_wire_feature]):
+        wire = to_wire(named)
+    assert named.dict() == polynomial_objective_from_wire(wire).dict()
+
+
+def test_serialize_sparse_constraints():
+    c = pubo_example_1(True)["constraints"]
+    with enable_wire_features([Sparse_polynomials_wire_feature]):
+        wire = to_wire(c)
+    assert all(
+        "sparse_polynomial" in p for ps in wire["constraints"].values() for p in ps
+    )
+    assert to_wire(constraints_from_wire(wire)) == to_wire(c)
+
+
 @pytest.mark.parametrize(
     "example,backend",
     itertools.product(unconstrained_examples, ("qcware/cpu", "qcware/gpu")),
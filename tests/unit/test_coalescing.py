@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from qcware.forge.api_calls import api_call_decorator
+from qcware.forge.api_calls.coalescing import call_key
+from qcware.forge.test import echo
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    posted = []
+    release = threading.Event()
+
+    def post_call(endpoint, data):
+        posted.append(data["text"])
+        release.wait(5)
+        if data["text"] == "fail":
+            raise ValueError("refused")
+        return dict(uid=f"{data['text']}-{len(posted)}")
+
+    async def async_post_call(endpoint, data):
+        posted.append(data["text"])
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return dict(uid=f"{data['text']}-{len(posted)}")
+
+    async def async_retrieve_result(call_token):
+        return dict(token=call_token)
+
+    monkeypatch.setattr(api_call_decorator, "post_call", post_call)
+    monkeypatch.setattr(api_call_decorator, "async_post_call", async_post_call)
+    monkeypatch.setattr(
+        api_call_decorator, "async_retrieve_result", async_retrieve_result
+    )
+    monkeypatch.setattr(
+        api_call_decorator, "wait_for_call", lambda call_token: dict(token=call_token)
+    )
+    monkeypatch.setattr(api_call_decorator, "handle_result", lambda call: call)
+    return posted, release
+
+
+def _run_threads(texts, release):
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        futures = [executor.submit(echo.do, text=t) for t in texts]
+        time.sleep(0.2)
+        release.set()
+        return [f.exception() or f.result() for f in futures]
+
+
+def test_identical_calls_are_coalesced(monkeypatch, fake_server):
+    monkeypatch.setenv("QCWARE_COALESCE_CALLS", "True")
+    posted, release = fake_server
+    results = _run_threads(["a"] * 5 + ["b"] * 3, release)
+    assert sorted(posted) == ["a", "b"]
+    assert len({r["token"] for r in results[:5]}) == 1
+    assert len({r["token"] for r in results[5:]}) == 1
+    # once finished, the same call is made afresh
+    assert echo.do(text="a")["token"] not in {r["token"] for r in results}
+
+
+def test_errors_are_shared(monkeypatch, fake_server):
+    monkeypatch.setenv("QCWARE_COALESCE_CALLS", "True")
+    posted, release = fake_server
+    results = _run_threads(["fail"] * 3, release)
+    assert posted == ["fail"]
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_calls_are_not_coalesced_by_default(fake_server):
+    posted, release = fake_server
+    _run_threads(["a"] * 3, release)
+    assert posted == ["a"] * 3
+
+
+def test_async_calls_are_coalesced(monkeypatch, fake_server):
+    monkeypatch.setenv("QCWARE_COALESCE_CALLS", "True")
+    posted, release = fake_server
+
+    async def main():
+        calls = [asyncio.ensure_future(echo.call_async(text="a")) for _ in range(4)]
+        # cancelling one caller does not cancel the shared call
+        await asyncio.sleep(0.05)
+        calls[0].cancel()
+        release.set()
+        return await asyncio.gather(*calls[1:])
+
+    results = asyncio.run(main())
+    assert posted == ["a"]
+    assert len({r["token"] for r in results}) == 1
+
+
+def test_call_key_depends_on_context():
+    data = dict(text="a")
+    assert call_key("echo", data, dict(qcware_host="h1")) == call_key(
+        "echo", dict(data), dict(qcware_host="h1")
+    )
+    assert call_key("echo", data, dict(qcware_host="h1")) != call_key(
+        "echo", data, dict(qcware_host="h2")
+    )
@@ -0,0 +1,48 @@
+import itertools
+
+import numpy as np
+import pytest
+from qcware.types.optimization import Domain, PolynomialObjective
+from qcware.types.optimization.problem_spec import compiled_polynomial
+
+
+def _random_polynomial(rng, num_variables, num_terms, max_degree):
+    polynomial = {(): int(rng.integers(-10, 10))}
+    for _ in range(num_terms):
+        degree = int(rng.integers(1, max_degree + 1))
+        term = tuple(sorted(rng.choice(num_variables, size=degree, replace=False)))
+        polynomial[tuple(int(v) for v in term)] = int(rng.integers(-10, 10))
+    return polynomial
+
+
+@pytest.mark.parametrize("dense_quadratic", [True, False])
+@pytest.mark.parametrize("domain", [Domain.BOOLEAN, Domain.SPIN])
+def test_compute_values_matches_compute_value(domain, dense_quadratic, monkeypatch):
+    # small blocks, so that evaluation is split across several of them
+    monkeypatch.setattr(compiled_polynomial, "Block_entries", 50)
+    if not dense_quadratic:
+        monkeypatch.setattr(compiled_polynomial, "Dense_quadratic_entries", 0)
+    rng = np.random.default_rng(1)
+    objective = PolynomialObjective(
+        _random_polynomial(rng, 6, 20, 4), num_variables=6, domain=domain
+    )
+    bits = [0, 1] if domain is Domain.BOOLEAN else [1, -1]
+    X = np.array(list(itertools.product(bits, repeat=6)))
+    expected = [objective.compute_value(dict(enumerate(x))) for x in X]
+    np.testing.assert_array_equal(objective.compute_values(X), expected)
+    assert objective.compute_values(X[5]) == expected[5]
+    assert (objective.compiled()._quadratic is not None) == dense_quadratic
+
+
+def test_constant_and_empty_polynomials():
+    X = np.zeros((3, 2), dtype=int)
+    assert list(PolynomialObjective({(): 4}, 2).compute_values(X)) == [4, 4, 4]
+    assert list(PolynomialObjective({}, 2).compute_values(X)) == [0, 0, 0]
+
+
+def test_invalid_assignments_are_rejected():
+    objective = PolynomialObjective({(0, 1): 1}, 2, domain=Domain.SPIN)
+    with pytest.raises(ValueError):
+        objective.compute_values([[0, 1]])
+    with pytest.raises(ValueError):
+        objective.compute_values([[1, 1, 1]])
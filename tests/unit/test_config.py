@@ -1,12 +1,16 @@
+import asyncio
+import importlib
 import os
 
 import pytest
+import requests
 from decouple import UndefinedValueError, config
 from qcware.forge.config import (
     ConfigurationError,
     SchedulingMode,
     additional_config,
     current_context,
+    host_wire_features,
     pop_context,
     push_context,
     qcware_api_key,
@@ -109,3 +113,72 @@ def test_additional_config():
         assert current_context().server_timeout == 120
 
     assert current_context().server_timeout == 42
+
+
+def test_current_context_is_cached():
+    set_server_timeout(42)
+    assert current_context() is current_context()
+
+    # changes through the environment or the stack are still seen
+    os.environ["QCWARE_SERVER_TIMEOUT"] = "43"
+    assert current_context().server_timeout == 43
+    with additional_config(server_timeout=120):
+        cached = current_context()
+        assert cached.server_timeout == 120
+        assert current_context() is cached
+    assert current_context().server_timeout == 43
+
+
+def test_context_cache_follows_asyncio_tasks():
+    set_server_timeout(42)
+
+    async def task_timeout(timeout):
+        with additional_config(server_timeout=timeout):
+            await asyncio.sleep(0)
+            return current_context().server_timeout
+
+    async def run_tasks():
+        return await asyncio.gather(*(task_timeout(t) for t in (1, 2, 3)))
+
+    assert asyncio.run(run_tasks()) == [1, 2, 3]
+    assert current_context().server_timeout == 42
+
+
+def test_host_wire_features_are_asked_again_after_failures(monkeypatch):
+    config_module = importlib.import_module("qcware.forge.config.config")
+    answers = [requests.exceptions.ConnectTimeout(), 503, 200, 200]
+    timeouts = []
+
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+        def json(self):
+            return {"wire_features": ["frames"]}
+
+    def get(url, timeout=None):
+        timeouts.append(timeout)
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return Response(answer)
+
+    monkeypatch.setattr(config_module.requests, "get", get)
+    monkeypatch.setattr(config_module, "_host_wire_features", {})
+    monkeypatch.setattr(config_module, "Host_wire_features_retry_interval", 0)
+    host = "http://features.example.com"
+    assert host_wire_features(host) == frozenset()
+    assert host_wire_features(host) == frozenset()
+    assert host_wire_features(host) == {"frames"}
+    # successful answers are kept
+    assert host_wire_features(host) == {"frames"}
+    assert len(answers) == 1
+    assert all(t is not None for t in timeouts)
+
+
+def test_current_context_overhead():
+    from qcware.forge.testing.benchmark import measure_context_overhead
+
+    for num_contexts in [0, 2]:
+        overhead = measure_context_overhead(num_contexts, number=200)
+        assert overhead["cached"] < overhead["uncached"] / 2
@@ -0,0 +1,67 @@
+import itertools
+
+import numpy as np
+import pytest
+from qcware.types.optimization import Constraints, PolynomialObjective
+from qcware.types.optimization.predicate import Predicate
+
+from test_brute_force import pubo_example_2
+
+X = np.array(list(itertools.product([0, 1], repeat=3)))
+
+
+def test_is_feasible():
+    constraints = pubo_example_2(True)["constraints"]
+    feasible = constraints.is_feasible(X)
+    assert {"".join(map(str, x)) for x in X[feasible]} == {"100", "001"}
+    assert constraints.is_feasible([1, 0, 0]).tolist() == [True]
+
+
+def test_violations():
+    constraints = pubo_example_2(True)["constraints"]
+    violations = constraints.violations(X)
+    assert violations[Predicate.NEGATIVE].tolist() == [0, 0, 0, 0, 0, 0, 0, 1]
+    # (a+b+c-1)^2 == 0 and a + c == 1
+    assert violations[Predicate.ZERO].tolist() == [2, 0, 1, 1, 0, 2, 1, 2]
+    feasible = sum(violations.values()) == 0
+    np.testing.assert_array_equal(feasible, constraints.is_feasible(X))
+
+
+def test_spin_constraints():
+    # z_0 z_1 > 0: the spins agree
+    constraints = Constraints(
+        {
+            Predicate.POSITIVE: [
+                PolynomialObjective({(0, 1): 1}, num_variables=2, domain="spin")
+            ]
+        },
+        num_variables=2,
+    )
+    S = np.array([[1, 1], [1, -1], [-1, 1], [-1, -1]])
+    assert constraints.is_feasible(S).tolist() == [True, False, False, True]
+    with pytest.raises(ValueError):
+        constraints.is_feasible([[0, 1]])
+
+
+def test_constraints_are_immutable_and_hashable():
+    constraints = pubo_example_2(True)["constraints"]
+    same = Constraints(
+        {
+            predicate: [c.clone() for c in polynomials]
+            for predicate, polynomials in constraints.constraint_dict.items()
+        },
+        constraints.num_variables,
+    )
+    assert same == constraints and hash(same) == hash(constraints)
+    assert same.content_hash() == constraints.content_hash()
+    fewer = Constraints(
+        {Predicate.ZERO: list(constraints[Predicate.ZERO])},
+        constraints.num_variables,
+    )
+    assert fewer != constraints and fewer.content_hash() != constraints.content_hash()
+    with pytest.raises(TypeError):
+        constraints.constraint_dict[Predicate.ZERO] = []
+    with pytest.raises(AttributeError):
+        constraints.constraint_dict[Predicate.ZERO].append(same)
+    with pytest.raises(AttributeError, match="immutable"):
+        constraints.num_variables = 4
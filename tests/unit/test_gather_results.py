@@ -0,0 +1,48 @@
+import asyncio
+import importlib
+import random
+
+import pytest
+from qcware.forge.api_calls import gather_results
+from qcware.forge.exceptions import ApiCallExecutionError
+
+
+@pytest.fixture
+def fake_retrieve(monkeypatch):
+    stats = dict(in_flight=0, max_in_flight=0, started=0)
+
+    async def async_retrieve_result(call_token, api_call_context=None):
+        stats["started"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(random.random() / 100)
+            if call_token == "bad":
+                raise ApiCallExecutionError("failed", traceback="")
+            return call_token.upper()
+        finally:
+            stats["in_flight"] -= 1
+
+    # the module is shadowed by the api_call function in the package namespace
+    api_call_module = importlib.import_module("qcware.forge.api_calls.api_call")
+    monkeypatch.setattr(api_call_module, "async_retrieve_result", async_retrieve_result)
+    return stats
+
+
+async def collect(tokens, **kwargs):
+    return [pair async for pair in gather_results(tokens, **kwargs)]
+
+
+def test_gather_results_bounds_in_flight(fake_retrieve):
+    tokens = (f"token{i}" for i in range(200))
+    results = asyncio.run(collect(tokens, max_in_flight=10))
+    assert sorted(results) == sorted((f"token{i}", f"TOKEN{i}") for i in range(200))
+    assert fake_retrieve["max_in_flight"] == 10
+
+
+def test_gather_results_errors(fake_retrieve):
+    with pytest.raises(ApiCallExecutionError):
+        asyncio.run(collect(["a", "bad", "c"]))
+    results = dict(asyncio.run(collect(["a", "bad", "c"], return_exceptions=True)))
+    assert results["a"] == "A"
+    assert isinstance(results["bad"], ApiCallExecutionError)
@@ -0,0 +1,49 @@
+import pathlib
+import subprocess
+import sys
+
+import pytest
+import qcware.forge
+from qcware.forge.testing.benchmark import measure_import_time
+
+Repository_root = pathlib.Path(__file__).parents[2]
+
+Slow_imports = ["aiohttp", "pkg_resources", "quasar", "qubovert", "rich"]
+
+
+def _modules_imported_by(statement):
+    process = subprocess.run(
+        [sys.executable, "-c", f"import sys; {statement}; print(*sys.modules)"],
+        cwd=Repository_root,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return set(process.stdout.split())
+
+
+def test_importing_forge_imports_no_subpackages():
+    modules = _modules_imported_by("import qcware.forge")
+    for module in Slow_imports + ["numpy", "requests", "pydantic", "qcware.forge.qml"]:
+        assert module not in modules
+
+
+def test_synchronous_calls_do_not_import_aiohttp():
+    modules = _modules_imported_by("from qcware.forge.test import echo")
+    for module in ["aiohttp", "pkg_resources", "rich"]:
+        assert module not in modules
+
+
+def test_subpackages_are_imported_on_use():
+    assert "qml" in dir(qcware.forge)
+    assert qcware.forge.qml.fit_and_predict.name == "qml.fit_and_predict"
+    assert isinstance(qcware.forge.__version__, str)
+    with pytest.raises(AttributeError):
+        qcware.forge.not_a_subpackage
+
+
+def test_importing_forge_is_fast():
+    # relative to importing one of the modules the subpackages need, so
+    # that the budget holds on slow machines too
+    forge_time = measure_import_time("qcware.forge", repeat=3)
+    assert 0 < forge_time < 0.5 * measure_import_time("qubovert", repeat=3)
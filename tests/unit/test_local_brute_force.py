@@ -0,0 +1,75 @@
+import itertools
+
+import numpy as np
+import pytest
+from qcware.forge.optimization import brute_force_minimize, brute_force_minimize_local
+from qcware.forge.optimization.local import brute_force
+from qcware.types.optimization import Constraints, Domain, PolynomialObjective
+from qcware.types.optimization.predicate import Predicate
+from qcware.types.optimization.results.results_types import binary_ints_to_binstring
+
+from test_brute_force import constrained_examples, unconstrained_examples
+
+
+@pytest.mark.parametrize("example", unconstrained_examples + constrained_examples)
+def test_examples(example):
+    out = brute_force_minimize_local(example["pubo"], example.get("constraints"))
+    assert out.value == example["expected_value"]
+    assert set(out.argmin) == example["expected_minima"]
+    assert out.solution_exists == example["solution_exists"]
+
+
+def test_api_call_runs_locally():
+    example = constrained_examples[0]
+    out = brute_force_minimize(
+        objective=example["pubo"],
+        constraints=example.get("constraints"),
+        backend="local/numpy",
+    )
+    assert out.value == example["expected_value"]
+    assert set(out.argmin) == example["expected_minima"]
+
+
+def _random_polynomial(rng, num_variables, num_terms, max_degree, domain):
+    polynomial = {(): int(rng.integers(-5, 5))}
+    for _ in range(num_terms):
+        degree = int(rng.integers(1, max_degree + 1))
+        term = sorted(rng.choice(num_variables, size=degree, replace=False))
+        polynomial[tuple(int(v) for v in term)] = int(rng.integers(-5, 5))
+    return PolynomialObjective(polynomial, num_variables, domain=domain)
+
+
+def _exhaustive_minimum(objective, constraints):
+    bits = [0, 1] if objective.domain is Domain.BOOLEAN else [1, -1]
+    X = np.array(list(itertools.product(bits, repeat=objective.num_variables)))
+    feasible = np.ones(len(X), dtype=bool)
+    for predicate in constraints:
+        for c in constraints[predicate]:
+            feasible &= predicate.holds(c.compute_values(X))
+    values = objective.compute_values(X)[feasible]
+    lowest = values.min()
+    return lowest, {
+        binary_ints_to_binstring(x, objective.domain)
+        for x in X[feasible][values == lowest]
+    }
+
+
+@pytest.mark.parametrize("domain", [Domain.BOOLEAN, Domain.SPIN])
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_matches_exhaustive_search(domain, max_workers, monkeypatch):
+    # small grids and chunks, so that every part of the enumeration is used
+    monkeypatch.setattr(brute_force, "Low_bits", 3)
+    monkeypatch.setattr(brute_force, "Parallel_threshold", 4)
+    rng = np.random.default_rng(2)
+    objective = _random_polynomial(rng, 9, 30, 3, domain)
+    constraints = Constraints(
+        {
+            Predicate.NONPOSITIVE: [_random_polynomial(rng, 9, 4, 2, domain)],
+            Predicate.NONZERO: [_random_polynomial(rng, 9, 3, 3, domain)],
+        },
+        num_variables=9,
+    )
+    out = brute_force_minimize_local(objective, constraints, max_workers=max_workers)
+    value, minima = _exhaustive_minimum(objective, constraints)
+    assert out.value == value
+    assert out.argmin == sorted(minima)
@@ -0,0 +1,125 @@
+import asyncio
+import itertools
+
+import numpy as np
+import pytest
+from qcware.forge.optimization import (
+    qaoa_expectation_value,
+    qaoa_expectation_value_local,
+    qaoa_sample,
+    qaoa_sample_local,
+)
+from qcware.types.optimization import (
+    BinaryProblem,
+    Constraints,
+    Domain,
+    PolynomialObjective,
+)
+from qcware.types.optimization.predicate import Predicate
+
+
+def random_problem(rng, num_variables, domain, scale=1):
+    polynomial = {(): int(rng.integers(-5, 5))}
+    for _ in range(2 * num_variables):
+        degree = int(rng.integers(1, 4))
+        term = rng.choice(num_variables, size=min(degree, num_variables), replace=False)
+        polynomial[tuple(int(v) for v in term)] = scale * int(rng.integers(-5, 5))
+    return BinaryProblem(
+        objective=PolynomialObjective(polynomial, num_variables, domain=domain)
+    )
+
+
+def all_assignments(num_variables, domain):
+    bits = [0, 1] if domain is Domain.BOOLEAN else [1, -1]
+    return np.array(list(itertools.product(bits, repeat=num_variables)))
+
+
+def dense_qaoa_state(problem, beta, gamma):
+    """The QAOA state, with the mixer as a dense matrix"""
+    n = problem.num_variables
+    cost = problem.objective.compute_values(all_assignments(n, problem.domain))
+    state = np.full(1 << n, 1 / np.sqrt(1 << n), dtype=complex)
+    for b, g in zip(beta, gamma):
+        state = np.exp(-1j * g * cost) * state
+        rotation = np.array(
+            [[np.cos(b), -1j * np.sin(b)], [-1j * np.sin(b), np.cos(b)]]
+        )
+        mixer = np.ones((1, 1))
+        for _ in range(n):
+            mixer = np.kron(mixer, rotation)
+        state = mixer @ state
+    return state, cost
+
+
+# with coefficients of 1000, costs are too spread out to look up their phases
+@pytest.mark.parametrize("scale", [1, 1000])
+@pytest.mark.parametrize("domain", [Domain.BOOLEAN, Domain.SPIN])
+def test_expectation_value_matches_dense_simulation(domain, scale):
+    rng = np.random.default_rng(1)
+    problem = random_problem(rng, 6, domain, scale)
+    beta, gamma = rng.random((2, 5, 3))
+    value = qaoa_expectation_value_local(problem, beta, gamma)
+    assert value.shape == (5,)
+    for b, g, v in zip(beta, gamma, value):
+        state, cost = dense_qaoa_state(problem, b, g)
+        assert v == pytest.approx(np.abs(state) ** 2 @ cost)
+        assert qaoa_expectation_value_local(problem, b, g) == pytest.approx(v)
+    # through the API call, without contacting the server
+    assert qaoa_expectation_value(
+        problem_instance=problem, beta=beta[0], gamma=gamma[0], backend="local/numpy"
+    ) == pytest.approx(value[0])
+    sampled = qaoa_expectation_value_local(
+        problem, beta[0], gamma[0], num_samples=20000, seed=0
+    )
+    assert sampled == pytest.approx(value[0], abs=0.2 * scale)
+
+
+def test_sample():
+    rng = np.random.default_rng(2)
+    problem = random_problem(rng, 5, Domain.SPIN)
+    beta, gamma = np.array([0.3, 0.6]), np.array([0.2, 0.1])
+    results = qaoa_sample_local(problem, beta, gamma, num_samples=50000, seed=0)
+    assert results.total_num_occurrences == 50000
+    state, _ = dense_qaoa_state(problem, beta, gamma)
+    probabilities = np.abs(state) ** 2
+    for i, x in enumerate(all_assignments(5, Domain.SPIN)):
+        frequency = results.num_occurrences(x) / 50000
+        assert frequency == pytest.approx(probabilities[i], abs=0.01)
+        if results.num_occurrences(x) > 0:
+            assert results[x].value == problem.objective.compute_value(
+                dict(enumerate(x.tolist()))
+            )
+    from_api = asyncio.run(
+        qaoa_sample.call_async(
+            problem_instance=problem,
+            beta=beta,
+            gamma=gamma,
+            num_samples=10,
+            backend="local/numpy",
+        )
+    )
+    assert from_api.total_num_occurrences == 10
+
+
+def test_invalid_calls():
+    problem = random_problem(np.random.default_rng(3), 3, Domain.BOOLEAN)
+    constrained = BinaryProblem(
+        objective=problem.objective,
+        constraints=Constraints({Predicate.ZERO: [{(0,): 1}]}, 3),
+    )
+    with pytest.raises(ValueError, match="unconstrained"):
+        qaoa_expectation_value_local(constrained, [0.1], [0.2])
+    with pytest.raises(ValueError, match="same shape"):
+        qaoa_expectation_value_local(problem, [0.1], [0.2, 0.3])
+    with pytest.raises(ValueError, match="Unknown local backend"):
+        qaoa_expectation_value(
+            problem_instance=problem, beta=[0.1], gamma=[0.2], backend="local/gpu"
+        )
+    with pytest.raises(ValueError, match="cannot be submitted"):
+        qaoa_sample.submit(
+            problem_instance=problem,
+            beta=[0.1],
+            gamma=[0.2],
+            num_samples=10,
+            backend="local/numpy",
+        )
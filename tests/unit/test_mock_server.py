@@ -0,0 +1,238 @@
+import asyncio
+import importlib
+import time
+
+import numpy as np
+import pytest
+from qcware.forge.api_calls import (
+    gather_results,
+    retrieve_parameters,
+    retrieve_result,
+    status,
+)
+from qcware.forge.async_request import close_client_session
+from qcware.forge.config import additional_config
+from qcware.forge.exceptions import (
+    ApiBatchSubmissionError,
+    ApiBatchTimeoutError,
+    ApiCallExecutionError,
+)
+from qcware.forge.optimization import (
+    optimize_binary,
+    qaoa_expectation_value_batch,
+    qaoa_expectation_value_local,
+)
+from qcware.forge.optimization.api import qaoa_expectation_value
+from qcware.forge.qml import fit_and_predict
+from qcware.forge.test import echo
+from qcware.forge.testing import MockForgeServer, MockServerConfig
+from qcware.forge.testing.benchmark import echo_workload, run_benchmark
+from qcware.serialization.frames import Frames_content_type
+from qcware.serialization.wire_features import Batched_qaoa_angles_wire_feature
+from qcware.types.optimization import BinaryProblem, BinaryResults, PolynomialObjective
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("QCWARE_CLIENT_TIMEOUT", "60")
+    with MockForgeServer(MockServerConfig(queue_delay=0.05)) as server:
+        with additional_config(qcware_host=server.url):
+            yield server
+
+
+def test_calls(server):
+    assert echo(text="hello") == "hello"
+    token = echo.submit(text="later")
+    assert status(token)["state"] == "open"
+    assert retrieve_parameters(token)["text"] == "later"
+
+    async def main():
+        try:
+            return await asyncio.gather(
+                echo.call_async(text="a"), echo.call_async(text="b")
+            )
+        finally:
+            await close_client_session()
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert retrieve_result(token) == "later"
+
+
+def test_call_async_asks_for_wire_features_in_a_thread(server, monkeypatch):
+    config_module = importlib.import_module("qcware.forge.config.config")
+    get = config_module.requests.get
+    ticks = []
+
+    def slow_get(url, **kwargs):
+        before = len(ticks)
+        time.sleep(0.5)
+        # other tasks ran while the host was asked
+        assert len(ticks) > before
+        return get(url, **kwargs)
+
+    monkeypatch.setattr(config_module.requests, "get", slow_get)
+    monkeypatch.setattr(config_module, "_host_wire_features", {})
+
+    async def main():
+        async def tick():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        try:
+            return await echo.call_async(text="a")
+        finally:
+            ticker.cancel()
+            await close_client_session()
+
+    with additional_config(wire_format="binary"):
+        assert asyncio.run(main()) == "a"
+    assert server.url in config_module._host_wire_features
+
+
+@pytest.mark.parametrize("wire_format", ["json", "binary"])
+def test_array_results_are_downloaded(server, wire_format):
+    X = np.random.rand(10000, 4)
+    with additional_config(wire_format=wire_format):
+        labels = fit_and_predict(X=X, y=np.zeros(10000), T=X, model="QNearestCentroid")
+    assert labels.shape == (10000,)
+    (call,) = server.calls.values()
+    assert call.wire_size > server.config.inline_result_limit
+    assert (call.params_content_type == Frames_content_type) == (
+        wire_format == "binary"
+    )
+
+
+def test_unimplemented_methods_fail(server):
+    server.handlers.pop("test.echo")
+    with pytest.raises(ApiCallExecutionError, match="does not implement test.echo"):
+        echo(text="hello")
+
+
+def test_batch(server):
+    tokens = [r.call_token for r in echo.submit_many([dict(text="a"), dict(text="b")])]
+
+    async def main():
+        try:
+            return {t: r async for t, r in gather_results(tokens)}
+        finally:
+            await close_client_session()
+
+    assert asyncio.run(main()) == dict(zip(tokens, ["a", "b"]))
+
+
+def test_benchmark(server):
+    result = run_benchmark("echo", "sync", *echo_workload(5))
+    assert result.calls == 5 and result.p50 <= result.p99
+    assert result.peak_memory > 0
+
+
+def _all_samples(config, instance, **kwargs):
+    n = instance.num_variables
+    bitstrings = (np.arange(1 << n)[:, None] >> np.arange(n)) & 1
+    values = instance.objective.compute_values(bitstrings)
+    return BinaryResults.from_arrays(bitstrings, values, instance, task_metadata={})
+
+
+@pytest.mark.parametrize("wire_format", ["json", "binary"])
+def test_binary_results_use_columnar_samples(server, wire_format):
+    server.handlers["optimization.optimize_binary"] = _all_samples
+    problem = BinaryProblem(
+        objective=PolynomialObjective(
+            polynomial={(0,): 1, (0, 1): -2, (9,): 3}, num_variables=10
+        )
+    )
+    with additional_config(wire_format=wire_format):
+        results = optimize_binary(instance=problem, backend="qcware/cpu")
+    (call,) = server.calls.values()
+    assert "sample_table" in call.wire_result
+    # the host lists sparse polynomials among its wire features
+    assert b"sparse_polynomial" in call.params_body
+    assert results.sample_table == _all_samples(None, problem).sample_table
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_qaoa_expectation_value_batch(monkeypatch, batched):
+    monkeypatch.setenv("QCWARE_CLIENT_TIMEOUT", "60")
+    features = (Batched_qaoa_angles_wire_feature,) if batched else ()
+    problem = BinaryProblem(
+        objective=PolynomialObjective(
+            polynomial={(0,): 1, (0, 1): -2, (2,): 3}, num_variables=3
+        )
+    )
+    rng = np.random.default_rng(0)
+    beta, gamma = rng.random((2, 10, 2))
+    expected = qaoa_expectation_value_local(problem, beta, gamma)
+    with MockForgeServer(MockServerConfig(wire_features=features)) as server:
+        with additional_config(qcware_host=server.url):
+            values = qaoa_expectation_value_batch(
+                problem, beta, gamma, max_points_per_call=4
+            )
+    np.testing.assert_allclose(values, expected)
+    assert len(server.calls) == (3 if batched else 10)
+    np.testing.assert_allclose(
+        qaoa_expectation_value_batch(problem, beta, gamma, backend="local/numpy"),
+        expected,
+    )
+
+
+def test_qaoa_expectation_value_batch_timeout(monkeypatch):
+    monkeypatch.setenv("QCWARE_CLIENT_TIMEOUT", "1")
+    problem = BinaryProblem(
+        objective=PolynomialObjective(polynomial={(0, 1): -2}, num_variables=2)
+    )
+    beta, gamma = np.random.default_rng(0).random((2, 3, 2))
+    expected = qaoa_expectation_value_local(problem, beta, gamma)
+    config = MockServerConfig(queue_delay=2, wire_features=())
+    with MockForgeServer(config) as server:
+        with additional_config(qcware_host=server.url):
+            with pytest.raises(ApiBatchTimeoutError) as error:
+                qaoa_expectation_value_batch(problem, beta, gamma)
+            call_tokens = error.value.call_tokens
+            assert len(call_tokens) == 3
+
+            # the whole batch can still be retrieved
+            async def main():
+                try:
+                    return dict([r async for r in gather_results(call_tokens)])
+                finally:
+                    await close_client_session()
+
+            values = asyncio.run(main())
+    np.testing.assert_allclose([values[t] for t in call_tokens], expected)
+
+
+def test_qaoa_expectation_value_batch_submission_error(monkeypatch):
+    monkeypatch.setenv("QCWARE_CLIENT_TIMEOUT", "60")
+    problem = BinaryProblem(
+        objective=PolynomialObjective(polynomial={(0, 1): -2}, num_variables=2)
+    )
+    beta, gamma = np.random.default_rng(0).random((2, 3, 2))
+    expected = qaoa_expectation_value_local(problem, beta, gamma)
+    submit = qaoa_expectation_value.submit
+
+    def submit_all_but_the_second(*args, **kwargs):
+        if np.array_equal(kwargs["beta"], beta[1]):
+            raise ConnectionError("refused")
+        return submit(*args, **kwargs)
+
+    monkeypatch.setattr(qaoa_expectation_value, "submit", submit_all_but_the_second)
+    config = MockServerConfig(wire_features=())
+    with MockForgeServer(config) as server:
+        with additional_config(qcware_host=server.url):
+            with pytest.raises(ApiBatchSubmissionError) as error:
+                qaoa_expectation_value_batch(problem, beta, gamma)
+            assert [type(e) for e in error.value.errors] == [ConnectionError]
+            call_tokens = error.value.call_tokens
+            assert len(call_tokens) == 2
+
+            # the calls submitted can still be retrieved
+            async def main():
+                try:
+                    return dict([r async for r in gather_results(call_tokens)])
+                finally:
+                    await close_client_session()
+
+            values = asyncio.run(main())
+    np.testing.assert_allclose([values[t] for t in call_tokens], expected[[0, 2]])
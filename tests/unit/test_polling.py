@@ -0,0 +1,114 @@
+import asyncio
+import importlib
+import time
+
+import pytest
+from qcware.forge.api_calls import polling
+from qcware.forge.api_calls.api_call import async_wait_for_call, wait_for_call
+from qcware.forge.api_calls.polling import PollSchedule
+from qcware.forge.config import (
+    PollingPolicy,
+    PollingStrategy,
+    additional_config,
+    current_context,
+)
+
+api_call_module = importlib.import_module("qcware.forge.api_calls.api_call")
+
+
+def policy(**kwargs):
+    defaults = dict(
+        strategy="exponential",
+        initial_interval=0.1,
+        max_interval=1.0,
+        multiplier=2.0,
+        jitter=0.0,
+        honor_retry_after=True,
+    )
+    return PollingPolicy(**{**defaults, **kwargs})
+
+
+def test_exponential_schedule():
+    schedule = PollSchedule(policy())
+    delays = [schedule.next_delay({"state": "open"}) for _ in range(6)]
+    assert delays == pytest.approx([0.1, 0.2, 0.4, 0.8, 1.0, 1.0])
+
+
+def test_retry_after_is_honored():
+    schedule = PollSchedule(policy(max_interval=5.0))
+    assert schedule.next_delay({"state": "open", "retry_after": 3}) == 3.0
+    assert schedule.next_delay({"state": "open", "retry_after": 30}) == 5.0
+    schedule = PollSchedule(policy(honor_retry_after=False))
+    assert schedule.next_delay({"state": "open", "retry_after": 3}) == 0.1
+
+
+def test_adaptive_schedule_uses_latency_estimate(monkeypatch):
+    monkeypatch.setattr(polling, "_latency_estimates", {"test.echo": 5.0})
+    schedule = PollSchedule(policy(strategy="adaptive", max_interval=10.0))
+    assert 4.9 < schedule.next_delay({"state": "open", "method": "test.echo"}) <= 5.0
+    assert schedule.next_delay({"state": "open", "method": "other"}) == 0.1
+    schedule = PollSchedule(policy(strategy="adaptive", max_interval=1.0))
+    assert schedule.next_delay({"state": "open", "method": "test.echo"}) == 1.0
+
+
+def test_delays_never_exceed_max_interval():
+    schedule = PollSchedule(policy(jitter=0.5))
+    delays = [schedule.next_delay({"state": "open"}) for _ in range(50)]
+    assert max(delays) <= 1.0
+
+
+def test_latency_is_measured_from_submission(monkeypatch):
+    monkeypatch.setattr(polling, "_latency_estimates", {})
+    monkeypatch.setattr(polling, "_submission_times", polling.OrderedDict())
+    finished = {"state": "success", "method": "test.echo"}
+    # a call submitted elsewhere (or forgotten) has no known latency
+    PollSchedule(policy(), "unknown").record_poll(finished)
+    assert polling.estimated_latency("test.echo") is None
+    polling.record_submission("token")
+    monkeypatch.setitem(polling._submission_times, "token", time.monotonic() - 3)
+    schedule = PollSchedule(policy(), "token")
+    schedule.record_poll(finished)
+    assert polling.estimated_latency("test.echo") == pytest.approx(3, abs=0.5)
+    # and only once
+    PollSchedule(policy(), "token").record_poll(finished)
+    assert polling.estimated_latency("test.echo") == pytest.approx(3, abs=0.5)
+
+
+@pytest.fixture
+def fake_api_call(monkeypatch):
+    states = ["open", "open", "open", "success"]
+
+    def poll(api_call_context, call_token):
+        return dict(state=states.pop(0), method="test.echo", uid=call_token)
+
+    async def async_poll(api_call_context, call_token):
+        return poll(api_call_context, call_token)
+
+    monkeypatch.setattr(polling, "_latency_estimates", {})
+    polling.record_submission("token")
+    monkeypatch.setattr(api_call_module, "api_call", poll)
+    monkeypatch.setattr(api_call_module, "async_api_call", async_poll)
+
+
+def test_wait_for_call_counts_polls(fake_api_call):
+    with additional_config(
+        client_timeout=10, polling_policy=dict(strategy="constant", initial_interval=0)
+    ):
+        result = wait_for_call("token")
+    assert result["state"] == "success"
+    assert result["num_polls"] == 4
+    assert polling.estimated_latency("test.echo") is not None
+
+
+def test_async_wait_for_call_times_out(fake_api_call):
+    with additional_config(client_timeout=0):
+        result = asyncio.run(async_wait_for_call("token"))
+    assert result["state"] == "open"
+    assert result["num_polls"] == 1
+
+
+def test_polling_policy_from_context():
+    with additional_config(polling_policy=dict(strategy="adaptive")):
+        context_policy = current_context().polling_policy
+    assert context_policy.strategy is PollingStrategy.adaptive
+    assert context_policy.max_interval is not None
@@ -0,0 +1,169 @@
+import itertools
+import pickle
+import random
+
+import numpy as np
+import pytest
+from qcware.types.optimization import PolynomialObjective
+from qcware.types.optimization.problem_spec import cost_vector, objective
+
+
+def random_terms(rng: random.Random, num_variables: int):
+    """Terms with repeated variables, in any order, some repeated"""
+    terms = {}
+    for _ in range(rng.randint(0, 12)):
+        term = tuple(rng.randrange(num_variables) for _ in range(rng.randint(0, 4)))
+        terms[term] = rng.randint(-2, 2)
+    return terms
+
+
+@pytest.mark.parametrize("domain", ["boolean", "spin"])
+def test_from_term_arrays_matches_constructor(domain):
+    rng = random.Random(0)
+    for _ in range(300):
+        num_variables = rng.randint(1, 6)
+        terms = random_terms(rng, num_variables)
+        expected = PolynomialObjective(terms, num_variables, domain=domain)
+        offsets = np.cumsum([0] + [len(t) for t in terms])
+        variables = [v for t in terms for v in t]
+        p = PolynomialObjective.from_term_arrays(
+            offsets, variables, list(terms.values()), num_variables, domain=domain
+        )
+        # the same terms in the same order
+        assert list(p.items()) == list(expected.items())
+        assert p.active_variables == expected.active_variables
+        assert p.degree == expected.degree
+        assert p.dict() == expected.dict()
+
+
+def test_from_arrays():
+    rows = np.array([0, 1, 2, 1, 3])
+    cols = np.array([1, 0, 2, 1, 3])
+    coefficients = np.array([2, 3, -1, 4, 0])
+    p = PolynomialObjective.from_arrays(rows, cols, coefficients, 4, constant=7)
+    assert p.polynomial == {(0, 1): 5, (2,): -1, (1,): 4, (): 7}
+    spin = PolynomialObjective.from_arrays(rows, cols, coefficients, 4, "spin")
+    assert spin.polynomial == {(0, 1): 5, (): 3}
+
+    with pytest.raises(ValueError, match="inconsistent"):
+        PolynomialObjective.from_arrays([0], [4], [1], 4)
+    with pytest.raises(ValueError, match="integers"):
+        PolynomialObjective.from_arrays([0], [1], [0.5], 4)
+    with pytest.raises(ValueError, match="coefficients"):
+        PolynomialObjective.from_arrays([0, 1], [1, 2], [1], 4)
+
+
+@pytest.mark.parametrize("domain", ["boolean", "spin"])
+def test_clone_and_reduce_variables(domain):
+    p = PolynomialObjective(
+        {(5, 2): 3, (7,): -1, (2, 5, 9): 2, (): 4}, num_variables=10, domain=domain
+    )
+    clone = p.clone()
+    assert clone.dict() == p.dict() and clone.degree == p.degree
+    assert clone.polynomial is not p.polynomial
+
+    reduced = p.reduce_variables()
+    assert reduced["mapping"] == {2: 0, 5: 1, 7: 2, 9: 3}
+    assert reduced["polynomial"].polynomial == {
+        (0, 1): 3,
+        (2,): -1,
+        (0, 1, 3): 2,
+        (): 4,
+    }
+    assert reduced["polynomial"].num_variables == 4
+    assert reduced["polynomial"].domain is p.domain
+
+
+def test_immutable_and_hashable():
+    p = PolynomialObjective({(0, 1): 2, (1,): -1}, num_variables=3)
+    with pytest.raises(AttributeError, match="immutable"):
+        p.num_variables = 4
+    with pytest.raises(TypeError):
+        p.polynomial[(2,)] = 1
+    with pytest.raises(TypeError):
+        p.variable_name_mapping.update({0: "a"})
+
+    # equal regardless of the order in which the terms were given
+    q = PolynomialObjective({(1,): -1, (1, 0): 2}, num_variables=3)
+    assert p == q and hash(p) == hash(q)
+    assert p.content_hash() == q.content_hash()
+    assert len({p, q, p.clone(), pickle.loads(pickle.dumps(p))}) == 1
+    for different in [
+        PolynomialObjective({(0, 1): 2, (1,): -1}, num_variables=4),
+        PolynomialObjective({(0, 1): 2, (1,): -1}, num_variables=3, domain="spin"),
+        PolynomialObjective({(0, 1): 2}, num_variables=3),
+        PolynomialObjective(
+            {(0, 1): 2, (1,): -1},
+            num_variables=3,
+            variable_name_mapping={0: "a", 1: "b", 2: "c"},
+        ),
+    ]:
+        assert p != different and p.content_hash() != different.content_hash()
+
+
+def _not_computed(*args, **kwargs):
+    raise AssertionError("The cost vector should not be computed again.")
+
+
+@pytest.mark.parametrize("dense_pairing", [True, False])
+@pytest.mark.parametrize("domain", ["boolean", "spin"])
+def test_cost_vector(domain, dense_pairing, monkeypatch, tmp_path):
+    if not dense_pairing:
+        monkeypatch.setattr(cost_vector, "Pairing_block_entries", 0)
+    rng = random.Random(1)
+    for num_variables in [1, 2, 5, 8]:
+        p = PolynomialObjective(
+            random_terms(rng, num_variables), num_variables, domain=domain
+        )
+        bits = [0, 1] if domain == "boolean" else [1, -1]
+        X = np.array(list(itertools.product(bits, repeat=num_variables)))
+        expected = p.compute_values(X)
+        vector = p.cost_vector()
+        np.testing.assert_array_equal(vector, expected)
+        assert not vector.flags.writeable
+        assert p.cost_vector() is vector
+        assert p.cost_vector(dtype=np.int32).dtype == np.int32
+        np.testing.assert_array_equal(p.cost_vector(dtype=np.int32), expected)
+        chunks = list(p.cost_vector_chunks(chunk_size=3))
+        assert all(len(chunk) <= 3 for chunk in chunks)
+        np.testing.assert_array_equal(np.concatenate(chunks), expected)
+        mapped = p.cost_vector(cache_directory=tmp_path)
+        assert isinstance(mapped, np.memmap) and not mapped.flags.writeable
+        np.testing.assert_array_equal(mapped, expected)
+        # read back rather than computed again
+        with monkeypatch.context() as m:
+            m.setattr(objective, "cost_vector_chunks", _not_computed)
+            np.testing.assert_array_equal(
+                p.clone().cost_vector(cache_directory=tmp_path), expected
+            )
+    assert len(list(tmp_path.iterdir())) == 4
+    empty = PolynomialObjective({}, 3, domain=domain)
+    np.testing.assert_array_equal(empty.cost_vector(), np.zeros(8))
+
+
+@pytest.mark.parametrize("domain", ["boolean", "spin"])
+def test_cost_vector_of_large_integers(domain):
+    rng = random.Random(2)
+    num_variables = 4
+    terms = {
+        tuple(rng.sample(range(num_variables), rng.randint(0, 3))): rng.randint(
+            -(2**59), 2**59
+        )
+        for _ in range(12)
+    }
+    p = PolynomialObjective(terms, num_variables, domain=domain)
+    bits = [0, 1] if domain == "boolean" else [1, -1]
+    expected = []
+    for x in itertools.product(bits, repeat=num_variables):
+        # exactly, with python integers
+        value = 0
+        for term, coefficient in p.polynomial.items():
+            for v in term:
+                coefficient *= x[v]
+            value += coefficient
+        expected.append(value)
+    expected = np.array(expected, dtype=np.int64)
+    assert (p.cost_vector().astype(np.int64) != expected).any()
+    np.testing.assert_array_equal(p.cost_vector(dtype=np.int64), expected)
+    chunks = list(p.cost_vector_chunks(chunk_size=3, dtype=np.int64))
+    np.testing.assert_array_equal(np.concatenate(chunks), expected)
@@ -0,0 +1,127 @@
+import asyncio
+import importlib
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from qcware.forge.api_calls import api_call_decorator
+from qcware.forge.api_calls.result_cache import ResultCache, result_cache
+from qcware.forge.config import additional_config
+from qcware.forge.test import echo
+from qcware.serialization.frames import decode_frames, encode_frames
+from qcware.serialization.transforms import dict_to_ndarray, ndarray_to_dict
+from qcware.serialization.transforms.helpers import collect_ndarray_buffers
+
+api_call_module = importlib.import_module("qcware.forge.api_calls.api_call")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path), max_size=1 << 20, ttl=3600)
+
+
+def test_wire_results_round_trip(cache):
+    x = np.random.rand(1000)
+    with collect_ndarray_buffers() as buffers:
+        wire = dict(small=ndarray_to_dict(np.arange(3)), large=ndarray_to_dict(x))
+    # as if the result had been downloaded in the binary wire format
+    wire = decode_frames(encode_frames(wire, buffers))
+    wire["json"] = ndarray_to_dict(x)
+    cache.put("k", "some.method", wire)
+    method, cached = cache.get("k")
+    assert method == "some.method"
+    for k, v in [("small", np.arange(3)), ("large", x), ("json", x)]:
+        np.testing.assert_array_equal(dict_to_ndarray(cached[k]), v)
+
+
+def test_errors_are_not_cached(cache):
+    cache.put("k", "some.method", dict(error="failed"))
+    assert cache.get("k") is None
+
+
+def test_expired_results_are_ignored(cache, tmp_path):
+    cache.put("k", "some.method", "result")
+    (path,) = tmp_path.iterdir()
+    stale = time.time() - 2 * cache.ttl
+    os.utime(path, (stale, stale))
+    assert cache.get("k") is None
+    assert not path.exists()
+
+
+def test_least_recently_used_results_are_evicted(cache, tmp_path):
+    cache.max_size = 3 * 2000
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, "some.method", "x" * 1500)
+        path = tmp_path / (key + ".qcwresult")
+        os.utime(path, (1000 + i, path.stat().st_mtime))
+    assert cache.get("a") is not None
+    cache.put("d", "some.method", "x" * 1500)
+    assert cache.get("b") is None
+    assert all(cache.get(k) is not None for k in ["a", "c", "d"])
+
+
+def test_cache_is_opt_in_and_per_method(monkeypatch):
+    assert result_cache("test.echo") is None
+    monkeypatch.setenv("QCWARE_RESULT_CACHE", "True")
+    assert result_cache("test.echo") is None
+    assert result_cache("qio.loader") is not None
+    with additional_config(result_cache=dict(methods=["test.echo"])):
+        assert result_cache("test.echo") is not None
+
+
+@pytest.fixture
+def fake_server(monkeypatch, tmp_path):
+    posted = []
+
+    def post_call(endpoint, data):
+        posted.append(data["text"])
+        return dict(uid=str(len(posted)))
+
+    async def async_post_call(endpoint, data):
+        return post_call(endpoint, data)
+
+    def wait_for_call(call_token):
+        return dict(method="test.echo", state="success", result=f"echo {call_token}")
+
+    async def async_wait_for_call(call_token):
+        return wait_for_call(call_token)
+
+    monkeypatch.setattr(api_call_decorator, "post_call", post_call)
+    monkeypatch.setattr(api_call_decorator, "async_post_call", async_post_call)
+    monkeypatch.setattr(api_call_decorator, "wait_for_call", wait_for_call)
+    monkeypatch.setattr(api_call_module, "async_wait_for_call", async_wait_for_call)
+    monkeypatch.setenv("QCWARE_RESULT_CACHE", "True")
+    monkeypatch.setenv("QCWARE_RESULT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("QCWARE_RESULT_CACHE_METHODS", "test.echo")
+    return posted
+
+
+def test_api_calls_use_the_cache(fake_server):
+    assert echo(text="a") == "echo 1"
+    assert echo(text="a") == "echo 1"
+    assert asyncio.run(echo.call_async(text="a")) == "echo 1"
+    assert asyncio.run(echo.call_async(text="b")) == "echo 2"
+    assert echo(text="b") == "echo 2"
+    assert fake_server == ["a", "b"]
+
+
+def test_async_calls_use_the_cache_in_threads(fake_server, monkeypatch):
+    accesses = []
+    for name in ["get", "put"]:
+
+        def access(self, *args, _name=name, _f=getattr(ResultCache, name)):
+            accesses.append((_name, threading.get_ident()))
+            return _f(self, *args)
+
+        monkeypatch.setattr(ResultCache, name, access)
+
+    async def main():
+        results = [await echo.call_async(text="a") for _ in range(2)]
+        return results, threading.get_ident()
+
+    results, loop_thread = asyncio.run(main())
+    assert results == ["echo 1", "echo 1"]
+    assert [name for name, _ in accesses] == ["get", "put", "get"]
+    assert all(thread != loop_thread for _, thread in accesses)
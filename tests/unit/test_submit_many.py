@@ -0,0 +1,43 @@
+import itertools
+
+import pytest
+from qcware.forge.api_calls import api_call_decorator
+from qcware.forge.config import additional_config, current_context
+from qcware.forge.test import echo
+
+
+@pytest.fixture
+def fake_post_call(monkeypatch):
+    counter = itertools.count()
+    posted = []
+
+    def post_call(endpoint, data):
+        if data["text"] == "fail":
+            raise ValueError("refused")
+        posted.append((data["text"], current_context().server_timeout))
+        return dict(uid=f"{data['text']}-{next(counter)}")
+
+    monkeypatch.setattr(api_call_decorator, "post_call", post_call)
+    return posted
+
+
+def test_submit_many_preserves_order(fake_post_call):
+    texts = [str(i) for i in range(50)]
+    results = echo.submit_many([dict(text=t) for t in texts], max_workers=4)
+    assert [r.index for r in results] == list(range(50))
+    assert [r.call_token.split("-")[0] for r in results] == texts
+    assert all(r.ok for r in results)
+
+
+def test_submit_many_reports_errors(fake_post_call):
+    results = echo.submit_many([dict(text="a"), dict(text="fail"), dict(text="b")])
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].call_token is None
+    assert isinstance(results[1].error, ValueError)
+
+
+def test_map_uses_caller_context(fake_post_call):
+    with additional_config(server_timeout=7):
+        results = echo.map(["x", "y", "z"])
+    assert all(r.ok for r in results)
+    assert sorted(fake_post_call) == [("x", 7), ("y", 7), ("z", 7)]
@@ -0,0 +1,84 @@
+import asyncio
+import importlib
+import itertools
+import logging
+
+import pytest
+from qcware.forge.test import echo
+from qcware.forge.timings import (
+    collect_timings,
+    log_timings,
+    register_timing_hook,
+    unregister_timing_hook,
+)
+
+api_call_module = importlib.import_module("qcware.forge.api_calls.api_call")
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    sent = []
+    states = {}
+
+    def post_json(url, body):
+        sent.append(body)
+        token = str(len(sent))
+        states[token] = itertools.chain(["open", "open"], itertools.repeat("success"))
+        return dict(uid=token)
+
+    async def async_post_json(url, body):
+        return post_json(url, body)
+
+    def poll(api_call_context, call_token):
+        return dict(
+            uid=call_token,
+            method="test.echo",
+            state=next(states[call_token]),
+            result=f"echo {call_token}",
+        )
+
+    async def async_poll(api_call_context, call_token):
+        return poll(api_call_context, call_token)
+
+    monkeypatch.setattr(api_call_module, "post_json", post_json)
+    monkeypatch.setattr(api_call_module, "async_post_json", async_post_json)
+    monkeypatch.setattr(api_call_module, "api_call", poll)
+    monkeypatch.setattr(api_call_module, "async_api_call", async_poll)
+    monkeypatch.setenv("QCWARE_CLIENT_TIMEOUT", "60")
+    monkeypatch.setenv("QCWARE_POLLING_STRATEGY", "constant")
+    monkeypatch.setenv("QCWARE_POLLING_INITIAL_INTERVAL", "0.001")
+    return sent
+
+
+def test_calls_are_timed(fake_server):
+    with collect_timings() as collector:
+        assert echo(text="a") == "echo 1"
+        assert asyncio.run(echo.call_async(text="b")) == "echo 2"
+        echo.submit(text="c")
+    assert collector.calls == {"test.echo": 3}
+    samples = collector.samples["test.echo"]
+    for stage in ["bind", "to_wire", "encode", "post", "from_wire", "total"]:
+        assert stage in samples
+    assert len(samples["from_wire"]) == 2
+    assert len(samples["poll"]) == 6
+    assert len(samples["queue_time"]) == 2
+    assert samples["request_bytes"] == [len(body) for body in fake_server]
+    summary = collector.summary()["test.echo"]["total"]
+    assert summary["count"] == 3 and summary["p50"] <= summary["p99"]
+
+
+def test_hooks(fake_server, caplog):
+    timings = []
+    register_timing_hook(timings.append)
+    register_timing_hook(log_timings)
+    try:
+        with caplog.at_level(logging.DEBUG, logger="qcware.forge"):
+            echo(text="a")
+    finally:
+        unregister_timing_hook(timings.append)
+        unregister_timing_hook(log_timings)
+    (t,) = timings
+    assert t.call_token == "1" and t.error is None and len(t.polls) == 3
+    assert "test.echo (1) took" in caplog.text
+    echo(text="b")
+    assert len(timings) == 1
@@ -0,0 +1,319 @@
+import importlib
+import io
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+import requests
+from qcware.forge import request
+from qcware.forge.config import additional_config
+from qcware.forge.optimization import qaoa_expectation_value
+from qcware.forge.qio import loader
+from qcware.serialization.transforms import dict_to_ndarray, ndarray_to_dict
+from qcware.serialization import frames
+from qcware.serialization.frames import (
+    ArrayBuffer,
+    Buffer_key,
+    FramesDecoder,
+    decode_frames,
+    encode_frames,
+    iter_frames,
+    memmap_allocator,
+)
+from qcware.serialization.transforms import client_args_to_wire, server_args_from_wire
+from qcware.serialization.transforms.helpers import collect_ndarray_buffers
+from qcware.serialization.transforms.to_wire import binary_problem_from_wire, to_wire
+from qcware.serialization.wire_features import (
+    Sparse_polynomials_wire_feature,
+    enable_wire_features,
+)
+from qcware.types.optimization import BinaryProblem, PolynomialObjective
+
+api_call_module = importlib.import_module("qcware.forge.api_calls.api_call")
+api_call_decorator_module = importlib.import_module(
+    "qcware.forge.api_calls.api_call_decorator"
+)
+
+
+def test_frames_round_trip():
+    arrays = dict(
+        small=np.arange(10, dtype=np.int8),
+        large=np.linspace(0, 1, 5000),
+        complex=np.eye(3, dtype=np.complex128)[:, ::2],
+        empty=np.zeros((0, 4)),
+    )
+    with collect_ndarray_buffers() as buffers:
+        data = {k: ndarray_to_dict(v) for k, v in arrays.items()}
+        data["note"] = "unchanged"
+    assert all("ndarray" not in d for d in data.values() if isinstance(d, dict))
+    decoded = decode_frames(encode_frames(data, buffers))
+    assert decoded["note"] == "unchanged"
+    for k, v in arrays.items():
+        result = dict_to_ndarray(decoded[k])
+        assert result.dtype == v.dtype
+        np.testing.assert_array_equal(result, v)
+
+
+def test_uncompressed_buffers_are_not_copied():
+    x = np.arange(16, dtype=np.float64)
+    with collect_ndarray_buffers() as buffers:
+        data = dict(x=ndarray_to_dict(x))
+    body = encode_frames(data, buffers)
+    result = dict_to_ndarray(decode_frames(body)["x"])
+    np.testing.assert_array_equal(result, x)
+    assert np.shares_memory(result, np.frombuffer(body, dtype=np.uint8))
+
+
+def test_collection_is_scoped():
+    with collect_ndarray_buffers():
+        pass
+    assert "ndarray" in ndarray_to_dict(np.arange(3))
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    posted = {}
+
+    def post_frames(url, data, buffers):
+        posted["frames"] = decode_frames(encode_frames(data, buffers))
+        return dict(uid="frames")
+
+    def post_json(url, body):
+        posted["json"] = json.loads(body)
+        return dict(uid="json")
+
+    monkeypatch.setattr(api_call_module, "post_frames", post_frames)
+    monkeypatch.setattr(api_call_module, "post_json", post_json)
+    return posted
+
+
+@pytest.mark.parametrize("host_features", [{"frames"}, set()])
+def test_binary_transport_is_negotiated(monkeypatch, posted, host_features):
+    monkeypatch.setattr(
+        api_call_module, "host_wire_features", lambda host: host_features
+    )
+    x = np.random.rand(2048)
+    with additional_config(wire_format="binary"):
+        token = loader.submit(data=x)
+    assert token == ("frames" if host_features else "json")
+    params = server_args_from_wire("qio.loader", **posted[token])
+    np.testing.assert_array_equal(params["data"], x)
+
+
+def test_json_transport_is_the_default(monkeypatch, posted):
+    monkeypatch.setattr(api_call_module, "host_wire_features", lambda host: {"frames"})
+    assert loader.submit(data=np.arange(4.0)) == "json"
+    expected = client_args_to_wire("qio.loader", data=np.arange(4.0))["data"]
+    assert posted["json"]["data"] == json.loads(json.dumps(expected))
+
+
+def test_host_features_are_only_asked_when_needed(monkeypatch):
+    asked = []
+
+    def host_wire_features(host):
+        asked.append(host)
+        return {Sparse_polynomials_wire_feature}
+
+    for module in [api_call_module, api_call_decorator_module]:
+        monkeypatch.setattr(module, "host_wire_features", host_wire_features)
+    # no argument has an encoding depending on the host's features
+    loader.data(data=np.arange(4.0))
+    assert asked == []
+    problem = BinaryProblem(objective=PolynomialObjective({(0, 1): 1}, 2))
+    arguments = dict(problem_instance=problem, beta=[0.1], gamma=[0.2])
+    qaoa_expectation_value.data(backend="local/numpy", **arguments)
+    assert asked == []
+    data = qaoa_expectation_value.data(**arguments)
+    assert len(asked) == 1
+    assert "sparse_polynomial" in data["problem_instance"]["objective"]
+
+
+@pytest.mark.parametrize("compression", ["none", "lz4"])
+def test_buffers_are_streamed_in_chunks(monkeypatch, compression):
+    monkeypatch.setattr(frames, "Chunk_size", 1000)
+    x = np.arange(10000, dtype=np.float64)
+    buffer = ArrayBuffer(x, compression)
+    chunks = list(buffer.chunks())
+    assert len(chunks) > 1 and all(len(c) > 0 for c in chunks)
+    body = encode_frames(
+        {
+            "x": {
+                Buffer_key: 0,
+                "compression": compression,
+                "dtype": x.dtype.str,
+                "shape": x.shape,
+            }
+        },
+        [buffer],
+    )
+    np.testing.assert_array_equal(dict_to_ndarray(decode_frames(body)["x"]), x)
+
+
+def test_streamed_body_does_not_copy_arrays():
+    x = np.random.rand(1 << 22)
+    with collect_ndarray_buffers() as buffers:
+        data = client_args_to_wire("qio.loader", data=x)
+    tracemalloc.start()
+    try:
+        num_bytes = sum(len(piece) for piece in iter_frames(data, buffers))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert num_bytes > x.nbytes / 2
+    assert peak < x.nbytes / 8
+
+
+def test_post_frames_streams_a_fresh_body_per_attempt(monkeypatch):
+    sent = []
+
+    class Session:
+        def post(self, url, data, headers):
+            sent.append(b"".join(data))
+            response = requests.Response()
+            response.status_code = 200 if len(sent) > 1 else 503
+            response._content = b'{"uid": "streamed"}'
+            if response.status_code >= 500:
+                raise requests.exceptions.HTTPError(response=response)
+            return response
+
+    monkeypatch.setattr(request, "client_session", lambda: Session())
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+    x = np.arange(5000.0)
+    with collect_ndarray_buffers() as buffers:
+        data = dict(x=ndarray_to_dict(x))
+    assert request.post_frames("http://host/call", data, buffers) == dict(
+        uid="streamed"
+    )
+    assert len(sent) == 2 and sent[0] == sent[1] == encode_frames(data, buffers)
+
+
+def _frames_body(monkeypatch, arrays):
+    monkeypatch.setattr(frames, "Chunk_size", 4096)
+    with collect_ndarray_buffers() as buffers:
+        data = dict(arrays={k: ndarray_to_dict(v) for k, v in arrays.items()})
+    return encode_frames(data, buffers)
+
+
+_result_arrays = dict(
+    statevector=np.exp(1j * np.linspace(0, 1, 3000)),
+    counts=np.arange(500, dtype=np.int32).reshape(25, 20),
+    empty=np.zeros(0, dtype=np.float32),
+)
+
+
+@pytest.mark.parametrize("piece_size", [1, 7, 4096, 1 << 20])
+def test_frames_decoder_accepts_any_split(monkeypatch, piece_size):
+    body = _frames_body(monkeypatch, _result_arrays)
+    decoder = FramesDecoder()
+    for i in range(0, len(body), piece_size):
+        decoder.feed(body[i : i + piece_size])
+    decoded = decoder.result()["arrays"]
+    for k, v in _result_arrays.items():
+        result = dict_to_ndarray(decoded[k])
+        assert result.dtype == v.dtype
+        np.testing.assert_array_equal(result, v)
+
+
+def test_frames_decoder_detects_truncation(monkeypatch):
+    body = _frames_body(monkeypatch, _result_arrays)
+    decoder = FramesDecoder()
+    decoder.feed(body[:-20])
+    with pytest.raises(ValueError):
+        decoder.result()
+
+
+def test_frames_decoder_spools_to_memory_maps(monkeypatch, tmp_path):
+    body = _frames_body(monkeypatch, _result_arrays)
+    decoder = FramesDecoder(allocate=memmap_allocator(str(tmp_path)))
+    decoder.feed(body)
+    result = dict_to_ndarray(decoder.result()["arrays"]["statevector"])
+    np.testing.assert_array_equal(result, _result_arrays["statevector"])
+    assert any(isinstance(b, np.memmap) for b in _bases(result))
+
+
+def _bases(x):
+    while x is not None:
+        yield x
+        x = x.base if isinstance(x, np.ndarray) else getattr(x, "obj", None)
+
+
+def test_get_payload_decodes_streamed_frames(monkeypatch):
+    body = _frames_body(monkeypatch, _result_arrays)
+
+    class Session:
+        def get(self, url, headers, stream):
+            assert stream
+            response = requests.Response()
+            response.status_code = 200
+            response.headers["Content-Type"] = frames.Frames_content_type
+            response.raw = io.BytesIO(body)
+            return response
+
+    monkeypatch.setattr(request, "client_session", lambda: Session())
+    decoded = request.get_payload("http://results/1")["arrays"]
+    np.testing.assert_array_equal(
+        dict_to_ndarray(decoded["counts"]), _result_arrays["counts"]
+    )
+
+
+def test_binary_problem_encodings_are_reused():
+    problem = BinaryProblem(
+        objective=PolynomialObjective(
+            {(i, i + 1): i + 1 for i in range(500)}, num_variables=501
+        )
+    )
+    first, second = to_wire(problem), to_wire(problem)
+    assert first == second and first["objective"] is second["objective"]
+    with enable_wire_features([Sparse_polynomials_wire_feature]):
+        sparse = to_wire(problem)
+    assert "sparse_polynomial" in sparse["objective"]
+
+    # the arrays of a reused encoding are added to those of each call
+    for _ in range(2):
+        with enable_wire_features(
+            [Sparse_polynomials_wire_feature]
+        ), collect_ndarray_buffers() as buffers:
+            data = dict(x=ndarray_to_dict(np.arange(3)), a=to_wire(problem))
+            data["b"] = to_wire(problem)
+        assert len(buffers) == 7
+        decoded = decode_frames(encode_frames(data, buffers))
+        np.testing.assert_array_equal(dict_to_ndarray(decoded["x"]), np.arange(3))
+        assert binary_problem_from_wire(decoded["a"]) == problem
+        assert binary_problem_from_wire(decoded["b"]) == problem
+
+
+def test_reused_problem_buffers_are_renumbered():
+    problems = [
+        BinaryProblem(
+            objective=PolynomialObjective(
+                {(i, (i + k) % 50): i - k for i in range(50)}, 50, domain=domain
+            )
+        )
+        for k, domain in [(1, "boolean"), (2, "spin")]
+    ]
+    beta = np.linspace(0, 1, 12).reshape(4, 3)
+    with enable_wire_features([Sparse_polynomials_wire_feature]):
+        # the encodings are cached with buffers numbered from 0
+        with collect_ndarray_buffers():
+            for problem in problems:
+                to_wire(problem)
+        with collect_ndarray_buffers() as buffers:
+            data = dict(beta=ndarray_to_dict(beta))
+            data["problems"] = [to_wire(problem) for problem in problems]
+            data["gamma"] = ndarray_to_dict(-beta)
+    sparse_polynomials = [p["objective"]["sparse_polynomial"] for p in data["problems"]]
+    assert sparse_polynomials[0]["variables"][Buffer_key] > 0
+    assert (
+        sparse_polynomials[1]["variables"][Buffer_key]
+        > sparse_polynomials[0]["variables"][Buffer_key]
+    )
+    decoder = FramesDecoder()
+    for piece in iter_frames(data, buffers):
+        decoder.feed(piece)
+    decoded = decoder.result()
+    np.testing.assert_array_equal(dict_to_ndarray(decoded["beta"]), beta)
+    np.testing.assert_array_equal(dict_to_ndarray(decoded["gamma"]), -beta)
+    for problem, wire in zip(problems, decoded["problems"]):
+        assert binary_problem_from_wire(wire) == problem